@@ -1,27 +1,323 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
-from fastapi.responses import StreamingResponse
-from typing import List, Dict, Any, Union, AsyncGenerator
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse, JSONResponse
+from typing import List, Dict, Any, AsyncGenerator, Tuple, Optional, NamedTuple
 import os
-import tempfile
+import json
+import time
+import shutil
+import hashlib
 import asyncio
-from backend.core.vector_store import VectorStore
-from backend.core.query_engine import generate_answer
-from backend.core.llm_manager import LLMManager
-from backend.utils.pdf_processor import extract_text_from_pdf
-from backend.config.settings import VECTOR_STORE_PATH
+from contextlib import aclosing
+import numpy as np
+from collections import deque
+from datetime import datetime, timezone
+from backend.core.vector_store import SearchFilter
+from backend.core.collection_manager import CollectionManager, Collection
+from backend.core import ann_index
+from backend.core.query_engine import build_prompt, load_prompt_tokenizers
+from backend.core.llm_manager import LLMManager, StreamInterrupted
+from backend.core.ingestion import IngestionPipeline
+from backend.core.jobs import JobQueue, JobWorkerPool, RESET, COMPLETED, FAILED
+from backend.core.writer_lock import WriterLock
+from backend.core.batching import MicroBatcher
+from backend.core.reranker import Reranker, RerankRequest, apply_scores
+from backend.core.startup import StartupTasks
+from backend.config.settings import (
+    QUERY_BATCH_MAX, QUERY_BATCH_WAIT, RERANK_ENABLED, RERANK_CANDIDATES, RERANK_BUDGET, DEFAULT_COLLECTION,
+    STARTUP_COLLECTIONS, STARTUP_WARMUP, MULTI_WORKER, WRITER_LOCK_PATH
+)
 
 router: APIRouter = APIRouter()
 
+UPLOAD_BLOCK_SIZE = 1 << 20
+# Seconds a reset request waits for its job, which runs after the collection's earlier jobs
+RESET_TIMEOUT = 60.0
+
 # Initialize components
-vector_store: VectorStore = VectorStore()
+# With several worker processes, the one holding the lock writes; the others serve read-only
+writer_lock: WriterLock = WriterLock(WRITER_LOCK_PATH)
+collection_manager: CollectionManager = CollectionManager(read_only=MULTI_WORKER and not writer_lock.acquire())
 llm_manager: LLMManager = LLMManager()
+ingestion_pipeline: IngestionPipeline = IngestionPipeline()
+reranker: Reranker = Reranker()
+
+def _run_ingest_job(job: Dict[str, Any]) -> None:
+    """Run one queued upload through the ingestion pipeline, recording progress"""
+    job_id = job["id"]
+    stage_times: Dict[str, float] = {}
+    current = {"stage": None, "since": time.perf_counter()}
+
+    def on_progress(stage: str, progress: Dict[str, Dict[str, Any]]) -> None:
+        now = time.perf_counter()
+        if current["stage"] is not None:
+            stage_times[current["stage"]] = round(stage_times.get(current["stage"], 0.0) + now - current["since"], 3)
+        current.update(stage=stage, since=now)
+        job_queue.update(job_id, stage=stage, progress=progress, stage_times=stage_times)
+
+    files = [(name, path) for name, path in job["files"]]
+    # Pinned so the collection is not closed while the job writes to it
+    collection = collection_manager.get(job["collection"], create=True, pin=True)
+    try:
+        results = ingestion_pipeline.run(collection.store, files, on_progress)
+    finally:
+        collection_manager.unpin(collection)
+    on_progress("done", results)
+    if all(r["status"] == "failed" for r in results.values()):
+        raise RuntimeError("No files could be processed")
+
+def _reset_collection(collection: Collection) -> None:
+    # Remove the stored segments and empty the in-memory index
+    collection.store.reset()
+    collection.answer_cache.clear()
+    collection.semantic_cache.clear()
+
+def _run_job(job: Dict[str, Any]) -> None:
+    if job["kind"] == RESET:
+        _reset_collection(collection_manager.get(job["collection"]))
+    else:
+        _run_ingest_job(job)
+
+job_queue: JobQueue = JobQueue()
+job_workers: JobWorkerPool = JobWorkerPool(job_queue, _run_job)
+
+def become_writer() -> None:
+    """Take over writing once the previous writer exited (started from main.py in read-only workers)"""
+    collection_manager.promote()
+    job_workers.start()
+    print(f"Worker {os.getpid()} is now the writer")
+
+def collection_name(
+    collection: str = Query(DEFAULT_COLLECTION, description="Named collection of documents")
+) -> str:
+    try:
+        collection_manager.path(collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return collection
+
+def open_collection(collection: str = Depends(collection_name)) -> Collection:
+    """The requested collection, loaded on first use; 404 if nothing was ever uploaded to it"""
+    try:
+        return collection_manager.get(collection)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Collection {collection!r} not found")
+
+class SearchOptions(NamedTuple):
+    """Per-query retrieval knobs; answers are cached per query and options"""
+    top_k: int = 5
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    lexical_weight: Optional[float] = None
+    rerank: bool = RERANK_ENABLED
+    filter: Optional[SearchFilter] = None
+
+def search_options(
+    top_k: int = Query(5, ge=1, le=50, description="Chunks to retrieve"),
+    nprobe: Optional[int] = Query(None, ge=1, description="IVF lists to probe"),
+    ef_search: Optional[int] = Query(None, ge=1, description="HNSW search depth"),
+    lexical_weight: Optional[float] = Query(None, ge=0, le=1, description="BM25 share of the fused ranking (0 = dense only)"),
+    rerank: Optional[bool] = Query(None, description="Rescore candidates with the cross-encoder (default RERANK_ENABLED)"),
+    source: Optional[List[str]] = Query(None, description="Only search these documents (repeatable)"),
+    page_from: Optional[int] = Query(None, ge=1, description="Only chunks ending on or after this page"),
+    page_to: Optional[int] = Query(None, ge=1, description="Only chunks starting on or before this page"),
+    uploaded_after: Optional[datetime] = Query(None, description="Only documents uploaded at or after this time (UTC unless it has an offset)"),
+    uploaded_before: Optional[datetime] = Query(None, description="Only documents uploaded before this time (UTC unless it has an offset)")
+) -> SearchOptions:
+    """Query parameters shared by /query and /query-stream"""
+    if page_from is not None and page_to is not None and page_from > page_to:
+        raise HTTPException(status_code=422, detail="page_from is after page_to")
+    search_filter = SearchFilter(
+        tuple(sorted(set(source))) if source else None, page_from, page_to,
+        _unix_seconds(uploaded_after), _unix_seconds(uploaded_before)
+    )
+    return SearchOptions(
+        top_k, nprobe, ef_search, lexical_weight, RERANK_ENABLED if rerank is None else rerank,
+        search_filter if search_filter != SearchFilter() else None
+    )
+
+def _unix_seconds(moment: Optional[datetime]) -> Optional[int]:
+    # Upload times are stored as Unix seconds; a time without an offset is read as UTC, not server-local
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+SearchRequest = Tuple[Collection, str, np.ndarray, SearchOptions]
+
+def _search_batch(requests: List[SearchRequest]) -> List[List[Dict[str, Any]]]:
+    """Hybrid search for a batch of (collection, query, vector, options); requests to the same
+    collection sharing knobs and filter share an index call"""
+    results: List[List[Dict[str, Any]]] = [[] for _ in requests]
+    groups: Dict[Tuple[Collection, Optional[int], Optional[int], Optional[SearchFilter]], List[int]] = {}
+    for i, (collection, _, _, options) in enumerate(requests):
+        groups.setdefault((collection, options.nprobe, options.ef_search, options.filter), []).append(i)
+    for (collection, nprobe, ef_search, search_filter), members in groups.items():
+        store = collection.store
+        # Filter and search see one version of the collection, whatever is written meanwhile
+        snapshot = store.snapshot
+        top_k = max(requests[i][3].top_k for i in members)
+        vectors = np.vstack([requests[i][2] for i in members])
+        found = store.search_vectors(
+            vectors, top_k, nprobe=nprobe, ef_search=ef_search,
+            queries=[requests[i][1] for i in members], lexical_weights=[requests[i][3].lexical_weight for i in members],
+            allowed=store.allowed_ids(search_filter, snapshot), snapshot=snapshot
+        )
+        for i, docs in zip(members, found):
+            results[i] = docs[:requests[i][3].top_k]
+    return results
+
+# Concurrent queries share one model.encode, one index.search per collection and one reranker call
+embed_batcher: MicroBatcher[str, np.ndarray] = MicroBatcher(
+    lambda queries: list(collection_manager.embedder.embed_queries(queries)), QUERY_BATCH_MAX, QUERY_BATCH_WAIT
+)
+search_batcher: MicroBatcher[SearchRequest, List[Dict[str, Any]]] = MicroBatcher(
+    _search_batch, QUERY_BATCH_MAX, QUERY_BATCH_WAIT
+)
+rerank_batcher: MicroBatcher[RerankRequest, np.ndarray] = MicroBatcher(
+    reranker.score_batch, QUERY_BATCH_MAX, QUERY_BATCH_WAIT
+)
+
+def _load_embedder() -> None:
+    embedder = collection_manager.embedder
+    embedder.model  # loads it
+    if STARTUP_WARMUP:
+        embedder.warm_up()
+
+def _load_collections() -> None:
+    for name in STARTUP_COLLECTIONS:
+        if collection_manager.exists(name):
+            store = collection_manager.get(name).store
+            if STARTUP_WARMUP and store.count:
+                store.search_vectors(np.zeros((1, store.dim), dtype="float32"), 1)
+
+def _load_tokenizers() -> None:
+    # Prompts are fitted to a model's budget in its own tokens, estimated until it is loaded
+    load_prompt_tokenizers(llm_manager.prompt_models())
+
+def _load_reranker() -> None:
+    reranker.model  # loads it
+    if STARTUP_WARMUP:
+        reranker.score_batch([("warm-up", [{"text": "warm-up"}])])
+
+# Models and indexes load in the background once the server is up (started in main.py)
+startup: StartupTasks = StartupTasks()
+startup.add("embedder", _load_embedder)
+startup.add("collections", _load_collections)
+startup.add("tokenizers", _load_tokenizers)
+if RERANK_ENABLED:
+    startup.add("reranker", _load_reranker)
+
+def _ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+async def _lookup_answer(collection: Collection, query: str, options: SearchOptions, timings: Dict[str, float]
+                         ) -> Tuple[int, Optional[np.ndarray], Optional[Tuple[str, List[Dict[str, Any]]]]]:
+    """Index version, query embedding and cached (answer, docs) if the query was seen before"""
+    # Read the version first so an answer racing an upload is never cached as current
+    version = collection.store.version
+    cached = collection.answer_cache.lookup(version, query, *options)
+    if cached is not None:
+        return version, None, cached
+    start = time.perf_counter()
+    vector = await embed_batcher.submit(query)
+    timings["embed_ms"] = _ms(start)
+    if collection.semantic_cache.enabled:
+        match = collection.semantic_cache.lookup(version, vector, *options)
+        if match is not None:
+            value, matched_query, similarity = match
+            print(f"Semantic cache hit ({similarity:.3f}): {query!r} ~ {matched_query!r}")
+            return version, vector, value
+    return version, vector, None
+
+async def _retrieve(collection: Collection, query: str, vector: np.ndarray, options: SearchOptions,
+                    timings: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Hybrid search, then cross-encoder reranking of a wider candidate set if requested.
+
+    Reranking gets RERANK_BUDGET per query; past it the candidates keep their
+    retrieval order and the (batched) scoring result is discarded.
+    """
+    start = time.perf_counter()
+    candidates = max(options.top_k, RERANK_CANDIDATES) if options.rerank else options.top_k
+    docs = await search_batcher.submit((collection, query, vector, options._replace(top_k=candidates)))
+    timings["search_ms"] = _ms(start)
+    if not options.rerank or len(docs) < 2:
+        return docs[:options.top_k]
+
+    start = time.perf_counter()
+    try:
+        scores = await asyncio.wait_for(rerank_batcher.submit((query, docs)), RERANK_BUDGET)
+    except asyncio.TimeoutError:
+        scores = None
+    timings["rerank_ms"] = _ms(start)
+    timings["reranked"] = scores is not None
+    reranker.record(timings["rerank_ms"], scores is None)
+    if scores is None:
+        return docs[:options.top_k]
+    return apply_scores(docs, scores, options.top_k)
+
+def _cache_answer(collection: Collection, version: int, vector: np.ndarray, query: str, answer: str,
+                  docs: List[Dict[str, Any]], options: SearchOptions) -> None:
+    collection.answer_cache.store(version, (answer, docs), query, *options)
+    if collection.semantic_cache.enabled:
+        collection.semantic_cache.store(version, vector, (answer, docs), query, *options)
+
+async def _answer_query(collection: Collection, query: str, options: SearchOptions,
+                        timings: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Batched retrieval, then generation on the event loop; stage times go into timings"""
+    start = time.perf_counter()
+    version, vector, cached = await _lookup_answer(collection, query, options, timings)
+    if cached is not None:
+        timings["cached"] = True
+        timings["total_ms"] = _ms(start)
+        return cached
+    docs = await _retrieve(collection, query, vector, options, timings)
+    generate_start = time.perf_counter()
+    prompt, context = build_prompt(query, docs)
+    answer, model = await llm_manager.generate_with_model(prompt, context)
+    timings["generate_ms"] = _ms(generate_start)
+    timings["total_ms"] = _ms(start)
+    # Canned fallback responses are not cached so a recovered model gets another try
+    if model is not None and vector is not None:
+        # Nor are answers whose rerank overran its budget, so a repeat gets reranked order
+        if timings.get("reranked", True):
+            _cache_answer(collection, version, vector, query, answer, docs, options)
+    return answer, docs
+
+# Recent streamed answers, (time to first token, total) in ms
+stream_timings: deque = deque(maxlen=1000)
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _save_upload(source: Any, path: str) -> str:
+    """Copy an uploaded file to path in blocks, so large uploads are never held in memory; returns its SHA-256"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        while block := source.read(UPLOAD_BLOCK_SIZE):
+            digest.update(block)
+            out.write(block)
+    return digest.hexdigest()
 
 @router.post("/upload")
-async def upload_pdf(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
-    """Upload and process PDF files"""
+async def upload_pdf(
+    files: List[UploadFile] = File(...),
+    collection: str = Depends(collection_name)
+) -> Dict[str, Any]:
+    """Queue PDF files for background ingestion into a collection (created on first upload) and return the job id"""
+    job_dir: Optional[str] = None
+    queued = False
     try:
-        processed_files: List[str] = []
+        # A new collection is created by the job, so a failed upload leaves nothing behind
+        store = None
+        if collection_manager.exists(collection):
+            store = (await asyncio.to_thread(collection_manager.get, collection)).store
         failed_files: List[Dict[str, str]] = []
+        unchanged_files: List[str] = []
+        saved_files: List[Tuple[str, str]] = []
+        job_id = job_queue.new_job_id()
+        job_dir = job_queue.job_dir(job_id)
         
         for file in files:
             if not file.filename:
@@ -32,54 +328,70 @@ async def upload_pdf(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
                 failed_files.append({"filename": file.filename, "reason": "Not a PDF file"})
                 continue
                 
-            try:
-                # Save file temporarily
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                    content = await file.read()
-                    tmp_file.write(content)
-                    tmp_path = tmp_file.name
-                
-                # Extract text
-                text_chunks = extract_text_from_pdf(tmp_path)
-                
-                # If extract_text_from_pdf returns a list of chunks
-                if isinstance(text_chunks, list):
-                    text = " ".join(text_chunks)
-                else:
-                    text = text_chunks
-                
-                # Split into chunks and add to vector store
-                chunks = [text[i:i+1000] for i in range(0, len(text), 1000)]
-                docs_meta = [
-                    {"text": chunk, "source": file.filename, "chunk": i} 
-                    for i, chunk in enumerate(chunks)
-                ]
-                vector_store.add_documents(docs_meta)
-                
-                # Clean up
-                os.unlink(tmp_path)
-                
-                processed_files.append(file.filename)
-            except Exception as e:
-                failed_files.append({"filename": file.filename or "Unknown", "reason": str(e)})
+            # Save under the job directory so the job survives a restart; the copy runs off the event loop
+            path = os.path.join(job_dir, f"{len(saved_files)}.pdf")
+            content_hash = await asyncio.to_thread(_save_upload, file.file, path)
+            
+            # Identical re-uploads are a no-op and never reach the queue
+            if store is not None and store.find_document(content_hash) == file.filename:
+                await asyncio.to_thread(os.unlink, path)
+                unchanged_files.append(file.filename)
+                continue
+            saved_files.append((file.filename, path))
+        
+        if not saved_files:
+            if unchanged_files:
+                return {
+                    "message": "All files are already indexed",
+                    "job_id": None,
+                    "status": "unchanged",
+                    "queued": [],
+                    "unchanged": unchanged_files,
+                    "failed": failed_files
+                }
+            raise HTTPException(status_code=400, detail={"message": "No valid PDF files", "failed": failed_files})
+        
+        job_queue.enqueue(job_id, saved_files, collection)
+        queued = True
+        job_workers.notify()
         
         return {
-            "message": f"Processed {len(processed_files)} files",
-            "processed": processed_files,
+            "message": f"Queued {len(saved_files)} files",
+            "job_id": job_id,
+            "status": "queued",
+            "collection": collection,
+            "queued": [name for name, _ in saved_files],
+            "unchanged": unchanged_files,
             "failed": failed_files
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Files of an upload that was not queued (rejected, unchanged or failed) are dropped
+        if job_dir is not None and not queued:
+            await asyncio.to_thread(shutil.rmtree, job_dir, True)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> Dict[str, Any]:
+    """Get the status of an ingestion job"""
+    job = job_queue.describe(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.post("/query")
-async def query_documents(query: str = Query(..., min_length=1)) -> Dict[str, Any]:
+async def query_documents(
+    query: str = Query(..., min_length=1),
+    options: SearchOptions = Depends(search_options),
+    collection: Collection = Depends(open_collection)
+) -> Dict[str, Any]:
     """Query the document collection"""
     try:
-        # Search for relevant documents
-        docs = vector_store.similarity_search(query, top_k=5)
-        
-        # Generate answer using LLM
-        answer = generate_answer(query, docs, llm_manager)
+        # Search for relevant documents and generate answer using LLM
+        timings: Dict[str, Any] = {}
+        answer, docs = await _answer_query(collection, query, options, timings)
         
         # Extract sources
         sources = list(set([doc["source"] for doc in docs]))
@@ -87,50 +399,156 @@ async def query_documents(query: str = Query(..., min_length=1)) -> Dict[str, An
         return {
             "answer": answer,
             "sources": sources,
-            "documents": docs
+            "documents": docs,
+            "timings": timings
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/query-stream")
-async def query_documents_stream(query: str = Query(..., min_length=1)) -> StreamingResponse:
-    """Query the document collection with streaming response"""
+async def query_documents_stream(
+    query: str = Query(..., min_length=1),
+    options: SearchOptions = Depends(search_options),
+    collection: Collection = Depends(open_collection)
+) -> StreamingResponse:
+    """Query the document collection, streaming the answer as server-sent events"""
     try:
-        # Search for relevant documents
-        docs = vector_store.similarity_search(query, top_k=5)
-        
-        # Generate answer using LLM
-        answer = generate_answer(query, docs, llm_manager)
+        start = time.perf_counter()
+        timings: Dict[str, Any] = {}
+        version, vector, cached = await _lookup_answer(collection, query, options, timings)
+        if cached is not None:
+            docs = cached[1]
+        else:
+            docs = await _retrieve(collection, query, vector, options, timings)
         
         # Extract sources
         sources = list(set([doc["source"] for doc in docs]))
         
-        # Stream the response word by word
+        # Events: sources, then token per generated piece of text, then done with timings,
+        # or error if the model failed partway (the answer is then incomplete and not cached)
         async def generate_stream() -> AsyncGenerator[str, None]:
-            words = answer.split()
-            for i, word in enumerate(words):
-                yield word + (" " if i < len(words) - 1 else "")
-                await asyncio.sleep(0.05)  # Small delay for visual effect
+            yield _sse("sources", {"sources": sources, "documents": docs, "timings": timings})
+            first_token: Optional[float] = None
+            if cached is not None:
+                first_token = time.perf_counter()
+                yield _sse("token", {"text": cached[0]})
+            else:
+                prompt, context = build_prompt(query, docs)
+                parts: List[str] = []
+                model: Optional[str] = None
+                # Each token is forwarded as soon as the backend produces it
+                try:
+                    async with aclosing(llm_manager.stream_with_model(prompt, context)) as tokens:
+                        async for text, model in tokens:
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                            parts.append(text)
+                            yield _sse("token", {"text": text})
+                except StreamInterrupted as e:
+                    yield _sse("error", {"error": str(e)})
+                    return
+                if model is not None and vector is not None and timings.get("reranked", True):
+                    _cache_answer(collection, version, vector, query, "".join(parts), docs, options)
+            
+            end = time.perf_counter()
+            ttft_ms = round(((first_token or end) - start) * 1000, 1)
+            total_ms = round((end - start) * 1000, 1)
+            stream_timings.append((ttft_ms, total_ms))
+            yield _sse("done", {"time_to_first_token_ms": ttft_ms, "total_ms": total_ms, "cached": cached is not None})
         
-        return StreamingResponse(generate_stream(), media_type="text/plain")
+        return StreamingResponse(
+            generate_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _stream_stats() -> Dict[str, Any]:
+    if not stream_timings:
+        return {"requests": 0}
+    ttft, total = np.array(stream_timings).T
+    return {
+        "requests": len(stream_timings),
+        "time_to_first_token_ms": {f"p{q}": round(float(np.percentile(ttft, q)), 1) for q in (50, 90, 99)},
+        "total_ms": {f"p{q}": round(float(np.percentile(total, q)), 1) for q in (50, 90, 99)}
+    }
+
+@router.get("/live")
+async def live() -> Dict[str, str]:
+    """Liveness: answers as soon as the server runs, whatever is still loading"""
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def ready() -> JSONResponse:
+    """Readiness: 200 once the models and startup collections are loaded, 503 before (or if one failed)"""
+    return JSONResponse(startup.stats(), status_code=200 if startup.ready else 503)
+
 @router.get("/status")
-async def get_status() -> Dict[str, Any]:
-    """Get system status"""
+async def get_status(name: str = Depends(collection_name)) -> Dict[str, Any]:
+    """Get system status, with index details of one collection"""
+    if not startup.ready and not collection_manager.resident(name):
+        # Answer at once rather than waiting for the collection to load
+        return {
+            "status": "starting",
+            "collection": name,
+            "startup": startup.stats(),
+            "model_status": "ready" if llm_manager.current_model else "not configured",
+            "llm": llm_manager.status()
+        }
+    try:
+        collection = await asyncio.to_thread(open_collection, name)
+    except HTTPException:
+        # Nothing uploaded to it yet: report it as empty rather than opening (and creating) it
+        return {
+            "status": "online",
+            "collection": name,
+            "vector_store": {
+                "exists": False,
+                "document_count": 0,
+                "documents": 0,
+                "index_type": None,
+                "index_factory": None,
+                "awaiting_training": False
+            },
+            "collections": collection_manager.stats(),
+            "worker": {"pid": os.getpid(), "role": "reader" if collection_manager.read_only else "writer"},
+            "startup": startup.stats(),
+            "model_status": "ready" if llm_manager.current_model else "not configured",
+            "llm": llm_manager.status()
+        }
     try:
         # Check if vector store exists and has documents
-        index_exists = os.path.exists(os.path.join(VECTOR_STORE_PATH, "index.faiss"))
-        doc_count = len(vector_store.metadata) if hasattr(vector_store, 'metadata') else 0
+        vector_store = collection.store
+        index_exists = vector_store.store.exists
+        doc_count = vector_store.count
         
         return {
             "status": "online",
+            "collection": collection.name,
             "vector_store": {
                 "exists": index_exists,
-                "document_count": doc_count
+                "document_count": doc_count,
+                "documents": len(vector_store.documents),
+                "index_type": ann_index.describe(vector_store.index),
+                "index_factory": vector_store.index_factory,
+                "awaiting_training": vector_store.awaiting_training
+            },
+            "collections": collection_manager.stats(),
+            "worker": {"pid": os.getpid(), "role": "reader" if collection_manager.read_only else "writer"},
+            "startup": startup.stats(),
+            "embedding_cache": vector_store.embedding_cache.stats(),
+            "streaming": _stream_stats(),
+            "batching": {"embed": embed_batcher.stats(), "search": search_batcher.stats(), "rerank": rerank_batcher.stats()},
+            "rerank": dict(reranker.stats(), enabled=RERANK_ENABLED, candidates=RERANK_CANDIDATES, budget_ms=RERANK_BUDGET * 1000),
+            "query_cache": {
+                "index_version": vector_store.version,
+                "embeddings": vector_store.query_embeddings.stats(),
+                "answers": collection.answer_cache.stats(),
+                "semantic": collection.semantic_cache.stats()
             },
-            "model_status": "ready" if llm_manager.current_model else "not configured"
+            "model_status": "ready" if llm_manager.current_model else "not configured",
+            "llm": llm_manager.status()
         }
     except Exception as e:
         return {
@@ -138,23 +556,47 @@ async def get_status() -> Dict[str, Any]:
             "error": str(e)
         }
 
+@router.get("/collections")
+async def list_collections() -> Dict[str, Any]:
+    """Collections on disk, with document counts for the resident ones"""
+    resident = {c["name"]: c for c in collection_manager.stats()["resident"]}
+    return {
+        "collections": [
+            {"name": name, "resident": name in resident, "chunks": resident[name]["chunks"] if name in resident else None}
+            for name in collection_manager.names()
+        ]
+    }
+
+async def _queue_reset(collection: Collection) -> None:
+    """Reset the collection through the job queue, ordered with its ingestion jobs.
+
+    The writer's job workers carry it out; a read-only worker then reloads the
+    emptied collection.
+    """
+    job_id = job_queue.new_job_id()
+    job_queue.enqueue(job_id, [], collection.name, kind=RESET)
+    job_workers.notify()
+    deadline = time.monotonic() + RESET_TIMEOUT
+    while (job := job_queue.get(job_id)) is None or job["status"] not in (COMPLETED, FAILED):
+        if time.monotonic() > deadline:
+            raise HTTPException(status_code=504, detail=f"Reset of {collection.name!r} is still queued "
+                                                        f"behind earlier jobs (job {job_id})")
+        await asyncio.sleep(0.1)
+    if job["status"] == FAILED:
+        raise RuntimeError(job["error"])
+    if collection_manager.read_only:
+        await asyncio.to_thread(collection_manager.reload, collection)
+        collection.answer_cache.clear()
+        collection.semantic_cache.clear()
+
 @router.post("/reset")
-async def reset_index() -> Dict[str, str]:
-    """Reset the vector store index"""
+async def reset_index(collection: Collection = Depends(open_collection)) -> Dict[str, str]:
+    """Reset the vector store index of one collection"""
     try:
-        # Remove existing index files
-        index_file = os.path.join(VECTOR_STORE_PATH, "index.faiss")
-        meta_file = os.path.join(VECTOR_STORE_PATH, "meta.pkl")
-        
-        if os.path.exists(index_file):
-            os.remove(index_file)
-        if os.path.exists(meta_file):
-            os.remove(meta_file)
-            
-        # Reinitialize vector store
-        global vector_store
-        vector_store = VectorStore()
+        await _queue_reset(collection)
         
-        return {"message": "Index reset successfully"}
+        return {"message": f"Collection {collection.name!r} reset successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,152 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Hugging Face inference
+HF_API_KEY = os.getenv("HF_API_KEY", "")
+HF_LLM_MODEL = os.getenv("HF_LLM_MODEL", "mistralai/Mistral-7B-Instruct-v0.2")
+# Point at a local server (e.g. backend/scripts/stub_llm_server.py) for testing
+HF_API_BASE = os.getenv("HF_API_BASE", "https://api-inference.huggingface.co/models").rstrip("/")
+LLM_MAX_NEW_TOKENS = int(os.getenv("LLM_MAX_NEW_TOKENS", "256"))
+# Prompt tokens (question + packed context) sent to any model, also capped by its input window
+LLM_PROMPT_TOKENS = int(os.getenv("LLM_PROMPT_TOKENS", "1024"))
+# Seconds: per HTTP request, for a whole answer across fallbacks, and before a fallback model is raced
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60"))
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "3"))
+# Pooled connections in total, and in-flight requests allowed per model
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "4"))
+# Circuit breakers: consecutive failures that open a model's circuit, seconds before
+# it is probed again, and requests kept for its latency/error statistics
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+LLM_STATS_WINDOW = int(os.getenv("LLM_STATS_WINDOW", "50"))
+# Opt-in in-process CPU model at the end of the fallback chain, so answers do not depend
+# on the network, e.g. "google/flan-t5-base" (needs torch and transformers; downloaded
+# and loaded at startup). Concurrent requests share decoding steps, up to
+# LOCAL_LLM_MAX_BATCH sequences at a time
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "")
+LOCAL_LLM_QUANTIZE = os.getenv("LOCAL_LLM_QUANTIZE", "1") == "1"
+LOCAL_LLM_MAX_BATCH = int(os.getenv("LOCAL_LLM_MAX_BATCH", "8"))
+LOCAL_LLM_MAX_INPUT_TOKENS = int(os.getenv("LOCAL_LLM_MAX_INPUT_TOKENS", "512"))
+
+# Embeddings / vector store
+MODEL_NAME = os.getenv("MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+# Dimension of MODEL_NAME's vectors, so empty collections open without loading the model;
+# checked once the model loads (0 = ask the model)
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384" if MODEL_NAME.endswith("/all-MiniLM-L6-v2") else "0"))
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", os.path.join(BASE_DIR, "data", "faiss_index"))
+# Named collections each have their own store; "default" lives at VECTOR_STORE_PATH
+# itself and the others under COLLECTIONS_PATH/<name>, kept outside the default
+# store so resetting or migrating it never touches them. Collections are loaded on
+# first use and the least recently used are closed once the resident indexes
+# exceed the memory budget, or after sitting idle this long (0 = never)
+DEFAULT_COLLECTION = os.getenv("DEFAULT_COLLECTION", "default")
+COLLECTIONS_PATH = os.getenv("COLLECTIONS_PATH", os.path.join(BASE_DIR, "data", "collections"))
+COLLECTION_MEMORY_BUDGET = int(float(os.getenv("COLLECTION_MEMORY_BUDGET_MB", "1024")) * (1 << 20))
+COLLECTION_IDLE_SECONDS = float(os.getenv("COLLECTION_IDLE_SECONDS", "1800"))
+# Segments are merged in the background once there are this many
+COMPACT_MAX_SEGMENTS = int(os.getenv("COMPACT_MAX_SEGMENTS", "16"))
+# faiss index-factory string, e.g. "Flat", "IVF1024,Flat", "IVF1024,PQ48", "HNSW32".
+# Compressed codes: "SQfp16" (float16, 2 bytes per dimension), "SQ8" (int8, 1 byte,
+# also "IVF1024,SQ8" or "HNSW32,SQ8") or "LSH" (binary: one sign bit per dimension
+# after a random rotation, searched by Hamming distance)
+INDEX_FACTORY = os.getenv("INDEX_FACTORY", "Flat")
+# Rescoring: with a factor above 1, top_k times that many candidates are fetched from
+# the index and re-ranked by their exact score against the stored vectors (0 = off).
+# Binary indexes do not rank by inner product, so their candidates are always rescored
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "0"))
+# Storage type of the vectors in the segments: "float32", or "float16" to halve them
+# on disk (exact search and rescoring then score float16-rounded vectors). Existing
+# segments are converted as compaction rewrites them
+SEGMENT_VECTOR_DTYPE = os.getenv("SEGMENT_VECTOR_DTYPE", "float32")
+# Default search-time knobs, overridable per query
+SEARCH_NPROBE = int(os.getenv("SEARCH_NPROBE", "16"))
+SEARCH_EF_SEARCH = int(os.getenv("SEARCH_EF_SEARCH", "64"))
+# Searches never wait for writes: chunks added since the index was last rebuilt are
+# scored exactly next to it, and deleted ones filtered out. Once that many chunks
+# were added or deleted, a copy of the index is rebuilt with them while searches
+# keep using the current one
+INDEX_DELTA_MAX = int(os.getenv("INDEX_DELTA_MAX", "20000"))
+# Hybrid retrieval: dense and BM25 rankings of this many candidates each are merged
+# by weighted reciprocal rank fusion. The lexical weight (0 = dense only, 1 = BM25
+# only) is overridable per query; queries with codes, numbers or acronyms get the higher one
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.5"))
+HYBRID_IDENTIFIER_WEIGHT = float(os.getenv("HYBRID_IDENTIFIER_WEIGHT", "0.7"))
+RRF_RANK_CONSTANT = int(os.getenv("RRF_RANK_CONSTANT", "60"))
+# Filtered searches admitting at most this many chunks score them exactly; larger
+# filters are applied inside the index search as an id selector
+FILTER_EXACT_MAX = int(os.getenv("FILTER_EXACT_MAX", "4096"))
+
+# Optional cross-encoder reranking (also switchable per query): this many hybrid
+# candidates are rescored and the best top_k kept. A query whose rerank overruns
+# the budget keeps retrieval order
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BUDGET = float(os.getenv("RERANK_BUDGET_MS", "150")) / 1000
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+# CPU inference: "torch", "onnx" or "openvino". RERANK_MODEL_FILE selects a pre-quantized
+# ONNX export (e.g. onnx/model_qint8_avx512.onnx); RERANK_QUANTIZE=1 quantizes the torch model to int8
+RERANK_BACKEND = os.getenv("RERANK_BACKEND", "torch")
+RERANK_MODEL_FILE = os.getenv("RERANK_MODEL_FILE") or None
+RERANK_QUANTIZE = os.getenv("RERANK_QUANTIZE", "0") == "1"
+
+# Embedding cache (entries, LRU-evicted)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(BASE_DIR, "data", "embedding_cache.db"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "200000"))
+
+# Query caches (in memory, LRU + TTL); answers are dropped whenever the index changes
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+# Paraphrased questions reuse an answer above this cosine similarity; above 1 disables
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+
+# Concurrent queries are embedded and searched together: up to this many per batch,
+# waiting at most this long (ms) for a batch to fill
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "32"))
+QUERY_BATCH_WAIT = float(os.getenv("QUERY_BATCH_WAIT_MS", "2")) / 1000
+
+# Ingestion
+INGEST_PROCESSES = int(os.getenv("INGEST_PROCESSES", str(min(4, os.cpu_count() or 1))))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+# Large PDFs are parsed in page ranges across processes; embedded chunks are
+# written to the index every INGEST_FLUSH_CHUNKS so memory stays bounded
+INGEST_PAGES_PER_RANGE = int(os.getenv("INGEST_PAGES_PER_RANGE", "32"))
+INGEST_FLUSH_CHUNKS = int(os.getenv("INGEST_FLUSH_CHUNKS", "2048"))
+# Chunk size and overlap in embedding-model tokens (all-MiniLM-L6-v2 truncates at 256)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+# Background ingestion jobs
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(BASE_DIR, "data", "jobs.db"))
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(BASE_DIR, "data", "uploads"))
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "1"))
+
+# Several API processes (uvicorn --workers N) sharing this data directory: the one
+# holding WRITER_LOCK_PATH runs ingestion and resets, and publishes each collection's
+# index for the others once chunks added or deleted since the last publish exceed
+# SHARED_INDEX_DELTA of it. The other processes only search, with that index
+# memory-mapped read-only (its pages shared between them) plus the newer chunks in
+# a small in-memory index. They check a collection for changes at most every
+# INDEX_RELOAD_INTERVAL seconds as it is queried and reopen it in the background,
+# serving the previous version meanwhile. If the writer exits, one of them takes over
+MULTI_WORKER = os.getenv("MULTI_WORKER", "0") == "1"
+WRITER_LOCK_PATH = os.getenv("WRITER_LOCK_PATH", os.path.join(BASE_DIR, "data", "writer.lock"))
+SHARED_INDEX_DELTA = float(os.getenv("SHARED_INDEX_DELTA", "0.1"))
+INDEX_RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "1"))
+
+# Startup: the server accepts requests at once while the embedding model (and the
+# reranker and local model, when enabled) and these collections load in the
+# background; /api/ready reports when they are done. STARTUP_WARMUP runs dummy
+# batches through the models so the first queries do not pay for lazy initialisation
+STARTUP_COLLECTIONS = [c.strip() for c in os.getenv("STARTUP_COLLECTIONS", DEFAULT_COLLECTION).split(",") if c.strip()]
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
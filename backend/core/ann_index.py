@@ -0,0 +1,165 @@
+from __future__ import annotations
+import re
+import numpy as np
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, Tuple
+from backend.config.settings import SEARCH_NPROBE, SEARCH_EF_SEARCH
+
+# faiss is imported by the functions using it, so importing the app does not load it
+if TYPE_CHECKING:
+    import faiss
+
+# Vectors used for training are capped; k-means quality plateaus well before this
+MAX_TRAINING_VECTORS = 100_000
+# Scalar quantizer ranges and binary thresholds are estimated per dimension; a few
+# vectors would clip everything added later
+MIN_QUANTIZER_TRAINING = 1000
+
+
+def make_index(dim: int, factory: str) -> faiss.Index:
+    """Build an empty inner-product index from a faiss index-factory string.
+
+    "LSH" (or "LSH<bits>") builds a binary index: vectors are randomly rotated
+    and reduced to one sign bit per dimension (or <bits> bits), and searched
+    by Hamming distance, which does not rank by inner product (see rescore).
+    """
+    import faiss
+    lsh = re.fullmatch(r"LSH(\d*)", factory)
+    if lsh:
+        return faiss.IndexLSH(dim, int(lsh.group(1) or dim), True, True)
+    return faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+
+
+def ranks_by_inner_product(index: faiss.Index) -> bool:
+    import faiss
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+def min_training_size(factory: str) -> int:
+    """Vectors needed before an index of this type can be trained (0 if none)"""
+    needed = 0
+    ivf = re.search(r"IVF(\d+)", factory)
+    if ivf:
+        # faiss warns below 39 training points per centroid
+        needed = max(needed, 39 * int(ivf.group(1)))
+    pq = re.search(r"PQ\d+(?:x(\d+))?", factory)
+    if pq:
+        needed = max(needed, 39 * 2 ** int(pq.group(1) or 8))
+    if re.search(r"SQ\d|LSH", factory):
+        needed = max(needed, MIN_QUANTIZER_TRAINING)
+    return needed
+
+
+def train_index(dim: int, factory: str, batches: Iterable[np.ndarray], total: int) -> faiss.Index:
+    """Build and train an index of the configured type on a sample of the given vectors"""
+    index = make_index(dim, factory)
+    if index.is_trained:
+        return index
+    # Sample each batch proportionally so the whole corpus is never materialized
+    rng = np.random.default_rng(0)
+    fraction = min(1.0, MAX_TRAINING_VECTORS / max(total, 1))
+    sample = []
+    for batch in batches:
+        batch = np.asarray(batch, dtype="float32")
+        if fraction < 1.0:
+            batch = batch[rng.random(len(batch)) < fraction]
+        sample.append(batch)
+    index.train(np.ascontiguousarray(np.vstack(sample)))
+    return index
+
+
+def rescore(vectors: np.ndarray, ids: np.ndarray, take: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]],
+            k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(scores, ids) of the top k candidates per row by exact inner product.
+
+    ids are each row's candidates (-1 for none). take maps sorted ids to (ids
+    found, their float vectors), e.g. ChunkVectors.take; a candidate it does
+    not find is dropped. Candidates shared by several rows are read once.
+    """
+    found, stored = take(np.unique(ids[ids >= 0]))
+    scores = np.full(ids.shape, -np.inf, dtype="float32")
+    if len(found):
+        rows = np.minimum(np.searchsorted(found, ids), len(found) - 1)
+        r, c = np.nonzero(found[rows] == ids)
+        scores[r, c] = np.einsum("ij,ij->i", vectors[r], stored[rows[r, c]])
+    ids = np.where(np.isfinite(scores), ids, -1)
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+def unwrap(index: faiss.Index) -> faiss.Index:
+    """The index doing the actual search, below any IDMap wrapper"""
+    import faiss
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                  selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """Per-query search parameters for the knobs that apply to this index.
+
+    selector restricts results to the ids it accepts (the caller keeps it alive
+    for the duration of the search).
+    """
+    import faiss
+    base = unwrap(index)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(nprobe=nprobe or SEARCH_NPROBE)
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or SEARCH_EF_SEARCH)
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def memory_bytes(index: faiss.Index) -> int:
+    """Approximate memory held by an index: vector codes, graph links and the id map"""
+    import faiss
+    base = unwrap(index)
+    if isinstance(base, faiss.IndexHNSW):
+        # Codes in the storage index plus 2*M int32 links per vector on the base level
+        per_vector = faiss.downcast_index(base.storage).code_size + 8 * base.hnsw.nb_neighbors(1)
+    else:
+        per_vector = getattr(base, "code_size", None) or base.d * 4
+    if isinstance(base, faiss.IndexIVF):
+        per_vector += 8  # ids stored in the inverted lists
+    if isinstance(faiss.downcast_index(index), (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        per_vector += 16  # IndexIDMap2: id array plus reverse map
+    return int(index.ntotal * per_vector)
+
+
+def write_shared(index: faiss.Index, f) -> None:
+    """Serialize an IDMap-wrapped index to the open file f for read_shared.
+
+    The ids are written under a plain IndexIDMap: readers only search, so they
+    need no IndexIDMap2 reverse map.
+    """
+    import faiss
+    shared = faiss.IndexIDMap(faiss.IndexFlatIP(index.d))
+    shared.index = index.index
+    shared.own_fields = False
+    faiss.copy_array_to_vector(faiss.vector_to_array(faiss.downcast_index(index).id_map), shared.id_map)
+    shared.ntotal = index.ntotal
+    shared.metric_type = index.metric_type
+    faiss.write_index(shared, faiss.PyCallbackIOWriter(f.write))
+
+
+def read_shared(path: str) -> faiss.Index:
+    """A read-only index memory-mapped from a file written by write_shared.
+
+    Vector codes, inverted lists and graph stay in the page cache, so every
+    process mapping the same file shares one copy; only the id map is loaded.
+    """
+    import faiss
+    # IO_FLAG_MMAP_IFC also maps flat and HNSW codes; older faiss only maps inverted lists
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    return faiss.read_index(path, flags)
+
+
+def describe(index: faiss.Index) -> str:
+    return type(unwrap(index)).__name__
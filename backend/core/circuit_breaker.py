@@ -0,0 +1,121 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+import numpy as np
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """Per-model circuit breaker with rolling latency and error statistics.
+
+    Closed: requests flow and outcomes are recorded. After failure_threshold
+    consecutive failures, or an error rate above max_error_rate over the window,
+    the circuit opens and the model is skipped for cooldown seconds (doubling on
+    each failed probe, up to max_cooldown). Then it is half-open: a single probe
+    request is let through, and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown: float, window: int,
+                 max_error_rate: float = 0.5, max_cooldown: float = 600.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_error_rate = max_error_rate
+        self.state = CLOSED
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self.probing = False
+        # (succeeded, latency in seconds) of recent requests; succeeded is None for
+        # abandoned requests, whose latency is only a lower bound
+        self.outcomes: Deque[Tuple[Optional[bool], float]] = deque(maxlen=window)
+
+    def _refresh(self) -> None:
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.probing = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; in half-open state this claims the probe"""
+        self._refresh()
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    @property
+    def available(self) -> bool:
+        """Like allow, without claiming the half-open probe"""
+        self._refresh()
+        return self.state == CLOSED or (self.state == HALF_OPEN and not self.probing)
+
+    def record_success(self, latency: float) -> None:
+        self.outcomes.append((True, latency))
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            print(f"Circuit for {self.name} closed")
+        self.state = CLOSED
+        self.cooldown = self.base_cooldown
+        self.probing = False
+
+    def record_failure(self, latency: float) -> None:
+        self.outcomes.append((False, latency))
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            # Failed probe: back off harder before the next one
+            self._open(min(self.cooldown * 2, self.max_cooldown))
+        elif self.state == CLOSED and (
+            self.consecutive_failures >= self.failure_threshold
+            or (len(self.outcomes) >= 2 * self.failure_threshold and self.error_rate > self.max_error_rate)
+        ):
+            self._open(self.base_cooldown)
+
+    def release(self, elapsed: float) -> None:
+        """A request was abandoned (e.g. cancelled after losing a race) after elapsed seconds"""
+        self.outcomes.append((None, elapsed))
+        self.probing = False
+
+    def _open(self, cooldown: float) -> None:
+        self.state = OPEN
+        self.cooldown = cooldown
+        self.opened_at = time.monotonic()
+        self.probing = False
+        print(f"Circuit for {self.name} opened for {cooldown:.0f}s")
+
+    @property
+    def error_rate(self) -> float:
+        finished = [ok for ok, _ in self.outcomes if ok is not None]
+        if not finished:
+            return 0.0
+        return finished.count(False) / len(finished)
+
+    def latency(self, percentile: float) -> Optional[float]:
+        # A model that keeps losing races is at least as slow as it was when abandoned
+        latencies = [latency for ok, latency in self.outcomes if ok is not False]
+        return float(np.percentile(latencies, percentile)) if latencies else None
+
+    def score(self, default_latency: float) -> float:
+        """Expected seconds to a good answer: typical latency over success rate (lower is better)"""
+        latency = self.latency(50)
+        return (default_latency if latency is None else latency) / max(1.0 - self.error_rate, 0.05)
+
+    def stats(self, default_latency: float) -> Dict[str, Any]:
+        self._refresh()
+        p50, p95 = self.latency(50), self.latency(95)
+        return {
+            "state": self.state,
+            "requests": len(self.outcomes),
+            "error_rate": round(self.error_rate, 3),
+            "consecutive_failures": self.consecutive_failures,
+            "latency_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "score": round(self.score(default_latency), 3),
+            "retry_in_seconds": round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 1)
+            if self.state == OPEN else None,
+        }
@@ -0,0 +1,229 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from backend.core.embedder import Embedder
+from backend.core.vector_store import VectorStore
+from backend.core.query_cache import AnswerCache, SemanticCache
+from backend.config.settings import (
+    VECTOR_STORE_PATH, DEFAULT_COLLECTION, COLLECTIONS_PATH, COLLECTION_MEMORY_BUDGET, COLLECTION_IDLE_SECONDS,
+    ANSWER_CACHE_SIZE, QUERY_CACHE_TTL, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE, MULTI_WORKER,
+    INDEX_RELOAD_INTERVAL,
+)
+
+# Collection names double as directory names
+COLLECTION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+# Seconds between idle sweeps made on the lookup path
+SWEEP_INTERVAL = 60.0
+
+
+class Collection:
+    """A loaded collection: its vector store and the answer caches tied to its index version"""
+
+    def __init__(self, name: str, store: VectorStore):
+        self.name = name
+        self.store = store
+        self.answer_cache = AnswerCache(ANSWER_CACHE_SIZE, QUERY_CACHE_TTL)
+        self.semantic_cache = SemanticCache(SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE, QUERY_CACHE_TTL)
+        self.last_used = time.monotonic()
+        # Ingestion jobs writing to the collection; a pinned collection is never closed
+        self.pins = 0
+        # Read-only collections: when the store on disk was last checked for changes, and whether
+        # a reload is running
+        self.checked = time.monotonic()
+        self.reloading = False
+
+
+class CollectionManager:
+    """Named collections, each with its own segment store, sharing one embedding model.
+
+    A collection is opened on first access and kept in an LRU of resident
+    indexes. Once their estimated memory exceeds memory_budget, or a collection
+    has not been used for idle_seconds, the least recently used ones are
+    persisted and dropped; the next access reopens them from disk.
+
+    When several processes serve the same collections (shared), one of them
+    writes and publishes its indexes; the others are read_only, memory-map
+    them and reload a collection in the background once its store changes
+    on disk.
+    """
+
+    def __init__(self, embedder: Optional[Embedder] = None, root: str = COLLECTIONS_PATH,
+                 default_path: str = VECTOR_STORE_PATH, memory_budget: int = COLLECTION_MEMORY_BUDGET,
+                 idle_seconds: float = COLLECTION_IDLE_SECONDS, shared: bool = MULTI_WORKER,
+                 read_only: bool = False):
+        self.embedder = embedder or Embedder()
+        self.shared = shared
+        self.read_only = read_only
+        self.root = root
+        self.default_path = default_path
+        self.memory_budget = memory_budget
+        self.idle_seconds = idle_seconds
+        self.loads = 0
+        self.evictions = 0
+        self.reloads = 0
+        self._resident: "OrderedDict[str, Collection]" = OrderedDict()
+        # Held while a collection is opened or closed, so it never has two live stores
+        self._name_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def path(self, name: str) -> str:
+        if not COLLECTION_NAME.fullmatch(name):
+            raise ValueError(f"Invalid collection name {name!r}: use up to 64 letters, digits, '-' or '_'")
+        return self.default_path if name == DEFAULT_COLLECTION else os.path.join(self.root, name)
+
+    def exists(self, name: str) -> bool:
+        return name == DEFAULT_COLLECTION or name in self._resident or os.path.isdir(self.path(name))
+
+    def resident(self, name: str) -> bool:
+        return name in self._resident
+
+    def names(self) -> List[str]:
+        on_disk = [n for n in os.listdir(self.root) if COLLECTION_NAME.fullmatch(n)] if os.path.isdir(self.root) else []
+        return sorted({DEFAULT_COLLECTION, *on_disk, *self._resident})
+
+    def get(self, name: str, create: bool = False, pin: bool = False) -> Collection:
+        """The collection, opened if it is not resident; KeyError if it does not exist and create is False.
+
+        With pin, the caller must unpin() it when done writing.
+        """
+        path = self.path(name)
+        with self._lock:
+            collection = self._touch(name, pin)
+            name_lock = self._name_locks.setdefault(name, threading.Lock())
+        if collection is None:
+            with name_lock:
+                with self._lock:
+                    # Opened by a concurrent caller meanwhile
+                    collection = self._touch(name, pin)
+                if collection is None:
+                    if not create and not self.exists(name):
+                        raise KeyError(name)
+                    start = time.perf_counter()
+                    collection = Collection(name, self._open(path))
+                    collection.pins += pin
+                    with self._lock:
+                        self._resident[name] = collection
+                        self.loads += 1
+                    print(f"Opened collection {name!r} ({collection.store.count} chunks) in {time.perf_counter() - start:.2f} s")
+                    self.evict(keep=name)
+        else:
+            if self.read_only:
+                self._maybe_reload(collection)
+            if time.monotonic() - self._last_sweep > SWEEP_INTERVAL:
+                self.evict(keep=name)
+        return collection
+
+    def _open(self, path: str) -> VectorStore:
+        return VectorStore(path, self.embedder, read_only=self.read_only, publish=self.shared and not self.read_only)
+
+    def _maybe_reload(self, collection: Collection) -> None:
+        """Reload a read-only collection in the background if the writer changed it on disk.
+
+        Requests keep being served from the current store until the new one is open.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if collection.reloading or now - collection.checked < INDEX_RELOAD_INTERVAL:
+                return
+            collection.checked = now
+            if not collection.store.store.changed_on_disk():
+                return
+            collection.reloading = True
+        threading.Thread(target=self.reload, args=(collection,), name=f"reload-{collection.name}", daemon=True).start()
+
+    def reload(self, collection: Collection) -> None:
+        """Reopen a read-only collection from disk and swap it in"""
+        try:
+            with self._name_locks[collection.name]:
+                start = time.perf_counter()
+                store = self._open(collection.store.path)
+                # A new version invalidates the answers cached against the old index
+                store.version = collection.store.version + 1
+                collection.store = store
+                self.reloads += 1
+                print(f"Reloaded collection {collection.name!r} ({store.count} chunks) in {time.perf_counter() - start:.2f} s")
+        except Exception as e:
+            # Retried at the next check, e.g. when the writer was mid-publish
+            print(f"Reloading collection {collection.name!r} failed: {e!r}")
+        finally:
+            collection.reloading = False
+
+    def promote(self) -> None:
+        """Become the writer: resident read-only collections are dropped and reopened writable"""
+        with self._lock:
+            self.read_only = False
+            self._resident.clear()
+
+    def _touch(self, name: str, pin: bool) -> Optional[Collection]:
+        collection = self._resident.get(name)
+        if collection is not None:
+            self._resident.move_to_end(name)
+            collection.last_used = time.monotonic()
+            collection.pins += pin
+        return collection
+
+    def unpin(self, collection: Collection) -> None:
+        with self._lock:
+            collection.pins -= 1
+            collection.last_used = time.monotonic()
+        self.evict()
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Close idle collections, then least recently used ones until the resident indexes fit the budget"""
+        now = time.monotonic()
+        victims = []
+        with self._lock:
+            self._last_sweep = now
+            total = sum(c.store.memory_bytes() for c in self._resident.values())
+            for collection in list(self._resident.values()):
+                idle = self.idle_seconds > 0 and now - collection.last_used > self.idle_seconds
+                if collection.name == keep or collection.pins or not (idle or total > self.memory_budget):
+                    continue
+                name_lock = self._name_locks[collection.name]
+                if not name_lock.acquire(blocking=False):
+                    continue
+                total -= collection.store.memory_bytes()
+                del self._resident[collection.name]
+                victims.append((collection, name_lock))
+        for collection, name_lock in victims:
+            try:
+                # Searches still holding the store finish on it; it is freed with them
+                collection.store.close()
+                self.evictions += 1
+                print(f"Closed collection {collection.name!r}")
+            finally:
+                name_lock.release()
+
+    def close(self) -> None:
+        """Persist every resident collection (at shutdown)"""
+        with self._lock:
+            collections = list(self._resident.values())
+        for collection in collections:
+            collection.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            resident = [
+                {
+                    "name": c.name,
+                    "chunks": c.store.count,
+                    "memory_mb": round(c.store.memory_bytes() / (1 << 20), 2),
+                    "idle_seconds": round(now - c.last_used, 1),
+                    "pinned": c.pins > 0,
+                }
+                for c in reversed(self._resident.values())
+            ]
+        return {
+            "resident": resident,
+            "memory_mb": round(sum(c["memory_mb"] for c in resident), 2),
+            "memory_budget_mb": round(self.memory_budget / (1 << 20), 2),
+            "idle_seconds": self.idle_seconds,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+        }
@@ -0,0 +1,72 @@
+import time
+import threading
+import numpy as np
+from backend.core.embedding_cache import EmbeddingCache
+from backend.core.query_cache import TTLCache, normalize_query
+from backend.config.settings import MODEL_NAME, EMBEDDING_DIM, EMBED_BATCH_SIZE, QUERY_EMBEDDING_CACHE_SIZE, QUERY_CACHE_TTL
+
+
+class Embedder:
+    """The sentence-transformers model and its caches, shared by every collection.
+
+    The model (and torch with it) is imported and loaded on first use, so
+    creating an Embedder is cheap.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, dim: int = EMBEDDING_DIM):
+        self.model_name = model_name
+        self._model = None
+        # Known up front (when configured) so empty stores and caches can be sized without the model
+        self._dim = dim or None
+        self._lock = threading.Lock()
+        self.embedding_cache = EmbeddingCache(model_name)
+        # Repeated questions skip the model; kept in memory so queries do not fill the chunk cache
+        self.query_embeddings = TTLCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_CACHE_TTL)
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                start = time.perf_counter()
+                model = SentenceTransformer(self.model_name)
+                dim = model.get_sentence_embedding_dimension()
+                if self._dim is not None and dim != self._dim:
+                    raise ValueError(f"{self.model_name} produces {dim}-d vectors, not {self._dim}: set EMBEDDING_DIM")
+                self._model = model
+                print(f"Loaded embedding model {self.model_name} in {time.perf_counter() - start:.1f} s")
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def dim(self) -> int:
+        if self._dim is None:
+            self._dim = self.model.get_sentence_embedding_dimension()
+        return self._dim
+
+    def warm_up(self, batch_sizes=(1, 8)):
+        """Encode dummy batches, so the first real ones skip one-off kernel and allocator setup"""
+        for size in batch_sizes:
+            self._encode([f"warm-up sentence number {i}" for i in range(size)])
+
+    def _encode(self, texts):
+        return self.model.encode(texts, batch_size=EMBED_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True)
+
+    def embed(self, texts):
+        # Unchanged chunks (re-uploads, shared boilerplate) are served from the cache
+        return self.embedding_cache.encode(texts, self._encode)
+
+    def embed_queries(self, queries):
+        """Query embeddings, one row per query; uncached ones are encoded in a single batch"""
+        keys = [normalize_query(q) for q in queries]
+        vectors = [self.query_embeddings.get(key) for key in keys]
+        missing = {key: q for key, q, vec in zip(keys, queries, vectors) if vec is None}
+        if missing:
+            fresh = dict(zip(missing, self._encode(list(missing.values())).astype("float32")))
+            for key, vec in fresh.items():
+                self.query_embeddings.put(key, vec)
+            vectors = [fresh[key] if vec is None else vec for key, vec in zip(keys, vectors)]
+        return np.vstack(vectors).reshape(len(queries), self.dim)
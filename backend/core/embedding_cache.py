@@ -0,0 +1,123 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+from typing import List, Dict, Any, Callable
+from backend.config.settings import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_SIZE
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by hash of model name + normalized text, LRU-bounded"""
+
+    def __init__(self, model_name: str, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        # Running row count, so puts don't have to scan the table to decide on eviction
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+    def encode(self, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Embed texts, calling encoder only for those not already cached"""
+        keys = [self.key(t) for t in texts]
+        cached = self._get_many(list(set(keys)))
+
+        # Duplicates within the batch are embedded once
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = encoder(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._put_many(fresh)
+            cached.update(fresh)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return np.vstack([cached[key] for key in keys]).astype("float32")
+
+    def _get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found: Dict[bytes, np.ndarray] = {}
+        now = time.time()
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32")
+            if found:
+                # One transaction for all hits instead of an autocommit per row
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.execute("COMMIT")
+        return found
+
+    def _put_many(self, vectors: Dict[bytes, np.ndarray]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            # rowcount only counts rows that were actually new
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(v, dtype="float32").tobytes(), now) for key, v in vectors.items()],
+            ).rowcount
+            if inserted < len(vectors):
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, key) for key in vectors]
+                )
+            self._conn.execute("COMMIT")
+            self._count += inserted
+            self._evict()
+
+    def _evict(self) -> None:
+        if self._count <= self.max_entries:
+            return
+        # Another process sharing the file may have evicted already, so confirm before trimming
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if self._count <= self.max_entries:
+            return
+        # Evict a little extra so we are not trimming on every insert
+        excess = self._count - self.max_entries + self.max_entries // 20
+        self._count -= self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+        ).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._count
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,213 @@
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import List, Dict, Any, Tuple, Callable, Optional, Iterator, Deque
+from backend.utils.pdf_processor import chunk_pdf, page_count
+from backend.config.settings import INGEST_PROCESSES, EMBED_BATCH_SIZE, INGEST_PAGES_PER_RANGE, INGEST_FLUSH_CHUNKS
+
+STAGES = ("parse", "chunk", "embed", "index", "persist")
+
+# Called with the current stage and the per-file progress dict
+ProgressCallback = Callable[[str, Dict[str, Dict[str, Any]]], None]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionPipeline:
+    """Parse PDFs by page range in a process pool, embed chunks in shared batches, index in bounded flushes"""
+
+    def __init__(self, processes: int = INGEST_PROCESSES, batch_size: int = EMBED_BATCH_SIZE,
+                 pages_per_range: int = INGEST_PAGES_PER_RANGE, flush_chunks: int = INGEST_FLUSH_CHUNKS):
+        self.processes = processes
+        self.batch_size = batch_size
+        self.pages_per_range = pages_per_range
+        self.flush_chunks = flush_chunks
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Index updates are serialized; parsing and embedding are not
+        self._write_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Created lazily so importing the routes does not fork worker processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def run(self, vector_store, files: List[Tuple[str, str]],
+            on_progress: Optional[ProgressCallback] = None) -> Dict[str, Dict[str, Any]]:
+        """Ingest (filename, path) pairs into vector_store and return per-file results"""
+        progress: Dict[str, Dict[str, Any]] = {
+            name: {"filename": name, "status": "parsing", "pages": 0, "total_pages": 0, "chunks": 0, "embedded": 0}
+            for name, _ in files
+        }
+
+        def report(stage: str) -> None:
+            if on_progress:
+                on_progress(stage, progress)
+
+        def fail(name: str, reason: str) -> None:
+            progress[name].update(status="failed", reason=reason)
+
+        # Files whose exact content is already indexed are skipped before parsing
+        hashes: Dict[str, str] = {}
+        to_parse: List[Tuple[str, str]] = []
+        for name, path in files:
+            content_hash = file_sha256(path)
+            existing = vector_store.find_document(content_hash)
+            if existing is None and content_hash in hashes.values():
+                existing = next(n for n, h in hashes.items() if h == content_hash)
+            if existing == name:
+                progress[name].update(status="unchanged")
+            elif existing is not None:
+                progress[name].update(status="duplicate", reason=f"Same content as {existing}")
+            else:
+                hashes[name] = content_hash
+                to_parse.append((name, path))
+        # A re-uploaded file's previous version (the chunks below this id) stays until the new one is complete
+        previous_end = {name: max((end for _, end in vector_store.documents[name]["ranges"]), default=0)
+                        for name, _ in to_parse if name in vector_store.documents}
+
+        # Split files into page ranges so one large PDF is parsed by several processes
+        report("parse")
+        ranges: List[Tuple[str, str, int, int]] = []
+        for name, path in to_parse:
+            try:
+                pages = page_count(path)
+            except Exception as e:
+                fail(name, str(e))
+                continue
+            progress[name]["total_pages"] = pages
+            ranges.extend((name, path, start, min(start + self.pages_per_range, pages))
+                          for start in range(0, pages, self.pages_per_range))
+        last_range = {name: (start, end) for name, _, start, end in ranges}
+
+        # Chunks flow from parsing to embedding to the index in bounded batches,
+        # so memory does not grow with the size of the PDFs
+        start_time = time.perf_counter()
+        waiting: List[Dict[str, Any]] = []
+        embedded: List[Dict[str, Any]] = []
+        vectors: List[np.ndarray] = []
+        next_chunk: Dict[str, int] = {}
+        flushed: set = set()
+        finished: set = set()
+        hashed: set = set()
+        total = 0
+
+        def embed(all_waiting: bool) -> None:
+            while len(waiting) >= self.batch_size or (all_waiting and waiting):
+                batch = waiting[:self.batch_size]
+                del waiting[:self.batch_size]
+                vectors.append(vector_store.embed([d["text"] for d in batch]))
+                embedded.extend(batch)
+                for d in batch:
+                    progress[d["source"]]["embedded"] += 1
+                report("embed")
+
+        def flush() -> None:
+            nonlocal embedded, vectors, total
+            embed(all_waiting=True)
+            if not embedded:
+                return
+            all_vectors = np.vstack(vectors)
+            source_of = np.array([d["source"] for d in embedded], dtype=object)
+            with self._write_lock:
+                report("index")
+                for source in dict.fromkeys(source_of):
+                    rows = np.flatnonzero(source_of == source)
+                    vector_store.add_documents([embedded[i] for i in rows], vectors=all_vectors[rows],
+                                               persist=False, replace=False)
+                    flushed.add(source)
+                # Hashes are recorded once a file is complete, so a partial one is never "unchanged";
+                # only then is a previous version replaced
+                for source in (finished & flushed) - hashed:
+                    if source in previous_end:
+                        vector_store.set_document_hash(source, hashes[source], uploaded_at=int(time.time()))
+                        vector_store.remove_chunks(source, end=previous_end[source], persist=False)
+                    else:
+                        vector_store.set_document_hash(source, hashes[source])
+                    hashed.add(source)
+                report("persist")
+                vector_store.persist()
+            total += len(embedded)
+            embedded, vectors = [], []
+
+        for (name, _, start, end), chunks, error in self._parse_ranges(ranges, lambda n: progress[n]["status"] == "failed"):
+            if error is not None:
+                fail(name, str(error))
+                waiting[:] = [d for d in waiting if d["source"] != name]
+                keep = [i for i, d in enumerate(embedded) if d["source"] != name]
+                if len(keep) < len(embedded):
+                    all_vectors = np.vstack(vectors)
+                    embedded, vectors = [embedded[i] for i in keep], [all_vectors[keep]]
+                if name in flushed:
+                    # Drop the part already indexed rather than leave half a document; a
+                    # previous version of the file is kept
+                    with self._write_lock:
+                        vector_store.remove_chunks(name, start=previous_end.get(name, 0))
+                continue
+
+            first = next_chunk.get(name, 0)
+            waiting.extend(dict(chunk, source=name, chunk=first + i) for i, chunk in enumerate(chunks))
+            next_chunk[name] = first + len(chunks)
+            progress[name].update(status="embedding", pages=end, chunks=next_chunk[name])
+            if last_range[name] == (start, end):
+                if next_chunk[name]:
+                    finished.add(name)
+                else:
+                    fail(name, "No extractable text")
+            report("chunk")
+
+            embed(all_waiting=False)
+            if len(embedded) >= self.flush_chunks:
+                flush()
+        flush()
+
+        for entry in progress.values():
+            if entry["status"] == "embedding":
+                entry["status"] = "processed"
+        if total:
+            print(f"Ingested {total} chunks from {len(files)} files in {time.perf_counter() - start_time:.2f}s")
+        report("persist")
+        return progress
+
+    def _parse_ranges(self, ranges: List[Tuple[str, str, int, int]], skip: Callable[[str], bool]
+                      ) -> Iterator[Tuple[Tuple[str, str, int, int], List[Dict[str, Any]], Optional[Exception]]]:
+        """Chunk page ranges in the process pool, yielding results in order.
+
+        Only a few ranges are in flight at a time; the next ones are submitted
+        while the caller embeds, so parsing and embedding overlap.
+        """
+        pending = iter(ranges)
+        in_flight: Deque[Tuple[Tuple[str, str, int, int], Future]] = deque()
+
+        def submit() -> None:
+            for r in pending:
+                if not skip(r[0]):
+                    in_flight.append((r, self.executor.submit(chunk_pdf, r[1], r[2], r[3])))
+                    return
+
+        for _ in range(2 * self.processes):
+            submit()
+        while in_flight:
+            r, future = in_flight.popleft()
+            try:
+                chunks, error = future.result(), None
+            except Exception as e:
+                chunks, error = [], e
+            submit()
+            if not skip(r[0]):
+                yield r, chunks, error
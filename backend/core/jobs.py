@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from contextlib import closing
+from typing import List, Dict, Any, Tuple, Callable, Optional
+from backend.config.settings import JOBS_DB_PATH, UPLOAD_DIR, INGEST_JOB_WORKERS, DEFAULT_COLLECTION
+
+# Job lifecycle: queued -> running -> completed | failed
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+# What a job does: ingest uploaded files, or reset a collection
+INGEST, RESET = "ingest", "reset"
+
+
+class JobQueue:
+    """Ingestion job queue persisted in a local SQLite database, shared by every worker process"""
+
+    def __init__(self, db_path: str = JOBS_DB_PATH, upload_dir: str = UPLOAD_DIR):
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        os.makedirs(upload_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL DEFAULT 'ingest',
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    files TEXT NOT NULL,
+                    collection TEXT NOT NULL DEFAULT '',
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    stage_times TEXT NOT NULL DEFAULT '{}',
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )"""
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "collection" not in columns:
+                # Jobs queued before collections existed go to the default one
+                conn.execute("ALTER TABLE jobs ADD COLUMN collection TEXT NOT NULL DEFAULT ''")
+            if "kind" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN kind TEXT NOT NULL DEFAULT 'ingest'")
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call keeps the queue usable from any thread or process
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.upload_dir, job_id)
+
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def enqueue(self, job_id: str, files: List[Tuple[str, str]], collection: str = DEFAULT_COLLECTION,
+                kind: str = INGEST) -> None:
+        """Queue (filename, path) pairs already saved under job_dir(job_id) for ingestion into collection"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, files, collection, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(files), collection, time.time()),
+            )
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued job that may start and mark it running.
+
+        A reset is a barrier within its collection: it waits for the jobs
+        running there, and jobs queued after it wait until it has finished.
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """SELECT id FROM jobs AS j WHERE status = :queued
+                   AND NOT EXISTS (SELECT 1 FROM jobs AS r WHERE r.status = :running
+                                   AND r.collection = j.collection AND (j.kind = :reset OR r.kind = :reset))
+                   AND NOT EXISTS (SELECT 1 FROM jobs AS e WHERE e.status = :queued AND e.kind = :reset
+                                   AND e.collection = j.collection AND e.created_at < j.created_at)
+                   ORDER BY created_at LIMIT 1""",
+                {"queued": QUEUED, "running": RUNNING, "reset": RESET},
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get(row["id"])
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        for key in ("files", "progress", "stage_times"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key])
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with closing(self._connect()) as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def finish(self, job_id: str, error: Optional[str] = None) -> None:
+        self.update(job_id, status=FAILED if error else COMPLETED, error=error, finished_at=time.time())
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+    def requeue_interrupted(self) -> int:
+        """Put jobs left running by a previous process back in the queue"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = NULL, started_at = NULL WHERE status = ?", (QUEUED, RUNNING)
+            )
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("files", "progress", "stage_times"):
+            job[key] = json.loads(job[key])
+        job["collection"] = job["collection"] or DEFAULT_COLLECTION
+        return job
+
+    def describe(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status as reported by the API, including chunk counts and throughput"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        progress = job["progress"]
+        chunks = sum(f.get("chunks", 0) for f in progress.values())
+        embedded = sum(f.get("embedded", 0) for f in progress.values())
+        pages = sum(f.get("pages", 0) for f in progress.values())
+        total_pages = sum(f.get("total_pages", 0) for f in progress.values())
+        elapsed = None
+        if job["started_at"]:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+        # Embedding throughput once that stage is over, overall rate while it runs
+        rate_time = job["stage_times"].get("embed") or elapsed
+        return {
+            "job_id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "collection": job["collection"],
+            "stage": job["stage"],
+            "error": job["error"],
+            "files": list(progress.values()) or [{"filename": name} for name, _ in job["files"]],
+            "chunks": chunks,
+            "embedded": embedded,
+            "pages": pages,
+            "total_pages": total_pages,
+            "stage_seconds": job["stage_times"],
+            "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+            "chunks_per_second": round(embedded / rate_time, 2) if rate_time else None,
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+        }
+
+
+class JobWorkerPool:
+    """Background threads that consume the job queue"""
+
+    def __init__(self, queue: JobQueue, handler: Callable[[Dict[str, Any]], None],
+                 workers: int = INGEST_JOB_WORKERS, poll_interval: float = 1.0):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"Re-queued {requeued} interrupted ingestion jobs")
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was enqueued"""
+        self._wakeup.set()
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self.handler(job)
+            except Exception as e:
+                self.queue.finish(job["id"], error=str(e))
+            else:
+                self.queue.finish(job["id"])
@@ -0,0 +1,217 @@
+import re
+import math
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Words, plus identifiers such as part numbers and clause ids kept whole ("ax-000", "4.2.1")
+TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+MAX_TERM_BYTES = 32
+K1 = 1.2
+B = 0.75
+# Terms in more than this fraction of chunks barely move BM25 scores but have
+# the longest posting lists; they are skipped unless the query has nothing else
+COMMON_TERM_FRACTION = 0.25
+# Postings read per query term; longer lists are cut to their highest-impact entries
+MAX_POSTINGS_PER_TERM = 1024
+
+
+def tokenize(text: str) -> List[bytes]:
+    terms = []
+    for token in TOKEN.findall(text.lower()):
+        terms.append(token.encode("utf-8")[:MAX_TERM_BYTES])
+        if not token.isalnum():
+            # Compound identifiers also match on their parts
+            terms.extend(part.encode("utf-8")[:MAX_TERM_BYTES] for part in re.split(r"[-./_]", token) if part)
+    return terms
+
+
+class Postings:
+    """Inverted index of one segment (or pending batch) of chunks.
+
+    terms is a sorted fixed-width byte array, so lookups are a binary search
+    and every array can stay memory-mapped. Postings hold row numbers within
+    the part, ordered by BM25 impact within each term so long lists can be cut
+    short; ids maps rows to chunk ids and lengths holds each row's term count.
+    """
+
+    FILES = ("terms", "offsets", "rows", "tf", "lengths")
+
+    def __init__(self, terms, offsets, rows, tf, lengths, ids, pending=False):
+        self.pending = pending
+        # Plain ndarray views: np.memmap indexing adds per-call overhead
+        self.terms = np.asarray(terms)
+        self.offsets = np.asarray(offsets)
+        self.rows = np.asarray(rows)
+        self.tf = np.asarray(tf)
+        self.lengths = np.asarray(lengths)
+        self.ids = np.asarray(ids)
+        self.docs = len(lengths)
+        self.total_length = int(np.sum(lengths, dtype="int64"))
+
+    @classmethod
+    def build(cls, ids, texts: Iterable[str], pending=False) -> "Postings":
+        terms: List[bytes] = []
+        rows: List[int] = []
+        tfs: List[int] = []
+        lengths: List[int] = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            terms.extend(counts)
+            tfs.extend(counts.values())
+            rows.extend([row] * len(counts))
+        term_array = np.array(terms, dtype=f"S{MAX_TERM_BYTES}")
+        row_array = np.array(rows, dtype="int32")
+        tf = np.minimum(np.array(tfs, dtype="int64"), np.iinfo("uint16").max).astype("uint16")
+        length_array = np.array(lengths, dtype="int32")
+        impact = _impact(tf, length_array[row_array], max(float(np.mean(length_array)) if lengths else 1.0, 1.0))
+        order = np.lexsort((-impact, term_array))
+        vocabulary, starts = np.unique(term_array[order], return_index=True)
+        return cls(
+            vocabulary,
+            np.append(starts, len(order)).astype("int64"),
+            row_array[order],
+            tf[order],
+            length_array,
+            np.asarray(ids, dtype="int64"),
+            pending,
+        )
+
+    def save(self, base: str, write) -> None:
+        """Write the arrays next to a segment; write(path, fn) is the store's fsync'd writer"""
+        for name in self.FILES:
+            array = getattr(self, name)
+            write(f"{base}.lex.{name}.npy", lambda f, a=array: np.save(f, a))
+
+    @classmethod
+    def load(cls, base: str, ids) -> "Postings":
+        arrays = [np.load(f"{base}.lex.{name}.npy", mmap_mode="r") for name in cls.FILES]
+        return cls(*arrays, ids=ids)
+
+    def __len__(self) -> int:
+        return self.docs
+
+    def spans(self, terms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(starts, ends) of each term's postings; empty where a term does not occur"""
+        if not len(self.terms):
+            return np.zeros(len(terms), dtype="int64"), np.zeros(len(terms), dtype="int64")
+        i = np.minimum(np.searchsorted(self.terms, terms), len(self.terms) - 1)
+        found = self.terms[i] == terms
+        return np.where(found, self.offsets[i], 0), np.where(found, self.offsets[i + 1], 0)
+
+    def read(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(chunk ids, term frequencies, chunk lengths) of postings [start, end)"""
+        rows = self.rows[start:end]
+        return self.ids[rows], self.tf[start:end], self.lengths[rows]
+
+
+def _impact(tf, lengths, avg_length):
+    """BM25 term-frequency component (idf excluded)"""
+    tf = np.asarray(tf, dtype="float32")
+    return tf * (K1 + 1) / (tf + K1 * (1 - B + B * np.asarray(lengths, dtype="float32") / avg_length))
+
+
+_NONE = (np.empty(0, dtype="int64"), np.empty(0, dtype="float32"))
+
+
+class LexicalIndex:
+    """BM25 over the postings of every segment plus rows not yet persisted.
+
+    Each query term reads at most max_postings postings, taken from the
+    highest-impact end of every part's list, so the cost of a lookup does not
+    grow with the collection; terms rarer than that are scored exactly.
+    """
+
+    def __init__(self, max_postings: int = MAX_POSTINGS_PER_TERM):
+        self.parts: List[Postings] = []
+        self.max_postings = max_postings
+
+    def copy(self) -> "LexicalIndex":
+        copy = LexicalIndex(self.max_postings)
+        copy.parts = list(self.parts)
+        return copy
+
+    def append(self, part: Postings) -> None:
+        if len(part):
+            self.parts.append(part)
+
+    def extend(self, rows: List[Dict[str, Any]]) -> None:
+        self.append(Postings.build([r["id"] for r in rows], (r["text"] for r in rows), pending=True))
+
+    def seal(self, segment: Postings) -> None:
+        """Swap trailing pending parts for the persisted segment that now holds them"""
+        while self.parts and self.parts[-1].pending:
+            self.parts.pop()
+        self.append(segment)
+
+    def search(self, query: str, k: int, deleted=None, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(chunk ids, BM25 scores) of the k best chunks, best first, optionally only among sorted allowed ids"""
+        parts = list(self.parts)
+        docs = sum(p.docs for p in parts)
+        if not docs or (allowed is not None and not len(allowed)):
+            return _NONE
+        avg_length = sum(p.total_length for p in parts) / docs
+        # Under a filter, read enough postings to expect max_postings allowed ones
+        budget = self.max_postings if allowed is None else self.max_postings * docs / len(allowed)
+
+        terms = np.array(sorted(set(tokenize(query))), dtype=f"S{MAX_TERM_BYTES}")
+        if not len(terms):
+            return _NONE
+        # (parts, terms) arrays of posting ranges, found with one binary search per part
+        starts, ends = (np.stack(a) for a in zip(*(p.spans(terms) for p in parts)))
+        df = (ends - starts).sum(axis=0)
+        used = df > 0
+        if (used & (df <= COMMON_TERM_FRACTION * docs)).any():
+            used &= df <= COMMON_TERM_FRACTION * docs
+        if not used.any():
+            return _NONE
+
+        idf = np.log(1 + (docs - df + 0.5) / (df + 0.5))
+        all_ids, all_tf, all_lengths, all_idf = [], [], [], []
+        for t in np.flatnonzero(used):
+            for p in np.flatnonzero(ends[:, t] > starts[:, t]):
+                start, end = int(starts[p, t]), int(ends[p, t])
+                # Each part contributes in proportion to its share of the term
+                end = min(end, start + max(k, math.ceil(budget * (end - start) / df[t])))
+                ids, tf, lengths = parts[p].read(start, end)
+                if allowed is not None:
+                    keep = np.searchsorted(allowed, ids)
+                    keep = allowed[np.minimum(keep, len(allowed) - 1)] == ids
+                    ids, tf, lengths = ids[keep], tf[keep], lengths[keep]
+                all_ids.append(ids)
+                all_tf.append(tf)
+                all_lengths.append(lengths)
+                all_idf.append(np.full(len(ids), idf[t], dtype="float32"))
+        if not sum(len(ids) for ids in all_ids):
+            return _NONE
+        weights = np.concatenate(all_idf) * _impact(np.concatenate(all_tf), np.concatenate(all_lengths), avg_length)
+        ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype("float32")
+        if deleted is not None:
+            live = ~deleted.contains(ids)
+            ids, scores = ids[live], scores[live]
+        if len(ids) > k:
+            top = np.argpartition(-scores, k)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return ids[order], scores[order]
+
+
+def reciprocal_rank_fusion(rankings: List[Tuple[np.ndarray, float]], k: int, rank_constant: int = 60) -> List[int]:
+    """Merge (ids best-first, weight) rankings by weighted reciprocal rank; returns the top k ids"""
+    fused: Dict[int, float] = {}
+    for ids, weight in rankings:
+        if weight <= 0:
+            continue
+        for rank, chunk_id in enumerate(ids):
+            chunk_id = int(chunk_id)
+            if chunk_id >= 0:
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + weight / (rank_constant + rank + 1)
+    return sorted(fused, key=fused.__getitem__, reverse=True)[:k]
+
+
+def has_identifiers(query: str) -> bool:
+    """Whether the query names things embeddings retrieve poorly: codes, numbers, acronyms"""
+    return any(any(c.isdigit() for c in t) or not t.isalnum() or (t.isupper() and len(t) > 1)
+               for t in TOKEN.findall(query))
@@ -1,8 +1,54 @@
-import requests
-import requests
+import json
 import time
-from typing import Optional, List, Dict, Any
-from backend.config.settings import HF_API_KEY, HF_LLM_MODEL
+import asyncio
+import logging
+import importlib.util
+import httpx
+from abc import ABC, abstractmethod
+from contextlib import aclosing
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
+from backend.core.circuit_breaker import CircuitBreaker
+from backend.core.query_engine import Prompt, PackedPrompt
+from backend.config.settings import (
+    HF_API_KEY, HF_LLM_MODEL, HF_API_BASE, LLM_MAX_NEW_TOKENS,
+    LLM_TIMEOUT, LLM_DEADLINE, LLM_HEDGE_DELAY, LLM_MODEL_CONCURRENCY, LLM_POOL_SIZE,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN, LLM_STATS_WINDOW, LOCAL_LLM_MODEL,
+)
+
+logger = logging.getLogger(__name__)
+
+class ModelUnavailable(Exception):
+    """A model could not produce an answer"""
+
+class StreamInterrupted(ModelUnavailable):
+    """A streaming model failed after part of its answer was already yielded"""
+
+class ModelBackend(ABC):
+    """A model served outside the Hugging Face inference API, registered in LLMManager.backends.
+
+    name is its entry in the fallback chain; prompts are fitted to the budget
+    of model_name. Both calls raise ModelUnavailable when no answer can be
+    produced before deadline (event loop time).
+    """
+    name: str
+    model_name: str
+    
+    @abstractmethod
+    async def generate(self, prompt: str, deadline: float) -> str:
+        ...
+    
+    @abstractmethod
+    def stream(self, prompt: str, deadline: float) -> AsyncIterator[str]:
+        ...
+    
+    def status(self) -> Dict[str, Any]:
+        return {}
+    
+    def start(self) -> None:
+        """Begin loading in the background (at app startup) rather than on the first request"""
+    
+    async def aclose(self) -> None:
+        pass
 
 class LLMManager:
     def __init__(self):
@@ -14,58 +60,225 @@ class LLMManager:
             "google/flan-t5-base"
         ]
         self.current_model = HF_LLM_MODEL
-        self.api_url = f"https://api-inference.huggingface.co/models/{self.current_model}"
+        self.api_url = self._model_url(self.current_model)
         self.headers = {"Authorization": f"Bearer {HF_API_KEY}"} if HF_API_KEY else {}
+        self.breakers = {
+            m: CircuitBreaker(m, LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN, LLM_STATS_WINDOW) for m in self.models
+        }
+        # Connection pool and per-model limits, created inside the serving event loop
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        # Models run by a backend of their own instead of the inference API
+        self.backends: Dict[str, ModelBackend] = {}
+        if LOCAL_LLM_MODEL:
+            if importlib.util.find_spec("torch") and importlib.util.find_spec("transformers"):
+                from backend.core.local_llm import LocalSeq2SeqBackend
+                self.add_backend(LocalSeq2SeqBackend())
+            else:
+                print(f"Local model {LOCAL_LLM_MODEL} disabled: torch and transformers are not installed")
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared keep-alive client, so requests skip the TCP/TLS handshake"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0),
+                limits=httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE)
+            )
+            self._client_loop = loop
+            self._limits = {}
+        return self._client
+    
+    def add_backend(self, backend: ModelBackend) -> None:
+        """Append a model served by backend to the fallback chain"""
+        self.backends[backend.name] = backend
+        self.models.append(backend.name)
+        self.breakers[backend.name] = CircuitBreaker(backend.name, LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN, LLM_STATS_WINDOW)
+    
+    def _limit(self, model_name: str) -> asyncio.Semaphore:
+        # Caps in-flight requests per model so one slow model cannot take the whole pool
+        if model_name not in self._limits:
+            self._limits[model_name] = asyncio.Semaphore(LLM_MODEL_CONCURRENCY)
+        return self._limits[model_name]
+    
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        for backend in self.backends.values():
+            await backend.aclose()
+    
+    def _model_url(self, model_name: str) -> str:
+        return f"{HF_API_BASE}/{model_name}"
+    
+    def _payload(self, model_name: str, prompt: str) -> Dict[str, Any]:
+        """Model-specific payload preparation"""
+        if "flan-t5" in model_name.lower():
+            return {"inputs": f"Answer this question: {prompt}"}
+        elif "blenderbot" in model_name.lower():
+            return {"inputs": prompt}
+        else:
+            return {"inputs": prompt}
+    
+    def _extract_text(self, result: Any, prompt: str) -> str:
+        """Answer text from a non-streaming inference response"""
+        # Handle different response formats
+        if isinstance(result, list) and len(result) > 0:
+            if "generated_text" in result[0]:
+                # Extract only the new generated text, not the input prompt
+                generated = result[0]["generated_text"]
+                if generated.startswith(prompt):
+                    generated = generated[len(prompt):].strip()
+                return generated if generated else "I understand your question, but I need more context to provide a specific answer."
+            elif "translation_text" in result[0]:
+                return result[0]["translation_text"]
         
-    def _try_model(self, model_name: str, prompt: str, max_retries: int = 2) -> Optional[str]:
-        """Try to generate text with a specific model"""
-        api_url = f"https://api-inference.huggingface.co/models/{model_name}"
-        
-        for attempt in range(max_retries):
-            try:
-                # Model-specific payload preparation
-                if "flan-t5" in model_name.lower():
-                    payload = {"inputs": f"Answer this question: {prompt}"}
-                elif "blenderbot" in model_name.lower():
-                    payload = {"inputs": prompt}
-                else:
-                    payload = {"inputs": prompt}
-                
-                response = requests.post(
-                    api_url, 
-                    headers=self.headers, 
-                    json=payload,
-                    timeout=30
-                )
+        return "I understand your question, but I'm having trouble generating a detailed response right now."
+    
+    def _timeout(self, deadline: float) -> httpx.Timeout:
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            raise ModelUnavailable("deadline exceeded")
+        return httpx.Timeout(min(LLM_TIMEOUT, remaining), connect=min(5.0, remaining))
+    
+    async def _backoff(self, attempt: int, deadline: float) -> None:
+        remaining = deadline - asyncio.get_running_loop().time()
+        await asyncio.sleep(max(0.0, min(2 ** attempt, remaining)))
+    
+    def _route(self) -> List[str]:
+        """Models worth trying, healthiest and fastest first; open circuits are skipped"""
+        # Without an API key only backends of our own can answer
+        available = [m for m in self.models if self.breakers[m].available and (HF_API_KEY or m in self.backends)]
+        # Stable sort: models without statistics keep their configured order
+        return sorted(available, key=lambda m: self.breakers[m].score(LLM_HEDGE_DELAY))
+    
+    def _next_model(self, waiting: List[str]) -> Optional[str]:
+        """Pop the next model whose circuit lets a request through"""
+        while waiting:
+            model_name = waiting.pop(0)
+            if self.breakers[model_name].allow():
+                return model_name
+        return None
+    
+    async def _try_model(self, model_name: str, prompt: Prompt, deadline: float) -> str:
+        """Generate text with a specific model, recording the outcome on its circuit breaker"""
+        breaker = self.breakers[model_name]
+        start = time.monotonic()
+        try:
+            text = await self._call_model(model_name, prompt, deadline)
+        except asyncio.CancelledError:
+            # Lost a hedged race; says nothing about the model's health
+            breaker.release(time.monotonic() - start)
+            raise
+        except Exception:
+            breaker.record_failure(time.monotonic() - start)
+            raise
+        breaker.record_success(time.monotonic() - start)
+        return text
+    
+    async def _stream_model(self, model_name: str, prompt: Prompt, deadline: float) -> AsyncIterator[str]:
+        """Stream from a specific model; as with generate, the time to the whole answer counts as its latency.
+
+        Routing ranks models on one latency window shared by both paths, so
+        time to first token is not recorded here.
+        """
+        breaker = self.breakers[model_name]
+        start = time.monotonic()
+        started = False
+        try:
+            async with aclosing(self._call_model_stream(model_name, prompt, deadline)) as tokens:
+                async for text in tokens:
+                    started = True
+                    yield text
+            if not started:
+                raise ModelUnavailable(f"{model_name}: empty answer")
+        except (asyncio.CancelledError, GeneratorExit):
+            # Abandoned (lost a race, or the client went away): the latency is only a lower bound
+            breaker.release(time.monotonic() - start)
+            raise
+        except Exception:
+            breaker.record_failure(time.monotonic() - start)
+            raise
+        breaker.record_success(time.monotonic() - start)
+    
+    async def _call_model(self, model_name: str, prompt: Prompt, deadline: float, max_retries: int = 2) -> str:
+        """Generate text with a specific model, raising ModelUnavailable if it cannot"""
+        prompt = self._prepare_prompt(prompt, model_name)
+        if model_name in self.backends:
+            return await self.backends[model_name].generate(prompt, deadline)
+        async with self._limit(model_name):
+            for attempt in range(max_retries):
+                try:
+                    response = await self.client.post(
+                        self._model_url(model_name),
+                        json=self._payload(model_name, prompt),
+                        timeout=self._timeout(deadline)
+                    )
+                except httpx.HTTPError as e:
+                    if attempt < max_retries - 1:
+                        await self._backoff(0, deadline)
+                        continue
+                    raise ModelUnavailable(f"{model_name}: {e!r}") from e
                 
                 if response.status_code == 200:
-                    result = response.json()
-                    
-                    # Handle different response formats
-                    if isinstance(result, list) and len(result) > 0:
-                        if "generated_text" in result[0]:
-                            # Extract only the new generated text, not the input prompt
-                            generated = result[0]["generated_text"]
-                            if generated.startswith(prompt):
-                                generated = generated[len(prompt):].strip()
-                            return generated if generated else "I understand your question, but I need more context to provide a specific answer."
-                        elif "translation_text" in result[0]:
-                            return result[0]["translation_text"]
-                    
-                    return "I understand your question, but I'm having trouble generating a detailed response right now."
-                    
-                elif response.status_code == 503:
+                    return self._extract_text(response.json(), prompt)
+                if response.status_code == 503 and attempt < max_retries - 1:
                     # Model is loading, wait and retry
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
-                        continue
-                        
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
-                    time.sleep(1)
+                    await self._backoff(attempt, deadline)
                     continue
-                    
+                raise ModelUnavailable(f"{model_name}: HTTP {response.status_code}")
+        raise ModelUnavailable(f"{model_name}: no attempts left")
+    
+    async def _call_model_stream(self, model_name: str, prompt: Prompt, deadline: float, max_retries: int = 2) -> AsyncIterator[str]:
+        """Yield text as a specific model generates it, raising ModelUnavailable if it cannot.
 
+        Text-generation endpoints answer with server-sent events, one token each;
+        models without streaming support return the whole answer at once.
+        """
+        prompt = self._prepare_prompt(prompt, model_name)
+        if model_name in self.backends:
+            # Backends batch concurrent requests themselves, so no per-model limit applies
+            async with aclosing(self.backends[model_name].stream(prompt, deadline)) as tokens:
+                async for text in tokens:
+                    yield text
+            return
+        payload = self._payload(model_name, prompt)
+        payload["parameters"] = {"max_new_tokens": LLM_MAX_NEW_TOKENS, "return_full_text": False}
+        payload["stream"] = True
+        
+        async with self._limit(model_name):
+            for attempt in range(max_retries):
+                loading = False
+                request = self.client.stream("POST", self._model_url(model_name), json=payload, timeout=self._timeout(deadline))
+                try:
+                    async with request as response:
+                        if response.status_code == 503 and attempt < max_retries - 1:
+                            loading = True
+                        elif response.status_code != 200:
+                            raise ModelUnavailable(f"{model_name}: HTTP {response.status_code}")
+                        elif not response.headers.get("content-type", "").startswith("text/event-stream"):
+                            yield self._extract_text(json.loads(await response.aread()), prompt)
+                            return
+                        else:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                event = json.loads(line[len("data:"):])
+                                if "error" in event:
+                                    raise ModelUnavailable(f"{model_name}: {event['error']}")
+                                token = event.get("token") or {}
+                                if token.get("text") and not token.get("special"):
+                                    yield token["text"]
+                            return
+                except httpx.HTTPError as e:
+                    if attempt == max_retries - 1:
+                        raise ModelUnavailable(f"{model_name}: {e!r}") from e
+                # Model is loading (or the connection failed), wait and retry
+                await self._backoff(attempt if loading else 0, deadline)
+        raise ModelUnavailable(f"{model_name}: no attempts left")
     
     def _generate_simple_response(self, prompt: str, context: str = "") -> str:
         """Generate a simple rule-based response when API models fail"""
@@ -101,28 +314,149 @@ class LLMManager:
                 return f"Based on your uploaded documents: {context_summary}. This context from your files should provide relevant information for your inquiry."
             return "I understand your question. While I'm currently operating with limited capabilities, the context from your uploaded documents should contain information relevant to your query. Please refer to the source documents for more detailed information."
     
-    def generate(self, prompt: str, context: str = "") -> str:
+    
+    def prompt_models(self) -> List[str]:
+        """The models prompts may be fitted to: those of the fallback chain that can be called"""
+        return [self.backends[m].model_name if m in self.backends else m
+                for m in self.models if HF_API_KEY or m in self.backends]
+    
+    def _prepare_prompt(self, prompt: Prompt, model_name: str) -> str:
+        """The prompt text for a model; a packed prompt is fitted to that model's token budget"""
+        if isinstance(prompt, PackedPrompt):
+            backend = self.backends.get(model_name)
+            return prompt.render(backend.model_name if backend else model_name)
+        return prompt.strip()
+    
+    def _switch_to(self, model_name: str) -> None:
+        if model_name != self.current_model:
+            print(f"Switched to fallback model: {model_name}")
+            self.current_model = model_name
+            self.api_url = self._model_url(model_name)
+    
+    async def generate(self, prompt: Prompt, context: str = "") -> str:
         """Generate text with fallback models"""
-        if not HF_API_KEY:
-            return "Configuration error: Hugging Face API key not found. Please set HF_API_KEY environment variable."
-        
-        # Clean and prepare prompt
-        prompt = prompt.strip()
-        if len(prompt) > 1000:  # Limit prompt length
-            prompt = prompt[:1000] + "..."
+        return (await self.generate_with_model(prompt, context))[0]
+    
+    async def generate_with_model(self, prompt: Prompt, context: str = "") -> Tuple[str, Optional[str]]:
+        """Generate text with fallback models, also returning the model used (None for canned responses).
+
+        Models are tried healthiest first and those with an open circuit are
+        skipped. They are hedged rather than tried strictly in turn: the next one starts
+        whenever the running ones fail or stay silent for LLM_HEDGE_DELAY, and
+        the first good answer wins. Nothing runs past LLM_DEADLINE.
+        """
+        if not HF_API_KEY and not self.backends:
+            return "Configuration error: Hugging Face API key not found. Please set HF_API_KEY environment variable.", None
         
-        # Try each model in the fallback list
-        for model_name in self.models:
-            try:
-                result = self._try_model(model_name, prompt)
-                if result:
-                    if model_name != self.current_model:
-                        print(f"Switched to fallback model: {model_name}")
-                        self.current_model = model_name
-                        self.api_url = f"https://api-inference.huggingface.co/models/{model_name}"
-                    return result
-            except Exception as e:
-                continue
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LLM_DEADLINE
+        waiting = self._route()
+        running: Dict["asyncio.Task[str]", str] = {}
+        try:
+            while waiting or running:
+                model_name = self._next_model(waiting)
+                if model_name is not None:
+                    running[asyncio.ensure_future(self._try_model(model_name, prompt, deadline))] = model_name
+                if not running:
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(
+                    running, timeout=min(LLM_HEDGE_DELAY, remaining) if waiting else remaining,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    model_name = running.pop(task)
+                    if task.exception() is None:
+                        self._switch_to(model_name)
+                        return task.result(), model_name
+        finally:
+            for task in running:
+                if task.done():
+                    task.exception()  # finished alongside the winner; mark as retrieved
+                else:
+                    task.cancel()
         
         # If all models fail, return a simple rule-based response
-        return self._generate_simple_response(prompt, context)
\ No newline at end of file
+        return self._generate_simple_response(str(prompt), context), None
+    
+    async def stream(self, prompt: Prompt, context: str = "") -> AsyncIterator[str]:
+        """Yield answer text as it is generated, with the same fallbacks as generate (see stream_with_model)"""
+        async for text, _ in self.stream_with_model(prompt, context):
+            yield text
+    
+    async def stream_with_model(self, prompt: Prompt, context: str = "") -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """Yield (text, model) pairs as the answer is generated; model is None for canned responses.
+
+        Models are hedged as in generate_with_model until one produces its first
+        token; that model then streams the rest of the answer. If it fails after
+        that, StreamInterrupted is raised: the text yielded so far is incomplete.
+        """
+        if not HF_API_KEY and not self.backends:
+            yield "Configuration error: Hugging Face API key not found. Please set HF_API_KEY environment variable.", None
+            return
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + LLM_DEADLINE
+        waiting = self._route()
+        # Task fetching the first token -> (model, its stream)
+        running: Dict["asyncio.Task[str]", Tuple[str, AsyncIterator[str]]] = {}
+        winner: Optional[Tuple[str, AsyncIterator[str], str]] = None
+        try:
+            while (waiting or running) and winner is None:
+                model_name = self._next_model(waiting)
+                if model_name is not None:
+                    tokens = self._stream_model(model_name, prompt, deadline)
+                    running[asyncio.ensure_future(tokens.__anext__())] = (model_name, tokens)
+                if not running:
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(
+                    running, timeout=min(LLM_HEDGE_DELAY, remaining) if waiting else remaining,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    model_name, tokens = running.pop(task)
+                    if task.exception() is None:
+                        winner = (model_name, tokens, task.result())
+                        break
+        finally:
+            for task, (_, tokens) in running.items():
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+                await tokens.aclose()  # type: ignore[attr-defined]
+        
+        if winner is None:
+            # If all models fail, return a simple rule-based response
+            yield self._generate_simple_response(str(prompt), context), None
+            return
+        
+        model_name, tokens, first = winner
+        self._switch_to(model_name)
+        try:
+            yield first, model_name
+            async for text in tokens:
+                yield text, model_name
+        except (ModelUnavailable, httpx.HTTPError, ValueError) as e:
+            # Text already sent cannot be taken back, and no other model can continue it
+            logger.warning("Stream from %s interrupted: %r", model_name, e)
+            raise StreamInterrupted(f"{model_name}: {e!r}") from e
+        finally:
+            await tokens.aclose()  # type: ignore[attr-defined]
+    
+    def status(self) -> Dict[str, Any]:
+        """Circuit state and rolling statistics per model, in current routing order"""
+        order = {m: i for i, m in enumerate(self._route())}
+        return {
+            "current_model": self.current_model,
+            "models": {
+                m: dict(self.breakers[m].stats(LLM_HEDGE_DELAY), rank=order.get(m)) for m in self.models
+            },
+            "backends": {name: backend.status() for name, backend in self.backends.items()}
+        }
@@ -0,0 +1,337 @@
+import time
+import queue
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from backend.core.llm_manager import ModelBackend, ModelUnavailable
+from backend.config.settings import (
+    LOCAL_LLM_MODEL, LOCAL_LLM_QUANTIZE, LOCAL_LLM_MAX_BATCH, LOCAL_LLM_MAX_INPUT_TOKENS, LLM_MAX_NEW_TOKENS,
+)
+
+# Encoder outputs kept for repeated prompts (retries, hedged duplicates, repeated questions)
+ENCODER_CACHE_SIZE = 32
+
+
+class _Request:
+    """One generation: its prompt, the tokens produced so far and the caller's queue of text pieces"""
+
+    def __init__(self, prompt: str, max_new_tokens: int, loop: asyncio.AbstractEventLoop):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.loop = loop
+        self.pieces: "asyncio.Queue[Any]" = asyncio.Queue()
+        self.cancelled = False
+        self.tokens: List[int] = []
+        self.text = ""
+
+    def emit(self, item: Any) -> None:
+        """Hand a text piece, None (finished) or an exception to the waiting caller"""
+        self.loop.call_soon_threadsafe(self.pieces.put_nowait, item)
+
+
+class _Slot:
+    """A running sequence: its encoder output and its own (unpadded) key/value caches"""
+
+    def __init__(self, request: _Request, hidden, length: int):
+        self.request = request
+        self.hidden = hidden  # (1, length, d_model)
+        self.length = length
+        self.self_kv: List[Tuple[Any, Any]] = []  # per layer, (1, heads, steps, head_dim)
+        self.cross_kv: List[Tuple[Any, Any]] = []  # per layer, (1, heads, length, head_dim)
+        self.steps = 0
+        self.last = 0
+        self.done = False
+
+
+class LocalSeq2SeqBackend(ModelBackend):
+    """In-process CPU generation with a seq2seq model (flan-t5), batching requests continuously.
+
+    One engine thread owns the model. Each decoding step runs every active
+    sequence together, reusing their key/value caches, and new requests join
+    the running batch between steps instead of waiting for it to drain: their
+    prompts are encoded and their first token decoded in a prefill step, then
+    their caches are merged in. Finished sequences leave at once. Decoder
+    caches are left-padded to the batch's longest, which T5's relative
+    position bias tolerates; cross-attention caches are right-padded and
+    masked. Tokens are streamed to each caller as they are decoded.
+    """
+
+    def __init__(self, model_name: str = LOCAL_LLM_MODEL, quantize: bool = LOCAL_LLM_QUANTIZE,
+                 max_batch: int = LOCAL_LLM_MAX_BATCH, max_input_tokens: int = LOCAL_LLM_MAX_INPUT_TOKENS,
+                 max_new_tokens: int = LLM_MAX_NEW_TOKENS):
+        self.model_name = model_name
+        self.name = f"local/{model_name}"
+        self.quantize = quantize
+        self.max_batch = max_batch
+        self.max_input_tokens = max_input_tokens
+        self.max_new_tokens = max_new_tokens
+        self.model = None
+        self.tokenizer = None
+        self.error: Optional[Exception] = None
+        self._incoming: "queue.Queue[_Request]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._encoded: "OrderedDict[str, Any]" = OrderedDict()
+        self.requests = 0
+        self.generated = 0
+        self.steps = 0
+        self.encoder_hits = 0
+        # (time, tokens) per decoding step, for recent throughput
+        self._recent: Deque[Tuple[float, int]] = deque(maxlen=200)
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                # The model loads on the engine thread, so the first request waits for it, not the import
+                self._thread = threading.Thread(target=self._run, name="local-llm", daemon=True)
+                self._thread.start()
+
+    async def stream(self, prompt: str, deadline: float) -> AsyncIterator[str]:
+        if self.error is not None:
+            raise ModelUnavailable(f"{self.name}: {self.error!r}")
+        self.start()
+        loop = asyncio.get_running_loop()
+        request = _Request(prompt, self.max_new_tokens, loop)
+        self._incoming.put(request)
+        # The engine sets error before draining the queue, so a request it missed sees it here
+        if self.error is not None:
+            request.cancelled = True
+            raise ModelUnavailable(f"{self.name}: {self.error!r}")
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise ModelUnavailable(f"{self.name}: deadline exceeded")
+                try:
+                    item = await asyncio.wait_for(request.pieces.get(), remaining)
+                except asyncio.TimeoutError:
+                    raise ModelUnavailable(f"{self.name}: deadline exceeded")
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise ModelUnavailable(f"{self.name}: {item!r}") from item
+                yield item
+        finally:
+            # Lets the engine drop the sequence if the caller stopped reading
+            request.cancelled = True
+
+    async def generate(self, prompt: str, deadline: float) -> str:
+        return "".join([piece async for piece in self.stream(prompt, deadline)])
+
+    async def aclose(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 5)
+            self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        recent = list(self._recent)
+        elapsed = recent[-1][0] - recent[0][0] if len(recent) > 1 else 0.0
+        return {
+            "model": self.model_name,
+            "quantized": self.quantize,
+            "loaded": self.model is not None,
+            "error": repr(self.error) if self.error else None,
+            "requests": self.requests,
+            "tokens_generated": self.generated,
+            "decode_steps": self.steps,
+            "mean_batch": round(self.generated / self.steps, 2) if self.steps else None,
+            "tokens_per_second": round(sum(n for _, n in recent[1:]) / elapsed, 1) if elapsed else None,
+            "encoder_cache_hits": self.encoder_hits,
+        }
+
+    # Engine thread
+
+    def _load(self) -> None:
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+        start = time.perf_counter()
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        # Prompts end with the question, so overlong ones lose their start instead
+        tokenizer.truncation_side = "left"
+        model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name).eval()
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.tokenizer, self.model = tokenizer, model
+        print(f"Loaded local model {self.model_name}{' (int8 dynamic)' if self.quantize else ''} "
+              f"in {time.perf_counter() - start:.1f} s")
+
+    def _run(self) -> None:
+        import torch
+        try:
+            self._load()
+        except Exception as e:
+            self.error = e
+            print(f"Local model {self.model_name} unavailable: {e!r}")
+            while not self._incoming.empty():
+                self._incoming.get_nowait().emit(e)
+            return
+        active: List[_Slot] = []
+        batch: Optional[Dict[str, Any]] = None
+        with torch.inference_mode():
+            while not self._stopping.is_set():
+                newcomers = self._take_requests(self.max_batch - len(active), block=not active)
+                try:
+                    if newcomers:
+                        slots = self._prefill(newcomers)
+                        if batch is not None:
+                            self._unpack(batch, active)
+                        active += slots
+                        batch = None
+                    if any(s.done or s.request.cancelled for s in active):
+                        if batch is not None:
+                            self._unpack(batch, active)
+                        active = [s for s in active if not (s.done or s.request.cancelled)]
+                        batch = None
+                    if active:
+                        if batch is None:
+                            batch = self._pack(active)
+                        self._step(batch, active)
+                except Exception as e:
+                    # A failed step fails every sequence in it; the engine keeps serving
+                    for slot in active:
+                        slot.request.emit(e)
+                    for request in newcomers:
+                        request.emit(e)
+                    active, batch = [], None
+
+    def _take_requests(self, limit: int, block: bool) -> List[_Request]:
+        """Up to limit waiting requests; blocks briefly for one when the engine is idle"""
+        requests: List[_Request] = []
+        try:
+            if block:
+                requests.append(self._incoming.get(timeout=0.5))
+            while len(requests) < limit:
+                requests.append(self._incoming.get_nowait())
+        except queue.Empty:
+            pass
+        return [r for r in requests if not r.cancelled]
+
+    def _encode(self, requests: List[_Request]):
+        """Encoder outputs (1, length, d_model) per request, from the cache where possible"""
+        import torch
+        hidden: Dict[str, Any] = {}
+        missing = []
+        for request in requests:
+            if request.prompt in self._encoded:
+                self._encoded.move_to_end(request.prompt)
+                hidden[request.prompt] = self._encoded[request.prompt]
+                self.encoder_hits += 1
+            elif request.prompt not in missing:
+                missing.append(request.prompt)
+        if missing:
+            inputs = self.tokenizer(missing, return_tensors="pt", padding=True, truncation=True,
+                                    max_length=self.max_input_tokens)
+            states = self.model.get_encoder()(input_ids=inputs["input_ids"],
+                                              attention_mask=inputs["attention_mask"]).last_hidden_state
+            for i, prompt in enumerate(missing):
+                length = int(inputs["attention_mask"][i].sum())
+                hidden[prompt] = states[i:i + 1, :length].clone()
+                self._encoded[prompt] = hidden[prompt]
+                while len(self._encoded) > ENCODER_CACHE_SIZE:
+                    self._encoded.popitem(last=False)
+        return [hidden[r.prompt] for r in requests]
+
+    def _prefill(self, requests: List[_Request]) -> List[_Slot]:
+        """Encode new requests and decode their first token, giving each its own caches"""
+        import torch
+        self.requests += len(requests)
+        slots = [_Slot(r, h, h.shape[1]) for r, h in zip(requests, self._encode(requests))]
+        longest = max(s.length for s in slots)
+        hidden = torch.cat([_pad(s.hidden, 1, right=longest - s.length) for s in slots])
+        mask = torch.stack([torch.arange(longest) < s.length for s in slots]).long()
+        start = torch.full((len(slots), 1), self.model.config.decoder_start_token_id, dtype=torch.long)
+        out = self.model(encoder_outputs=(hidden,), attention_mask=mask, decoder_input_ids=start, use_cache=True)
+        past = _legacy_cache(out.past_key_values)
+        for i, slot in enumerate(slots):
+            slot.self_kv = [(layer[0][i:i + 1], layer[1][i:i + 1]) for layer in past]
+            slot.cross_kv = [(layer[2][i:i + 1, :, :slot.length], layer[3][i:i + 1, :, :slot.length]) for layer in past]
+            slot.steps = 1
+        self._advance(slots, out.logits[:, -1].argmax(-1).tolist())
+        return slots
+
+    def _pack(self, slots: List[_Slot]) -> Dict[str, Any]:
+        """Batch tensors for the current set of sequences"""
+        import torch
+        length = max(s.length for s in slots)
+        steps = max(s.steps for s in slots)
+        past = []
+        for layer in range(len(slots[0].self_kv)):
+            past.append((
+                torch.cat([_pad(s.self_kv[layer][0], 2, left=steps - s.steps) for s in slots]),
+                torch.cat([_pad(s.self_kv[layer][1], 2, left=steps - s.steps) for s in slots]),
+                torch.cat([_pad(s.cross_kv[layer][0], 2, right=length - s.length) for s in slots]),
+                torch.cat([_pad(s.cross_kv[layer][1], 2, right=length - s.length) for s in slots]),
+            ))
+        return {
+            "hidden": torch.cat([_pad(s.hidden, 1, right=length - s.length) for s in slots]),
+            "mask": torch.stack([torch.arange(length) < s.length for s in slots]).long(),
+            "decoder_mask": torch.stack([torch.arange(steps) >= steps - s.steps for s in slots]).long(),
+            "past": tuple(past),
+        }
+
+    def _unpack(self, batch: Dict[str, Any], slots: List[_Slot]) -> None:
+        """Copy each sequence's decoder cache back out of the batch, without its padding"""
+        steps = batch["decoder_mask"].shape[1]
+        for i, slot in enumerate(slots):
+            slot.self_kv = [(layer[0][i:i + 1, :, steps - slot.steps:], layer[1][i:i + 1, :, steps - slot.steps:])
+                            for layer in batch["past"]]
+
+    def _step(self, batch: Dict[str, Any], slots: List[_Slot]) -> None:
+        import torch
+        decoder_mask = torch.cat([batch["decoder_mask"], torch.ones(len(slots), 1, dtype=torch.long)], dim=1)
+        out = self.model(
+            encoder_outputs=(batch["hidden"],), attention_mask=batch["mask"],
+            decoder_input_ids=torch.tensor([[s.last] for s in slots]), decoder_attention_mask=decoder_mask,
+            past_key_values=_model_cache(batch["past"]), use_cache=True,
+        )
+        batch["past"] = _legacy_cache(out.past_key_values)
+        batch["decoder_mask"] = decoder_mask
+        for slot in slots:
+            slot.steps += 1
+        self._advance(slots, out.logits[:, -1].argmax(-1).tolist())
+
+    def _advance(self, slots: List[_Slot], tokens: List[int]) -> None:
+        """Record each sequence's next (greedy) token and stream the text it adds"""
+        self.steps += 1
+        self.generated += len(slots)
+        self._recent.append((time.perf_counter(), len(slots)))
+        eos = self.tokenizer.eos_token_id
+        for slot, token in zip(slots, tokens):
+            request = slot.request
+            if token != eos:
+                request.tokens.append(token)
+                slot.last = token
+                # Decoding the whole answer keeps SentencePiece word boundaries right
+                text = self.tokenizer.decode(request.tokens, skip_special_tokens=True)
+                if len(text) > len(request.text):
+                    request.emit(text[len(request.text):])
+                    request.text = text
+            if token == eos or len(request.tokens) >= request.max_new_tokens:
+                slot.done = True
+                request.emit(None)
+
+
+def _pad(tensor, dim: int, left: int = 0, right: int = 0):
+    """Zero-pad one dimension of a (batch, ...) tensor"""
+    if not left and not right:
+        return tensor
+    import torch.nn.functional as F
+    # F.pad takes (before, after) pairs starting from the last dimension
+    pairs = [0, 0] * (tensor.dim() - 1 - dim) + [left, right]
+    return F.pad(tensor, pairs)
+
+
+def _legacy_cache(past) -> Tuple:
+    """Per-layer (self k, self v, cross k, cross v) tuples, whatever cache class the model returned"""
+    return past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+
+
+def _model_cache(past: Tuple):
+    try:
+        from transformers import EncoderDecoderCache
+    except ImportError:
+        return past
+    return EncoderDecoderCache.from_legacy_cache(past)
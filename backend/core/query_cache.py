@@ -0,0 +1,197 @@
+import re
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+class AnswerCache(TTLCache):
+    """Answers keyed by normalized query + search settings, valid for one index version"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__(max_entries, ttl)
+        self.version: Optional[int] = None
+
+    def _check_version(self, version: int) -> bool:
+        """Whether version is current; a newer one invalidates every cached answer"""
+        with self._lock:
+            if self.version is None or version > self.version:
+                self._entries.clear()
+                self.version = version
+            return version == self.version
+
+    def lookup(self, version: int, query: str, *settings: Hashable) -> Optional[Any]:
+        if not self._check_version(version):
+            return None
+        return self.get((normalize_query(query),) + settings)
+
+    def store(self, version: int, value: Any, query: str, *settings: Hashable) -> None:
+        # An answer computed against an older index is not worth keeping
+        if self._check_version(version):
+            self.put((normalize_query(query),) + settings, value)
+
+
+class SemanticCache:
+    """Answers of past queries found by embedding similarity, so paraphrases reuse them.
+
+    Query embeddings are normalized, so inner product is cosine similarity. Like
+    AnswerCache, every entry belongs to one index version. The index is sized by
+    the first stored embedding, so creating a cache needs neither the model nor faiss.
+    """
+
+    NEIGHBOURS = 8
+
+    def __init__(self, threshold: float, max_entries: int, ttl: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        # Nearest-neighbour similarity of recent lookups, for threshold tuning
+        self.nearest: Deque[float] = deque(maxlen=1000)
+        self._index: Any = None
+        self._entries: "OrderedDict[int, Tuple[float, Tuple, str, Any]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold <= 1.0
+
+    def _check_version(self, version: int) -> bool:
+        if self.version is None or version > self.version:
+            self._clear()
+            self.version = version
+        return version == self.version
+
+    def _clear(self) -> None:
+        if self._index is not None:
+            self._index.reset()
+        self._entries.clear()
+
+    def _drop(self, ids: List[int]) -> None:
+        for i in ids:
+            del self._entries[i]
+        self._index.remove_ids(np.asarray(ids, dtype="int64"))
+
+    def lookup(self, version: int, vector: np.ndarray, *settings: Hashable) -> Optional[Tuple[Any, str, float]]:
+        """(value, cached query, similarity) of the closest match above the threshold"""
+        with self._lock:
+            if not self._check_version(version) or not self._entries:
+                self.misses += 1
+                return None
+            k = min(self.NEIGHBOURS, len(self._entries))
+            scores, ids = self._index.search(np.asarray(vector, dtype="float32").reshape(1, -1), k)
+            self.nearest.append(float(scores[0][0]))
+            now = time.monotonic()
+            expired = []
+            match = None
+            for score, i in zip(scores[0], ids[0]):
+                if score < self.threshold:
+                    break
+                expires, entry_settings, query, value = self._entries[int(i)]
+                if expires < now:
+                    expired.append(int(i))
+                elif entry_settings == settings:
+                    self._entries.move_to_end(int(i))
+                    match = (value, query, float(score))
+                    break
+            if expired:
+                self._drop(expired)
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return match
+
+    def store(self, version: int, vector: np.ndarray, value: Any, query: str, *settings: Hashable) -> None:
+        with self._lock:
+            if not self._check_version(version):
+                return
+            vector = np.asarray(vector, dtype="float32").reshape(1, -1)
+            if self._index is None:
+                import faiss
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.array([entry_id], dtype="int64"))  # type: ignore[reportCallIssue]
+            self._entries[entry_id] = (time.monotonic() + self.ttl, settings, query, value)
+            if len(self._entries) > self.max_entries:
+                # Least recently used first
+                excess = len(self._entries) - self.max_entries
+                self._drop([i for i, _ in zip(self._entries, range(excess))])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            nearest = np.array(self.nearest)
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                # Where recent queries fell relative to the threshold
+                "nearest_similarity": {
+                    f"p{q}": round(float(np.percentile(nearest, q)), 4) for q in (10, 50, 90)
+                } if len(nearest) else None,
+            }
@@ -1,4 +1,170 @@
-def generate_answer(query, docs, llm):
-    context = "\n".join([d["text"] for d in docs])
-    prompt = f"Answer the question using the context below:\n\nContext:\n{context}\n\nQuestion: {query}\nAnswer:"
-    return llm.generate(prompt, context)
\ No newline at end of file
+import re
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from backend.core.lexical_index import tokenize
+from backend.utils.pdf_processor import SENTENCE_END, PARAGRAPH_BREAK, TokenCounter, token_counter
+from backend.config.settings import HF_LLM_MODEL, LLM_MAX_NEW_TOKENS, LLM_PROMPT_TOKENS
+
+PROMPT_TEMPLATE = "Answer the question using the context below:\n\nContext:\n{context}\n\nQuestion: {query}\nAnswer:"
+
+# Input tokens each model accepts: the context window, less the answer for decoder-only
+# models. Every model is also capped at LLM_PROMPT_TOKENS, since input length drives latency
+MODEL_INPUT_TOKENS = {
+    "mistralai/Mistral-7B-Instruct-v0.2": 32768 - LLM_MAX_NEW_TOKENS,
+    "microsoft/DialoGPT-large": 1024 - LLM_MAX_NEW_TOKENS,
+    "facebook/blenderbot-400M-distill": 128,
+    "google/flan-t5-base": 512,
+}
+# Held back for model-specific wrapping of the prompt (e.g. flan-t5's instruction prefix)
+PROMPT_MARGIN_TOKENS = 8
+# Later chunks' sentences need this much more relevance per rank to be packed first
+RANK_DECAY = 0.1
+
+
+# model -> token counter. Loading a tokenizer may download it, so it is done at startup
+# (load_prompt_tokenizers), never while a request is being answered
+_token_counters: Dict[str, TokenCounter] = {}
+
+
+def estimate_tokens(texts: List[str]) -> List[int]:
+    return [len(text) // 4 + 1 for text in texts]
+
+
+def prompt_token_counter(model_name: str) -> TokenCounter:
+    """Token counts in the model's own tokenizer (loaded on first use), or an estimate when it cannot be loaded"""
+    if model_name not in _token_counters:
+        try:
+            _token_counters[model_name] = token_counter(model_name)
+        except Exception as e:
+            print(f"No tokenizer for {model_name} ({e!r}); estimating 4 characters per token")
+            _token_counters[model_name] = estimate_tokens
+    return _token_counters[model_name]
+
+
+def load_prompt_tokenizers(model_names: Iterable[str]) -> None:
+    for model_name in dict.fromkeys(model_names):
+        prompt_token_counter(model_name)
+
+
+def loaded_token_counter(model_name: str) -> TokenCounter:
+    """The model's token counter if its tokenizer is loaded, otherwise the estimate; never loads"""
+    return _token_counters.get(model_name, estimate_tokens)
+
+
+def _sentence_key(sentence: str) -> str:
+    return re.sub(r"\s+", " ", sentence).strip().lower()
+
+
+class PackedPrompt:
+    """A question with its retrieved context, rendered per model to fit that model's input budget.
+
+    Chunks are split into sentences and sentences already seen in a better
+    ranked chunk (chunk overlap, repeated boilerplate) are dropped. Sentences
+    sharing rare terms with the question are packed first, then the rest of the
+    budget is filled in retrieval order; kept sentences are shown in document
+    order, with "..." where some were left out. The question is always kept.
+    """
+
+    def __init__(self, query: str, docs: List[Dict[str, Any]], max_tokens: int = LLM_PROMPT_TOKENS):
+        self.query = query.strip()
+        self.max_tokens = max_tokens
+        # (chunk rank, starts a paragraph, text) per unique sentence, in retrieval and document order
+        self.sentences: List[Tuple[int, bool, str]] = []
+        seen = set()
+        for rank, doc in enumerate(docs):
+            for paragraph in PARAGRAPH_BREAK.split(doc["text"]):
+                for i, sentence in enumerate(SENTENCE_END.split(paragraph.strip())):
+                    key = _sentence_key(sentence)
+                    if key and key not in seen:
+                        seen.add(key)
+                        self.sentences.append((rank, i == 0, sentence.strip()))
+        self.order = self._packing_order()
+        # model -> (prompt, context, prompt tokens)
+        self._rendered: Dict[Optional[str], Tuple[str, str, int]] = {}
+
+    def _packing_order(self) -> List[int]:
+        """Sentence indices, relevant ones first (by BM25 idf of shared query terms), then the rest by rank"""
+        terms = [set(tokenize(text)) for _, _, text in self.sentences]
+        n = len(terms)
+        scores = []
+        for query_term in set(tokenize(self.query)):
+            df = sum(query_term in t for t in terms)
+            if df:
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                scores.append({j: idf for j, t in enumerate(terms) if query_term in t})
+        relevance = [sum(s.get(j, 0.0) for s in scores) / (1 + RANK_DECAY * self.sentences[j][0]) for j in range(n)]
+        relevant = sorted((j for j in range(n) if relevance[j] > 0), key=lambda j: -relevance[j])
+        return relevant + [j for j in range(n) if relevance[j] <= 0]
+
+    def budget(self, model_name: Optional[str] = None) -> int:
+        return min(self.max_tokens, MODEL_INPUT_TOKENS.get(model_name or HF_LLM_MODEL, self.max_tokens))
+
+    def _pack(self, model_name: Optional[str]) -> Tuple[str, str, int]:
+        count = loaded_token_counter(model_name or HF_LLM_MODEL)
+        texts = [text for _, _, text in self.sentences]
+        fixed, *costs = count([PROMPT_TEMPLATE.format(context="", query=self.query)] + texts)
+        budget = self.budget(model_name) - PROMPT_MARGIN_TOKENS
+        remaining = budget - fixed
+        kept = []
+        for i in self.order:
+            # One more for the space, newline or "..." joining it to its neighbours
+            cost = costs[i] + 1
+            if cost <= remaining:
+                kept.append(i)
+                remaining -= cost
+        prompt, context = self._render(kept)
+        tokens = count([prompt])[0]
+        # Joins can tokenize differently from the estimate; drop the least relevant until it fits
+        while kept and tokens > budget:
+            kept.pop()
+            prompt, context = self._render(kept)
+            tokens = count([prompt])[0]
+        return prompt, context, tokens
+
+    def _render(self, kept: List[int]) -> Tuple[str, str]:
+        parts: List[str] = []
+        previous = None
+        for i in sorted(kept):
+            rank, paragraph_start, text = self.sentences[i]
+            if previous is None:
+                parts.append(text)
+            elif self.sentences[previous][0] != rank:
+                parts.append("\n\n" + text)
+            elif previous != i - 1:
+                parts.append(" ... " + text)
+            else:
+                parts.append(("\n" if paragraph_start else " ") + text)
+            previous = i
+        context = "".join(parts)
+        return PROMPT_TEMPLATE.format(context=context, query=self.query), context
+
+    def _packed(self, model_name: Optional[str]) -> Tuple[str, str, int]:
+        if model_name not in self._rendered:
+            self._rendered[model_name] = self._pack(model_name)
+        return self._rendered[model_name]
+
+    def render(self, model_name: Optional[str] = None) -> str:
+        """The prompt for model_name (the configured model if None)"""
+        return self._packed(model_name)[0]
+
+    def context(self, model_name: Optional[str] = None) -> str:
+        return self._packed(model_name)[1]
+
+    def tokens(self, model_name: Optional[str] = None) -> int:
+        """Prompt length in the model's tokens (excluding the margin kept for model-specific wrapping)"""
+        return self._packed(model_name)[2]
+
+    def __str__(self) -> str:
+        return self.render()
+
+
+Prompt = Union[str, PackedPrompt]
+
+
+def build_prompt(query, docs):
+    prompt = PackedPrompt(query, docs)
+    return prompt, prompt.context()
+
+async def generate_answer(query, docs, llm):
+    prompt, context = build_prompt(query, docs)
+    return await llm.generate(prompt, context)
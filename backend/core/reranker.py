@@ -0,0 +1,97 @@
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from backend.config.settings import (
+    RERANK_MODEL, RERANK_BACKEND, RERANK_MODEL_FILE, RERANK_QUANTIZE, RERANK_MAX_LENGTH, RERANK_BATCH_SIZE,
+)
+
+RerankRequest = Tuple[str, List[Dict[str, Any]]]
+
+
+class Reranker:
+    """Cross-encoder rescoring of retrieved chunks, loaded on first use.
+
+    CPU options: the ONNX (or OpenVINO) backend of sentence-transformers with a
+    pre-quantized model file, or the PyTorch model with its linear layers
+    dynamically quantized to int8.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, backend: str = RERANK_BACKEND,
+                 model_file: Optional[str] = RERANK_MODEL_FILE, quantize: bool = RERANK_QUANTIZE,
+                 max_length: int = RERANK_MAX_LENGTH, batch_size: int = RERANK_BATCH_SIZE):
+        self.model_name = model_name
+        self.backend = backend
+        self.model_file = model_file
+        self.quantize = quantize and backend == "torch"
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+        self.applied = 0
+        self.timeouts = 0
+        self.pairs = 0
+        # Per-query rerank time in ms, including waits for a batch
+        self.latencies: deque = deque(maxlen=1000)
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                kwargs: Dict[str, Any] = {"max_length": self.max_length, "device": "cpu"}
+                if self.backend != "torch":
+                    kwargs["backend"] = self.backend
+                    if self.model_file:
+                        kwargs["model_kwargs"] = {"file_name": self.model_file}
+                model = CrossEncoder(self.model_name, **kwargs)
+                if self.quantize:
+                    import torch
+                    model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+                self._model = model
+                print(f"Loaded reranker {self.model_name} ({self.describe()})")
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def describe(self) -> str:
+        if self.backend != "torch":
+            return f"{self.backend}, {self.model_file}" if self.model_file else self.backend
+        return "torch, int8 dynamic" if self.quantize else "torch"
+
+    def score_batch(self, requests: List[RerankRequest]) -> List[np.ndarray]:
+        """Relevance scores of every request's chunks, from a single batched predict call"""
+        pairs = [(query, doc["text"]) for query, docs in requests for doc in docs]
+        if not pairs:
+            return [np.empty(0) for _ in requests]
+        scores = np.asarray(self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False))
+        self.pairs += len(pairs)
+        bounds = np.cumsum([0] + [len(docs) for _, docs in requests])
+        return [scores[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def record(self, elapsed_ms: float, timed_out: bool) -> None:
+        self.latencies.append(elapsed_ms)
+        if timed_out:
+            self.timeouts += 1
+        else:
+            self.applied += 1
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = np.array(self.latencies)
+        return {
+            "model": self.model_name,
+            "backend": self.describe(),
+            "loaded": self.loaded,
+            "applied": self.applied,
+            "timeouts": self.timeouts,
+            "pairs_scored": self.pairs,
+            "latency_ms": {f"p{q}": round(float(np.percentile(latencies, q)), 1) for q in (50, 90, 99)} if len(latencies) else None,
+        }
+
+
+def apply_scores(docs: List[Dict[str, Any]], scores: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+    """The top_k docs by score; ties keep retrieval order"""
+    order = np.argsort(-np.asarray(scores, dtype="float32"), kind="stable")[:top_k]
+    return [docs[int(i)] for i in order]
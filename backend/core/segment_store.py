@@ -0,0 +1,598 @@
+import os
+import json
+import mmap
+import pickle
+import bisect
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Tuple, Optional, Union
+from backend.core.lexical_index import Postings
+from backend.config.settings import COMPACT_MAX_SEGMENTS, SEGMENT_VECTOR_DTYPE
+
+MANIFEST = "manifest.json"
+COLUMNAR = "columnar"
+
+
+def _fsync_write(path: str, write) -> None:
+    """Write a file under a temporary name, fsync it and rename it into place"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_columns(base: str, metadata: List[Dict[str, Any]]) -> List[str]:
+    """Write chunk metadata as an offsets array + UTF-8 text blob and per-field columns.
+
+    Sources are dictionary-encoded; every other field is stored as an int64
+    column (-1 where a row lacks it). Returns the names of those columns.
+    """
+    encoded = [m["text"].encode("utf-8") for m in metadata]
+    offsets = np.zeros(len(encoded) + 1, dtype="int64")
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    _fsync_write(base + ".offsets.npy", lambda f: np.save(f, offsets))
+    _fsync_write(base + ".text.bin", lambda f: f.writelines(encoded))
+
+    sources: Dict[str, int] = {}
+    source_ids = np.array([sources.setdefault(m["source"], len(sources)) for m in metadata], dtype="int32")
+    _fsync_write(base + ".source.npy", lambda f: np.save(f, source_ids))
+    _fsync_write(base + ".sources.json", lambda f: f.write(json.dumps(list(sources)).encode()))
+
+    columns = sorted({k for m in metadata for k in m} - {"text", "source"})
+    for column in columns:
+        values = np.array([int(m.get(column, -1)) for m in metadata], dtype="int64")
+        _fsync_write(f"{base}.{column}.npy", lambda f: np.save(f, values))
+    return columns
+
+
+def id_ranges(ids) -> List[List[int]]:
+    """Collapse sorted ids into [start, end) runs"""
+    ids = np.asarray(ids, dtype="int64")
+    if not len(ids):
+        return []
+    breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(ids)]))
+    return [[int(ids[s]), int(ids[e - 1]) + 1] for s, e in zip(starts, ends)]
+
+
+class RangeSet:
+    """Sorted, non-overlapping [start, end) id ranges with vectorized membership tests"""
+
+    def __init__(self, ranges=()):
+        self.ranges: List[List[int]] = []
+        for start, end in sorted(ranges):
+            self.add(start, end)
+
+    def add(self, start: int, end: int) -> None:
+        if start >= end:
+            return
+        i = bisect.bisect_left(self.ranges, [start, end])
+        self.ranges.insert(i, [start, end])
+        # Merge with neighbours that touch or overlap
+        merged: List[List[int]] = []
+        for r in self.ranges:
+            if merged and r[0] <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], r[1])
+            else:
+                merged.append(list(r))
+        self.ranges = merged
+
+    def copy(self) -> "RangeSet":
+        copy = RangeSet()
+        copy.ranges = [list(r) for r in self.ranges]
+        return copy
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids, dtype="int64")
+        if not self.ranges:
+            return np.zeros(len(ids), dtype=bool)
+        bounds = np.array(self.ranges, dtype="int64")
+        i = np.searchsorted(bounds[:, 0], ids, side="right") - 1
+        return (i >= 0) & (ids < bounds[np.maximum(i, 0), 1])
+
+    def __len__(self) -> int:
+        return sum(end - start for start, end in self.ranges)
+
+
+class SegmentMetadata:
+    """Read-only, memory-mapped metadata of one segment; rows are decoded on access"""
+
+    def __init__(self, base: str, columns: List[str]):
+        self.offsets = np.load(base + ".offsets.npy", mmap_mode="r")
+        self.source_ids = np.load(base + ".source.npy", mmap_mode="r")
+        with open(base + ".sources.json", "r") as f:
+            self.sources = json.load(f)
+        self.columns = {c: np.load(f"{base}.{c}.npy", mmap_mode="r") for c in columns}
+        self.ids = self.columns["id"]
+        self.text: Union[mmap.mmap, bytes] = b""
+        if self.offsets[-1] > 0:
+            with open(base + ".text.bin", "rb") as f:
+                self.text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def column(self, name: str) -> np.ndarray:
+        values = self.columns.get(name)
+        return np.full(len(self), -1, dtype="int64") if values is None else values
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        row = {
+            "text": self.text[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8"),
+            "source": self.sources[self.source_ids[i]],
+        }
+        for column, values in self.columns.items():
+            if values[i] != -1:
+                row[column] = int(values[i])
+        return row
+
+
+class PendingMetadata:
+    """Rows added in memory but not yet written to a segment"""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.ids = np.array([r["id"] for r in rows], dtype="int64")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def column(self, name: str) -> np.ndarray:
+        return np.array([int(r.get(name, -1)) for r in self.rows], dtype="int64")
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return self.rows[i]
+
+
+class ChunkMetadata:
+    """Lookup of chunk metadata by chunk id across segments and pending rows.
+
+    Ids are assigned in increasing order and compaction keeps that order, so
+    each part covers an increasing, disjoint id range.
+    """
+
+    def __init__(self):
+        self.parts: List[Union[SegmentMetadata, PendingMetadata]] = []
+        self._first_ids: List[int] = []
+
+    def copy(self) -> "ChunkMetadata":
+        """A copy sharing the parts, to be changed while searches read the original"""
+        copy = ChunkMetadata()
+        copy.parts = list(self.parts)
+        copy._first_ids = list(self._first_ids)
+        return copy
+
+    def append(self, part: Union[SegmentMetadata, PendingMetadata]) -> None:
+        if len(part):
+            self.parts.append(part)
+            self._first_ids.append(int(part.ids[0]))
+
+    def extend(self, rows: List[Dict[str, Any]]) -> None:
+        self.append(PendingMetadata(list(rows)))
+
+    def seal(self, segment: SegmentMetadata) -> None:
+        """Swap trailing pending rows for the persisted segment that now holds them"""
+        while self.parts and isinstance(self.parts[-1], PendingMetadata):
+            self.parts.pop()
+            self._first_ids.pop()
+        self.append(segment)
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self.parts)
+
+    def get(self, chunk_id: int) -> Optional[Dict[str, Any]]:
+        p = bisect.bisect_right(self._first_ids, chunk_id) - 1
+        if p < 0:
+            return None
+        ids = self.parts[p].ids
+        row = int(np.searchsorted(ids, chunk_id))
+        if row < len(ids) and ids[row] == chunk_id:
+            return self.parts[p][row]
+        return None
+
+    def take(self, chunk_ids) -> List[Dict[str, Any]]:
+        rows = (self.get(int(i)) for i in chunk_ids if i >= 0)
+        return [r for r in rows if r is not None]
+
+    def select(self, keep, chunk_ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Ids of the chunks (among sorted chunk_ids, if given) whose columns satisfy keep.
+
+        keep receives a function mapping a column name to that column's values
+        for the candidate rows and returns a boolean mask.
+        """
+        selected = []
+        for part in self.parts:
+            if chunk_ids is None:
+                rows = np.arange(len(part))
+            else:
+                inside = chunk_ids[(chunk_ids >= part.ids[0]) & (chunk_ids <= part.ids[-1])]
+                rows = np.searchsorted(part.ids, inside)
+                rows = rows[part.ids[rows] == inside]
+            if len(rows):
+                mask = keep(lambda name: np.asarray(part.column(name))[rows])
+                selected.append(np.asarray(part.ids)[rows][mask])
+        return np.concatenate(selected) if selected else np.empty(0, dtype="int64")
+
+
+class ChunkVectors:
+    """Vectors by chunk id across segments (memory-mapped) and pending rows.
+
+    Lets a search restricted to a few chunks score exactly those vectors
+    instead of scanning the index.
+    """
+
+    def __init__(self):
+        # (ids, vectors, pending) with each part's ids sorted, as in ChunkMetadata
+        self.parts: List[Tuple[np.ndarray, np.ndarray, bool]] = []
+
+    def copy(self) -> "ChunkVectors":
+        copy = ChunkVectors()
+        copy.parts = list(self.parts)
+        return copy
+
+    def append(self, ids, vectors: np.ndarray, pending: bool = False) -> None:
+        if len(ids):
+            self.parts.append((np.asarray(ids, dtype="int64"), vectors, pending))
+
+    def seal(self, ids, vectors: np.ndarray) -> None:
+        while self.parts and self.parts[-1][2]:
+            self.parts.pop()
+        self.append(ids, vectors)
+
+    def take(self, chunk_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids found, their vectors) for sorted chunk_ids"""
+        found_ids, found = [], []
+        for ids, vectors, _ in self.parts:
+            inside = chunk_ids[(chunk_ids >= ids[0]) & (chunk_ids <= ids[-1])]
+            rows = np.searchsorted(ids, inside)
+            rows = rows[ids[rows] == inside]
+            if len(rows):
+                found_ids.append(ids[rows])
+                found.append(np.asarray(vectors[rows], dtype="float32"))
+        if not found:
+            return np.empty(0, dtype="int64"), np.empty((0, 0), dtype="float32")
+        return np.concatenate(found_ids), np.vstack(found)
+
+
+class SegmentStore:
+    """Append-only on-disk storage for vectors and chunk metadata.
+
+    Every write adds a new immutable segment (vectors .npy + columnar metadata
+    + BM25 postings)
+    and then atomically swaps manifest.json to reference it, so persisting an
+    upload costs O(upload) and readers only ever see complete segments. Segments
+    are merged by a background compaction once there are too many of them.
+
+    The manifest also holds the document registry (source -> content hash and
+    chunk id ranges) and the id ranges of deleted chunks, which compaction
+    drops for good. When other processes search the store, it also references
+    the index last published for them (see publish_index).
+
+    A read_only store only reads what the writing process published: it never
+    repairs, upgrades or removes files.
+    """
+
+    def __init__(self, path: str, max_segments: int = COMPACT_MAX_SEGMENTS, read_only: bool = False):
+        self.path = path
+        self.max_segments = max_segments
+        self.read_only = read_only
+        self.manifest_file = os.path.join(path, MANIFEST)
+        self._lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        # While held, segments replaced by compaction keep their files (see hold_files)
+        self._holds = 0
+        self._retired: List[str] = []
+        # Taken before reading, so a manifest swapped meanwhile shows up as a change
+        self._stamp = self._manifest_stamp()
+        self.manifest = self._read_manifest()
+        if read_only:
+            return
+        os.makedirs(path, exist_ok=True)
+        self._remove_orphans()
+        self._upgrade_pickled_segments()
+        self._assign_missing_ids()
+        self._build_missing_postings()
+
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {"version": 0, "next_segment": 0, "next_id": 0, "segments": [], "documents": {}, "deleted": []}
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        manifest = self._empty_manifest()
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, "r") as f:
+                manifest.update(json.load(f))
+        return manifest
+
+    def _manifest_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.manifest_file)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def changed_on_disk(self) -> bool:
+        """Whether another process has written the manifest since this store read it"""
+        return self._manifest_stamp() != self._stamp
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        manifest["version"] += 1
+        _fsync_write(self.manifest_file, lambda f: f.write(json.dumps(manifest).encode()))
+        self.manifest = manifest
+        self._stamp = self._manifest_stamp()
+
+    def _base(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _remove_files(self, name: str) -> None:
+        for entry in os.listdir(self.path):
+            if entry.split(".")[0] == name:
+                try:
+                    os.remove(os.path.join(self.path, entry))
+                except OSError:
+                    # Still mapped by a reader on Windows; removed as an orphan later
+                    pass
+
+    @contextmanager
+    def hold_files(self):
+        """Keep the files of segments replaced by compaction until released.
+
+        Segments listed by a manifest read while holding can still be opened
+        after a compaction swapped them out; their files go with the last release.
+        """
+        with self._lock:
+            self._holds += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._holds -= 1
+                retired = []
+                if not self._holds:
+                    retired, self._retired = self._retired, []
+            for name in retired:
+                self._remove_files(name)
+
+    def _remove_orphans(self) -> None:
+        # Leftovers from a crash between writing a segment and swapping the manifest,
+        # and published indexes that readers still had mapped when they were replaced
+        live = {s["name"] for s in self.manifest["segments"]}
+        if self.shared_index:
+            live.add(self.shared_index["name"])
+        for entry in os.listdir(self.path):
+            if entry.startswith(("seg-", "index-")) and entry.split(".")[0] not in live:
+                os.remove(os.path.join(self.path, entry))
+
+    def _upgrade_pickled_segments(self) -> None:
+        # Segments written before metadata became columnar keep it in one pickle
+        for i, segment in enumerate(self.manifest["segments"]):
+            if segment.get("format") == COLUMNAR:
+                continue
+            with open(self._base(segment["name"]) + ".pkl", "rb") as f:
+                metadata = pickle.load(f)
+            vectors = np.load(self._base(segment["name"]) + ".npy")
+            upgraded = self._write_segment(vectors, metadata)
+            segments = list(self.manifest["segments"])
+            segments[i] = upgraded
+            self._write_manifest(dict(self.manifest, segments=segments))
+            self._remove_files(segment["name"])
+
+    def _assign_missing_ids(self) -> None:
+        # Segments written before chunks had ids get consecutive ones, and their
+        # sources are registered as documents (without a content hash)
+        segments = list(self.manifest["segments"])
+        documents = dict(self.manifest["documents"])
+        next_id = self.manifest["next_id"]
+        changed = False
+        for i, segment in enumerate(segments):
+            if "id" in segment["columns"]:
+                continue
+            ids = np.arange(next_id, next_id + segment["count"], dtype="int64")
+            _fsync_write(self._base(segment["name"]) + ".id.npy", lambda f: np.save(f, ids))
+            source_ids = np.load(self._base(segment["name"]) + ".source.npy")
+            with open(self._base(segment["name"]) + ".sources.json", "r") as f:
+                sources = json.load(f)
+            for s, source in enumerate(sources):
+                entry = documents.setdefault(source, {"hash": None, "ranges": [], "chunks": 0, "uploaded_at": None})
+                entry["ranges"] = RangeSet(entry["ranges"] + id_ranges(ids[source_ids == s])).ranges
+                entry["chunks"] += int(np.count_nonzero(source_ids == s))
+            segments[i] = dict(segment, columns=sorted(segment["columns"] + ["id"]))
+            next_id += segment["count"]
+            changed = True
+        if changed:
+            self._write_manifest(dict(self.manifest, segments=segments, documents=documents, next_id=next_id))
+
+    def _build_missing_postings(self) -> None:
+        # Segments written before hybrid retrieval get their postings built once
+        segments = list(self.manifest["segments"])
+        changed = False
+        for i, segment in enumerate(segments):
+            if segment.get("lexical"):
+                continue
+            rows = self.open_metadata(segment)
+            texts = (rows[j]["text"] for j in range(len(rows)))
+            Postings.build(rows.ids, texts).save(self._base(segment["name"]), _fsync_write)
+            segments[i] = dict(segment, lexical=True)
+            changed = True
+        if changed:
+            self._write_manifest(dict(self.manifest, segments=segments))
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_file)
+
+    @property
+    def version(self) -> int:
+        return self.manifest["version"]
+
+    @property
+    def next_id(self) -> int:
+        return self.manifest["next_id"]
+
+    @property
+    def documents(self) -> Dict[str, Dict[str, Any]]:
+        return self.manifest["documents"]
+
+    @property
+    def deleted(self) -> RangeSet:
+        return RangeSet(self.manifest["deleted"])
+
+    def __len__(self) -> int:
+        return sum(s["count"] for s in self.manifest["segments"])
+
+    def _write_segment(self, vectors: np.ndarray, metadata: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            name = f"seg-{self.manifest['next_segment']:06d}"
+            self.manifest["next_segment"] += 1
+        base = self._base(name)
+        _fsync_write(base + ".npy", lambda f: np.save(f, np.ascontiguousarray(vectors, dtype=SEGMENT_VECTOR_DTYPE)))
+        columns = _write_columns(base, metadata)
+        Postings.build([m.get("id", -1) for m in metadata], (m["text"] for m in metadata)).save(base, _fsync_write)
+        return {"name": name, "count": len(metadata), "format": COLUMNAR, "columns": columns, "lexical": True}
+
+    @property
+    def shared_index(self) -> Optional[Dict[str, Any]]:
+        """The index published for reader processes: its name, the first chunk id it
+        lacks (next_id), the deleted chunk count when written and whether it still
+        held deleted chunks (stale)"""
+        return self.manifest.get("shared_index")
+
+    def shared_index_path(self, shared: Dict[str, Any]) -> str:
+        return self._base(shared["name"]) + ".faiss"
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Dimension of the stored vectors, None while there are none"""
+        with self.hold_files():
+            segments = self.manifest["segments"]
+            return self.read_vectors(segments[0]).shape[1] if segments else None
+
+    def read_vectors(self, segment: Dict[str, Any]) -> np.ndarray:
+        return np.load(self._base(segment["name"]) + ".npy", mmap_mode="r")
+
+    def open_metadata(self, segment: Dict[str, Any]) -> SegmentMetadata:
+        return SegmentMetadata(self._base(segment["name"]), segment["columns"])
+
+    def open_postings(self, segment: Dict[str, Any], metadata: SegmentMetadata) -> Postings:
+        return Postings.load(self._base(segment["name"]), metadata.ids)
+
+    def open_segments(self) -> Iterator[Tuple[np.ndarray, SegmentMetadata, Postings]]:
+        """Yield (vectors, metadata, postings) for every segment in insertion order"""
+        with self.hold_files():
+            for segment in list(self.manifest["segments"]):
+                metadata = self.open_metadata(segment)
+                yield self.read_vectors(segment), metadata, self.open_postings(segment, metadata)
+
+    def segments(self) -> Iterator[Tuple[np.ndarray, SegmentMetadata]]:
+        """Yield (vectors, metadata) for every segment in insertion order"""
+        with self.hold_files():
+            for segment in list(self.manifest["segments"]):
+                yield self.read_vectors(segment), self.open_metadata(segment)
+
+    def append(self, vectors: Optional[np.ndarray], metadata: List[Dict[str, Any]],
+               documents: Optional[Dict[str, Optional[Dict[str, Any]]]] = None,
+               deleted: Optional[List[List[int]]] = None) -> Optional[Dict[str, Any]]:
+        """Persist a batch as a new segment together with registry changes and deletions.
+
+        documents maps source -> new registry entry (None removes it). Everything
+        is published by a single manifest swap. Returns the new segment entry.
+        """
+        segment = self._write_segment(vectors, metadata) if metadata else None
+        with self._lock:
+            manifest = dict(self.manifest)
+            if segment is not None:
+                manifest["segments"] = manifest["segments"] + [segment]
+                manifest["next_id"] = max(manifest["next_id"], max(m["id"] for m in metadata) + 1)
+            if documents:
+                registry = dict(manifest["documents"])
+                for source, entry in documents.items():
+                    if entry is None:
+                        registry.pop(source, None)
+                    else:
+                        registry[source] = entry
+                manifest["documents"] = registry
+            if deleted:
+                manifest["deleted"] = RangeSet(manifest["deleted"] + deleted).ranges
+            self._write_manifest(manifest)
+        self.maybe_compact()
+        return segment
+
+    def publish_index(self, write, next_id: int, deleted: int, stale: bool) -> None:
+        """Write an index for reader processes (write(f) serializes it) and swap the manifest to it.
+
+        The previous one is removed; readers that mapped it keep it until they reload.
+        """
+        with self._lock:
+            name = f"index-{self.manifest['next_segment']:06d}"
+            self.manifest["next_segment"] += 1
+        _fsync_write(self._base(name) + ".faiss", write)
+        with self._lock:
+            previous = self.shared_index
+            shared = {"name": name, "next_id": next_id, "deleted": deleted, "stale": stale}
+            self._write_manifest(dict(self.manifest, shared_index=shared))
+        if previous:
+            self._remove_files(previous["name"])
+
+    def maybe_compact(self) -> None:
+        if len(self.manifest["segments"]) < self.max_segments:
+            return
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(target=self.compact, name="segment-compaction", daemon=True)
+        self._compaction.start()
+
+    def compact(self) -> None:
+        """Merge a run of segments into one, dropping deleted chunks; appends made meanwhile are kept"""
+        segments = list(self.manifest["segments"])
+        deleted = self.deleted
+        # Leave a base segment alone while it outweighs everything after it
+        start = 0
+        while len(segments) - start > 2 and segments[start]["count"] > sum(s["count"] for s in segments[start + 1:]):
+            start += 1
+        merged = segments[start:]
+        if len(merged) < 2:
+            return
+        vectors, metadata = [], []
+        for segment in merged:
+            rows = self.open_metadata(segment)
+            keep = np.flatnonzero(~deleted.contains(rows.ids))
+            vectors.append(np.asarray(self.read_vectors(segment))[keep])
+            metadata.extend(rows[int(i)] for i in keep)
+        segment = self._write_segment(np.vstack(vectors), metadata) if metadata else None
+
+        with self._lock:
+            current = self.manifest["segments"]
+            # Segments are only ever appended, so the merged run keeps its position
+            if current[start:start + len(merged)] != merged:
+                if segment is not None:
+                    self._remove_files(segment["name"])
+                return
+            replacement = [segment] if segment is not None else []
+            segments = current[:start] + replacement + current[start + len(merged):]
+            self._write_manifest(dict(self.manifest, segments=segments))
+            held = self._holds > 0
+            if held:
+                self._retired.extend(old["name"] for old in merged)
+
+        if not held:
+            for old in merged:
+                self._remove_files(old["name"])
+        print(f"Compacted {len(merged)} segments into {len(metadata)} live vectors")
+
+    def wait(self) -> None:
+        """Block until a running compaction has finished"""
+        if self._compaction is not None:
+            self._compaction.join()
+
+    def clear(self) -> None:
+        """Remove all segments; the manifest goes first so a crash leaves an empty store"""
+        self.wait()
+        with self._lock:
+            if os.path.exists(self.manifest_file):
+                os.remove(self.manifest_file)
+            self.manifest = self._empty_manifest()
+            self._stamp = None
+            self._remove_orphans()
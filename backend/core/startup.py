@@ -0,0 +1,68 @@
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class StartupTasks:
+    """Loads models and indexes in background threads once the server is accepting requests.
+
+    Tasks run concurrently, one thread each. A request needing something still
+    loading waits for it (models and collections load under their own locks),
+    so nothing is loaded twice. ready turns true once every task has finished;
+    a failed task keeps it false and is reported with its error.
+    """
+
+    def __init__(self):
+        self._pending: List[Tuple[str, Callable[[], None]]] = []
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.started: Optional[float] = None
+        self._lock = threading.Lock()
+        self._finished = threading.Condition(self._lock)
+
+    def add(self, name: str, task: Callable[[], None]) -> None:
+        self._pending.append((name, task))
+        self.tasks[name] = {"state": "pending", "seconds": None, "error": None}
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        for name, task in self._pending:
+            threading.Thread(target=self._run, args=(name, task), name=f"startup-{name}", daemon=True).start()
+        self._pending = []
+
+    def _run(self, name: str, task: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        self._set(name, state="running")
+        try:
+            task()
+            state, error = "done", None
+        except Exception as e:
+            print(f"Startup task {name} failed: {e!r}")
+            state, error = "failed", repr(e)
+        self._set(name, state=state, error=error, seconds=round(time.perf_counter() - start, 2))
+
+    def _set(self, name: str, **fields: Any) -> None:
+        with self._lock:
+            self.tasks[name].update(fields)
+            self._finished.notify_all()
+
+    def _all(self, *states: str) -> bool:
+        return self.started is not None and all(t["state"] in states for t in self.tasks.values())
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self._all("done")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every task has finished (or failed); whether all succeeded"""
+        with self._lock:
+            self._finished.wait_for(lambda: self._all("done", "failed"), timeout)
+            return self._all("done")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self._all("done"),
+                "seconds_since_start": round(time.perf_counter() - self.started, 2) if self.started else None,
+                "tasks": {name: dict(task) for name, task in self.tasks.items()},
+            }
@@ -1,39 +1,658 @@
-import os, pickle, faiss
+from __future__ import annotations
+import os, pickle, time, threading
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from backend.config.settings import VECTOR_STORE_PATH, MODEL_NAME
+from typing import TYPE_CHECKING, Any, Dict, NamedTuple, Optional, Tuple
+from backend.core.segment_store import SegmentStore, ChunkMetadata, ChunkVectors, RangeSet, id_ranges
+from backend.core import ann_index
+from backend.core.lexical_index import LexicalIndex, reciprocal_rank_fusion, has_identifiers
+from backend.core.embedder import Embedder
+from backend.core.query_cache import TTLCache
+from backend.config.settings import (
+    VECTOR_STORE_PATH, INDEX_FACTORY, RESCORE_FACTOR, QUERY_CACHE_TTL, SHARED_INDEX_DELTA, INDEX_DELTA_MAX,
+    HYBRID_CANDIDATES, HYBRID_LEXICAL_WEIGHT, HYBRID_IDENTIFIER_WEIGHT, RRF_RANK_CONSTANT, FILTER_EXACT_MAX,
+)
+
+# faiss is imported where it is used, so importing the app does not load it
+if TYPE_CHECKING:
+    import faiss
+
+class SearchFilter(NamedTuple):
+    """Restricts a search to chunks of matching documents and pages; unset fields match everything.
+
+    Pages are 1-based and a chunk matches if it overlaps [page_from, page_to];
+    upload times are Unix seconds.
+    """
+    sources: Optional[Tuple[str, ...]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+    uploaded_after: Optional[int] = None
+    uploaded_before: Optional[int] = None
+
+# Added chunks are kept in delta parts of at least this many rows, so a search scores a few matrices
+DELTA_PART_ROWS = 4096
+
+class Snapshot(NamedTuple):
+    """One consistent version of a collection: index, chunk data and document registry.
+
+    A search reads the current snapshot once and uses nothing else, so it needs
+    no lock. Published snapshots are never modified: the writer builds the next
+    one from copies and swaps it in with a single assignment.
+    """
+    version: int
+    index: faiss.Index
+    # (ids, vectors) added since the index was built, scored exactly next to it
+    delta: Tuple[Tuple[np.ndarray, np.ndarray], ...]
+    metadata: ChunkMetadata
+    vectors: ChunkVectors
+    lexical: LexicalIndex
+    documents: Dict[str, Dict[str, Any]]
+    deleted: RangeSet
+    # Set while the index or delta may hold deleted chunks, which results then skip
+    stale: bool
 
 class VectorStore:
-    def __init__(self):
-        os.makedirs(VECTOR_STORE_PATH, exist_ok=True)
-        self.index_file = os.path.join(VECTOR_STORE_PATH, "index.faiss")
-        self.meta_file = os.path.join(VECTOR_STORE_PATH, "meta.pkl")
-        self.model = SentenceTransformer(MODEL_NAME)
-        self.dim = self.model.get_sentence_embedding_dimension()
-        if os.path.exists(self.index_file):
-            self.index = faiss.read_index(self.index_file)
-            with open(self.meta_file, "rb") as f:
-                self.metadata = pickle.load(f)
+    def __init__(self, path=VECTOR_STORE_PATH, embedder=None, read_only=False, publish=False):
+        """Index of the collection stored under path; collections pass in one shared embedder.
+
+        With several processes on one store, the writer publishes its index
+        (publish) and the others open it read_only: memory-mapped, plus an
+        in-memory delta of the chunks added since it was published.
+
+        Searches read a snapshot without locking; writes are serialized and
+        publish a new snapshot when done (see Snapshot).
+        """
+        self.path = path
+        self.read_only = read_only
+        self.publish = publish and not read_only
+        if not read_only:
+            os.makedirs(path, exist_ok=True)
+        # Pre-segment layout, migrated on first load
+        self.index_file = os.path.join(path, "index.faiss")
+        self.meta_file = os.path.join(path, "meta.pkl")
+        self.embedder = embedder or Embedder()
+        self.embedding_cache = self.embedder.embedding_cache
+        self.query_embeddings = self.embedder.query_embeddings
+        # (version, filter) -> (allowed chunk ids,), so repeated filters are resolved once
+        self.filter_ids = TTLCache(256, QUERY_CACHE_TTL)
+        self._dim = None
+        # Held by the single writer: additions, deletions, persist and reset
+        self._write_lock = threading.RLock()
+        # Set when the index was replaced by a different type and must be published again
+        self._publish_due = False
+        self.store = SegmentStore(path, read_only=read_only)
+        self.index_factory = INDEX_FACTORY
+        self.min_training_size = ann_index.min_training_size(INDEX_FACTORY)
+        self.rescore_factor = RESCORE_FACTOR
+        # Trained (empty) index cached so restarts skip k-means
+        self.trained_file = os.path.join(path, "trained-" + "".join(c if c.isalnum() else "_" for c in INDEX_FACTORY) + ".faiss")
+        self._snapshot = self._load(version=0)
+        if not read_only and not self.store.exists and os.path.exists(self.index_file):
+            self._migrate_legacy()
+        if self.publish:
+            self._maybe_publish()
+
+    @property
+    def snapshot(self):
+        """The current snapshot; pass it to allowed_ids and search_vectors to search one version"""
+        return self._snapshot
+
+    @property
+    def version(self):
+        # Bumped on every change to the indexed content; keys the answer cache
+        return self._snapshot.version
+
+    @version.setter
+    def version(self, version):
+        with self._write_lock:
+            self._snapshot = self._snapshot._replace(version=version)
+
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def metadata(self):
+        return self._snapshot.metadata
+
+    @property
+    def documents(self):
+        return self._snapshot.documents
+
+    @property
+    def deleted(self):
+        return self._snapshot.deleted
+
+    @property
+    def model(self):
+        return self.embedder.model
+
+    @property
+    def dim(self):
+        # Taken from the stored vectors when there are some, so loading does not wait for the model
+        if self._dim is None:
+            self._dim = self.store.dim or self.embedder.dim
+        return self._dim
+
+    def _load(self, version):
+        """Snapshot of the collection as stored on disk; the writer's pending state starts empty"""
+        self._pending = []
+        self._pending_documents = {}
+        self._pending_deleted = []
+        # Deleted since the index was built, removed from it at the next rebuild
+        self._unmerged_deleted = []
+        # Set when the index type cannot remove vectors and tombstones must always be filtered
+        self._index_stale = False
+        self._next_id = self.store.next_id
+        deleted = self.store.deleted
+        # Chunk metadata stays on disk (memory-mapped) and is decoded per result
+        metadata, vectors, lexical = ChunkMetadata(), ChunkVectors(), LexicalIndex()
+        for segment_vectors, segment_metadata, postings in self.store.open_segments():
+            metadata.append(segment_metadata)
+            vectors.append(segment_metadata.ids, segment_vectors)
+            lexical.append(postings)
+        if self.read_only:
+            index, delta, stale = self._open_shared_index(deleted)
+        else:
+            index = self._new_index(sum(entry["chunks"] for entry in self.store.documents.values()), deleted)
+            for live, ids in self._live_vectors(deleted):
+                index.add_with_ids(live, ids)  # type: ignore[reportCallIssue]
+            delta, stale = (), False
+        return Snapshot(version, index, delta, metadata, vectors, lexical, dict(self.store.documents), deleted, stale)
+
+    def _new_index(self, total, deleted):
+        """Empty index of the configured type, or flat until there is enough data to train it"""
+        import faiss
+        if self.min_training_size == 0:
+            index = ann_index.make_index(self.dim, self.index_factory)
+        elif os.path.exists(self.trained_file):
+            index = faiss.read_index(self.trained_file)
+        elif total < self.min_training_size:
+            index = faiss.IndexFlatIP(self.dim)
+        else:
+            index = ann_index.train_index(self.dim, self.index_factory, (v for v, _ in self._live_vectors(deleted)), total)
+            faiss.write_index(index, self.trained_file)
+            print(f"Trained {self.index_factory} index on {total} vectors")
+        # Chunks are addressed by stable ids so documents can be replaced or removed
+        return faiss.IndexIDMap2(index)
+
+    def _open_shared_index(self, deleted):
+        """(index, delta, stale): the index the writer published, memory-mapped, with newer chunks in the delta"""
+        import faiss
+        shared = self.store.shared_index
+        if shared is None:
+            # Nothing published yet: everything is held in memory
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+            for vectors, ids in self._live_vectors(deleted):
+                index.add_with_ids(vectors, ids)  # type: ignore[reportCallIssue]
+            return index, (), False
+        delta = ()
+        for vectors, ids in self._live_vectors(deleted):
+            newer = ids >= shared["next_id"]
+            if newer.any():
+                delta = self._extend_delta(delta, ids[newer], np.ascontiguousarray(vectors[newer]))
+        # Chunks deleted since it was published (or never removable from it) are filtered out
+        stale = shared["stale"] or len(deleted) > shared["deleted"]
+        return ann_index.read_shared(self.store.shared_index_path(shared)), delta, stale
+
+    @staticmethod
+    def _extend_delta(delta, ids, vectors):
+        if delta and len(delta[-1][0]) < DELTA_PART_ROWS:
+            last_ids, last_vectors = delta[-1]
+            return delta[:-1] + ((np.concatenate([last_ids, ids]), np.vstack([last_vectors, vectors])),)
+        return delta + ((ids, vectors),)
+
+    def _unmerged(self, snapshot):
+        """Chunks added or deleted since the index was built"""
+        return sum(len(ids) for ids, _ in snapshot.delta) + sum(end - start for start, end in self._unmerged_deleted)
+
+    def _merge(self, snapshot):
+        """The snapshot with a copy of its index holding the delta and without deleted chunks.
+
+        Searches keep using the current index while the copy is built.
+        """
+        import faiss
+        start = time.perf_counter()
+        if self._unmerged_deleted and isinstance(ann_index.unwrap(snapshot.index), faiss.IndexIVF):
+            # Removing from IVF lists under an id map leaves the remaining positions
+            # misnumbered, so the (already trained) index is refilled with the live chunks
+            index = self._new_index(snapshot.index.ntotal, snapshot.deleted)
+            for vectors, ids in self._live_vectors(snapshot.deleted):
+                index.add_with_ids(vectors, ids)  # type: ignore[reportCallIssue]
         else:
-            self.index = faiss.IndexFlatIP(self.dim)
-            self.metadata = []
-
-    def _embed(self, texts):
-        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
-
-    def add_documents(self, docs_meta):
-        texts = [d["text"] for d in docs_meta]
-        vectors = self._embed(texts)
-        self.index.add(vectors)  # type: ignore[reportCallIssue]
-        self.metadata.extend(docs_meta)
-        self._persist()
-
-    def similarity_search(self, query, top_k=5):
-        vec = self._embed([query])
-        scores, idxs = self.index.search(vec, top_k)  # type: ignore[reportCallIssue]
-        return [self.metadata[i] for i in idxs[0] if i < len(self.metadata)]
-
-    def _persist(self):
-        faiss.write_index(self.index, self.index_file)
-        with open(self.meta_file, "wb") as f:
-            pickle.dump(self.metadata, f)
\ No newline at end of file
+            index = faiss.clone_index(snapshot.index)
+            for ids, vectors in snapshot.delta:
+                keep = ~snapshot.deleted.contains(ids)
+                index.add_with_ids(np.ascontiguousarray(vectors[keep]), ids[keep])  # type: ignore[reportCallIssue]
+            for start_id, end_id in self._unmerged_deleted:
+                try:
+                    index.remove_ids(faiss.IDSelectorRange(start_id, end_id))
+                except RuntimeError:
+                    # Index type without removal (e.g. HNSW): results are filtered
+                    # against the tombstones until the next load
+                    self._index_stale = True
+        merged = self._unmerged(snapshot)
+        self._unmerged_deleted = []
+        print(f"Rebuilt {index.ntotal}-vector index of {self.path} with {merged} changes in "
+              f"{time.perf_counter() - start:.2f} s")
+        return snapshot._replace(index=index, delta=(), stale=self._index_stale)
+
+    def _maybe_publish(self):
+        """Publish the index for reader processes once chunks added or deleted since the
+        last publish exceed SHARED_INDEX_DELTA of the collection (and it has any)"""
+        snapshot = self._snapshot
+        shared = self.store.shared_index
+        if shared is not None and not self._publish_due:
+            changed = self._next_id - shared["next_id"] + len(snapshot.deleted) - shared["deleted"]
+            if changed <= SHARED_INDEX_DELTA * max(self.count, 1):
+                return
+        elif not snapshot.index.ntotal and not snapshot.delta:
+            return
+        if self._unmerged(snapshot):
+            # Readers load the chunks after next_id into their delta; publish them in the index
+            snapshot = self._snapshot = self._merge(snapshot)
+        start = time.perf_counter()
+        self.store.publish_index(lambda f: ann_index.write_shared(snapshot.index, f), next_id=self._next_id,
+                                 deleted=len(snapshot.deleted), stale=snapshot.stale)
+        self._publish_due = False
+        print(f"Published {snapshot.index.ntotal}-vector index of {self.path} in {time.perf_counter() - start:.2f} s")
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"{self.path} is open read-only: another process is the writer")
+
+    def _live_vectors(self, deleted):
+        """(vectors, ids) of every chunk not deleted, persisted or pending"""
+        for vectors, metadata in self.store.segments():
+            keep = ~deleted.contains(metadata.ids)
+            # Segments may store float16
+            yield np.ascontiguousarray(vectors[keep], dtype="float32"), np.asarray(metadata.ids[keep], dtype="int64")
+        for vectors, docs in self._pending:
+            ids = np.array([d["id"] for d in docs], dtype="int64")
+            keep = ~deleted.contains(ids)
+            yield np.ascontiguousarray(vectors[keep]), ids[keep]
+
+    @property
+    def awaiting_training(self):
+        return self._awaiting_training(self._snapshot)
+
+    def _awaiting_training(self, snapshot):
+        import faiss
+        return self.min_training_size > 0 and isinstance(faiss.downcast_index(snapshot.index.index), faiss.IndexFlat)
+
+    def _train_and_migrate(self, snapshot, total):
+        # Move everything from the interim flat index into a freshly trained one
+        index = self._new_index(total, snapshot.deleted)
+        for vectors, ids in self._live_vectors(snapshot.deleted):
+            index.add_with_ids(vectors, ids)  # type: ignore[reportCallIssue]
+        self._unmerged_deleted = []
+        self._index_stale = False
+        self._publish_due = True
+        return snapshot._replace(index=index, delta=(), stale=False)
+
+    def _migrate_legacy(self):
+        import faiss
+        index = faiss.read_index(self.index_file)
+        with open(self.meta_file, "rb") as f:
+            metadata = pickle.load(f)
+        if index.ntotal:
+            # Legacy stores may hold repeated uploads of a source; keep them all
+            self.add_documents(metadata, vectors=index.reconstruct_n(0, index.ntotal), replace=False)
+        os.remove(self.index_file)
+        os.remove(self.meta_file)
+        print(f"Migrated {index.ntotal} vectors from {self.index_file} to segment storage")
+
+    def embed(self, texts):
+        return self.embedder.embed(texts)
+
+    def embed_query(self, query):
+        return self.embed_queries([query])
+
+    def embed_queries(self, queries):
+        return self.embedder.embed_queries(queries)
+
+    def set_document_hash(self, source, content_hash, uploaded_at=None):
+        self._check_writable()
+        with self._write_lock:
+            snapshot = self._snapshot
+            entry = dict(snapshot.documents[source], hash=content_hash)
+            if uploaded_at is not None:
+                entry["uploaded_at"] = uploaded_at
+            self._pending_documents[source] = entry
+            self._snapshot = snapshot._replace(documents={**snapshot.documents, source: entry})
+
+    def find_document(self, content_hash):
+        """Source name of an indexed document with this content hash, if any"""
+        for source, entry in self._snapshot.documents.items():
+            if entry["hash"] == content_hash:
+                return source
+        return None
+
+    def add_documents(self, docs_meta, vectors=None, persist=True, hashes=None, replace=True):
+        """Add chunks, registering their sources as documents.
+
+        With replace, a source that is already indexed has its previous chunks
+        removed; otherwise the new chunks are added to its registry entry.
+        hashes maps source -> content hash of the uploaded file.
+        """
+        self._check_writable()
+        if vectors is None:
+            vectors = self.embed([d["text"] for d in docs_meta])
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        with self._write_lock:
+            snapshot = self._snapshot
+            docs_meta = [dict(d, id=self._next_id + i) for i, d in enumerate(docs_meta)]
+            ids = np.arange(self._next_id, self._next_id + len(docs_meta), dtype="int64")
+            self._next_id += len(docs_meta)
+
+            documents = dict(snapshot.documents)
+            deleted = snapshot.deleted
+            sources = list(dict.fromkeys(d["source"] for d in docs_meta))
+            # A replaced source's old chunks disappear in the same snapshot its new ones appear
+            replaced = [source for source in sources if source in documents] if replace else []
+            if replaced:
+                deleted = self._remove(replaced, documents, deleted)
+            now = int(time.time())
+            source_of = np.array([d["source"] for d in docs_meta], dtype=object)
+            for source in sources:
+                entry = dict(documents.get(source) or {"hash": None, "ranges": [], "chunks": 0, "uploaded_at": now})
+                own = ids[source_of == source]
+                entry["ranges"] = RangeSet(entry["ranges"] + id_ranges(own)).ranges
+                entry["chunks"] += len(own)
+                if hashes and source in hashes:
+                    entry["hash"] = hashes[source]
+                documents[source] = entry
+                self._pending_documents[source] = entry
+
+            metadata = snapshot.metadata.copy()
+            metadata.extend(docs_meta)
+            lexical = snapshot.lexical.copy()
+            lexical.extend(docs_meta)
+            chunk_vectors = snapshot.vectors.copy()
+            chunk_vectors.append(ids, vectors, pending=True)
+            self._pending.append((vectors, docs_meta))
+            self._snapshot = Snapshot(
+                snapshot.version + 1, snapshot.index, self._extend_delta(snapshot.delta, ids, vectors),
+                metadata, chunk_vectors, lexical, documents, deleted, snapshot.stale or bool(replaced)
+            )
+            self._maybe_merge()
+            if persist:
+                self.persist()
+
+    def _remove(self, sources, documents, deleted):
+        """Drop sources from documents (the writer's copy); deleted extended with their chunks"""
+        deleted = deleted.copy()
+        for source in sources:
+            entry = documents.pop(source)
+            self._pending_documents[source] = None
+            self._tombstone(entry["ranges"], deleted)
+        return deleted
+
+    def _tombstone(self, ranges, deleted):
+        """Mark chunk id ranges deleted in deleted (the writer's copy) and on disk at the next persist"""
+        for start, end in ranges:
+            deleted.add(start, end)
+            self._pending_deleted.append([start, end])
+            self._unmerged_deleted.append((start, end))
+
+    def _maybe_merge(self):
+        """Train the index once there is enough data, or rebuild it once the delta grew too large"""
+        snapshot = self._snapshot
+        # Only live chunks are trained on; the index and delta still hold deleted ones
+        live = self._count(snapshot)
+        if self._awaiting_training(snapshot) and live >= self.min_training_size:
+            self._snapshot = self._train_and_migrate(snapshot, live)
+        elif self._unmerged(snapshot) > INDEX_DELTA_MAX:
+            self._snapshot = self._merge(snapshot)
+
+    def delete_document(self, source, persist=True):
+        self._check_writable()
+        with self._write_lock:
+            snapshot = self._snapshot
+            if source not in snapshot.documents:
+                return False
+            documents = dict(snapshot.documents)
+            deleted = self._remove([source], documents, snapshot.deleted)
+            self._snapshot = snapshot._replace(version=snapshot.version + 1, documents=documents, deleted=deleted,
+                                               stale=True)
+            self._maybe_merge()
+            if persist:
+                self.persist()
+        return True
+
+    def remove_chunks(self, source, start=0, end=None, persist=True):
+        """Remove the chunks of source with ids in [start, end); the document goes with its last chunk.
+
+        Chunk ids only grow, so the versions of a re-uploaded file are id
+        intervals: the previous one is removed once the new one is complete,
+        or the new one if it fails.
+        """
+        self._check_writable()
+        with self._write_lock:
+            snapshot = self._snapshot
+            entry = snapshot.documents.get(source)
+            if entry is None:
+                return False
+            end = self._next_id if end is None else end
+            kept, removed = RangeSet(), []
+            for first, last in entry["ranges"]:
+                kept.add(first, min(last, start))
+                kept.add(max(first, end), last)
+                if max(first, start) < min(last, end):
+                    removed.append([max(first, start), min(last, end)])
+            if not removed:
+                return False
+            documents = dict(snapshot.documents)
+            if kept.ranges:
+                documents[source] = self._pending_documents[source] = dict(entry, ranges=kept.ranges, chunks=len(kept))
+            else:
+                del documents[source]
+                self._pending_documents[source] = None
+            deleted = snapshot.deleted.copy()
+            self._tombstone(removed, deleted)
+            self._snapshot = snapshot._replace(version=snapshot.version + 1, documents=documents, deleted=deleted,
+                                               stale=True)
+            self._maybe_merge()
+            if persist:
+                self.persist()
+        return True
+
+    def similarity_search(self, query, top_k=5, nprobe=None, ef_search=None, vector=None, lexical_weight=None,
+                          search_filter=None):
+        vec = self.embed_query(query) if vector is None else vector
+        snapshot = self._snapshot
+        return self.search_vectors(vec, top_k, nprobe=nprobe, ef_search=ef_search, queries=[query],
+                                   lexical_weights=[lexical_weight], allowed=self.allowed_ids(search_filter, snapshot),
+                                   snapshot=snapshot)[0]
+
+    def allowed_ids(self, search_filter, snapshot=None):
+        """Sorted ids of the live chunks a filter admits, or None for no restriction"""
+        if search_filter is None or search_filter == SearchFilter():
+            return None
+        snapshot = snapshot or self._snapshot
+        key = (snapshot.version, search_filter)
+        cached = self.filter_ids.get(key)
+        if cached is not None:
+            return cached[0]
+        f = search_filter
+        ids = None
+        if f.sources is not None or f.uploaded_after is not None or f.uploaded_before is not None:
+            # Document-level conditions resolve through the registry's id ranges
+            if f.sources is not None:
+                entries = [snapshot.documents[source] for source in f.sources if source in snapshot.documents]
+            else:
+                entries = list(snapshot.documents.values())
+            ranges = [
+                r for entry in entries
+                if (f.uploaded_after is None or (entry["uploaded_at"] or 0) >= f.uploaded_after)
+                and (f.uploaded_before is None or (entry["uploaded_at"] or 0) < f.uploaded_before)
+                for r in entry["ranges"]
+            ]
+            ids = np.sort(np.concatenate([np.arange(start, end, dtype="int64") for start, end in ranges] or [np.empty(0, dtype="int64")]))
+        if f.page_from is not None or f.page_to is not None:
+            def overlaps(column):
+                keep = column("page_start") >= 0
+                if f.page_from is not None:
+                    keep &= column("page_end") >= f.page_from
+                if f.page_to is not None:
+                    keep &= column("page_start") <= f.page_to
+                return keep
+            ids = snapshot.metadata.select(overlaps, ids)
+        ids = ids[~snapshot.deleted.contains(ids)]
+        if len(ids) > FILTER_EXACT_MAX and len(ids) >= self._count(snapshot):
+            # Matches everything, so the index is searched without a selector
+            ids = None
+        self.filter_ids.put(key, (ids,))
+        return ids
+
+    def search_vectors(self, vectors, top_k=5, nprobe=None, ef_search=None, queries=None, lexical_weights=None,
+                       allowed=None, snapshot=None):
+        """Chunks for each row of vectors, searched in one batched index call.
+
+        With queries (the text of each row), every row's dense ranking is fused
+        with a BM25 ranking of its query; lexical_weights overrides the default
+        weight per row (None keeps it). allowed (sorted chunk ids, see
+        allowed_ids) restricts every row to those chunks: a few thousand are
+        scored exactly, larger sets are passed to the index as an id selector.
+        A snapshot (with allowed resolved against it) pins the version searched.
+        """
+        import faiss
+        snapshot = snapshot or self._snapshot
+        vectors = np.ascontiguousarray(vectors, dtype="float32").reshape(-1, self.dim)
+        depth = max(top_k, HYBRID_CANDIDATES) if queries is not None else top_k
+        if allowed is not None and len(allowed) <= FILTER_EXACT_MAX:
+            ids = self._exact_search(snapshot, vectors, allowed, depth)
+        else:
+            selector = faiss.IDSelectorBatch(allowed) if allowed is not None else None
+            params = ann_index.search_params(snapshot.index, nprobe=nprobe, ef_search=ef_search, selector=selector)
+            # Over-fetch while deleted chunks may still be in the index
+            k = depth * 2 if snapshot.stale else depth
+            ids = self._search_index(snapshot, vectors, k, params, allowed)
+        results = []
+        for i, row in enumerate(ids):
+            if snapshot.stale:
+                row = row[~snapshot.deleted.contains(row)]
+            row = row[row >= 0][:depth]
+            if queries is not None:
+                weight = lexical_weights[i] if lexical_weights is not None else None
+                row = self._fuse(snapshot, queries[i], row, top_k, depth, weight, allowed)
+            results.append(snapshot.metadata.take(row[:top_k]))
+        return results
+
+    def _search_index(self, snapshot, vectors, k, params, allowed):
+        """Top-k ids per row from the index, merged with the delta's when there is one.
+
+        With rescoring, k * rescore_factor candidates are fetched and re-ranked
+        by their exact scores against the stored vectors.
+        """
+        fetch = k * max(self.rescore_factor, 1)
+        scores, ids = snapshot.index.search(vectors, fetch, params=params)  # type: ignore[reportCallIssue]
+        if fetch > k or not ann_index.ranks_by_inner_product(snapshot.index):
+            scores, ids = ann_index.rescore(vectors, ids, snapshot.vectors.take, k)
+        if not snapshot.delta:
+            return ids
+        delta_ids = np.concatenate([part_ids for part_ids, _ in snapshot.delta])
+        delta_scores = np.hstack([vectors @ part.T for _, part in snapshot.delta])
+        if allowed is not None:
+            keep = np.searchsorted(allowed, delta_ids)
+            keep = allowed[np.minimum(keep, len(allowed) - 1)] == delta_ids
+            delta_ids, delta_scores = delta_ids[keep], delta_scores[:, keep]
+        n = min(k, len(delta_ids))
+        if n:
+            top = np.argpartition(-delta_scores, n - 1, axis=1)[:, :n]
+            scores = np.hstack([scores, np.take_along_axis(delta_scores, top, axis=1)])
+            ids = np.hstack([ids, delta_ids[top]])
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(ids, order, axis=1)
+
+    def _exact_search(self, snapshot, vectors, allowed, k):
+        """Top-k chunk ids per row among allowed, scored against their stored vectors"""
+        ids, candidates = snapshot.vectors.take(allowed)
+        out = np.full((len(vectors), k), -1, dtype="int64")
+        if not len(ids):
+            return out
+        scores = vectors @ candidates.T
+        n = min(k, len(ids))
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+        out[:, :n] = ids[top]
+        return out
+
+    def lexical_weight(self, query, weight=None):
+        if weight is not None:
+            return weight
+        return HYBRID_IDENTIFIER_WEIGHT if has_identifiers(query) else HYBRID_LEXICAL_WEIGHT
+
+    def _fuse(self, snapshot, query, dense_ids, top_k, depth, weight=None, allowed=None):
+        weight = self.lexical_weight(query, weight)
+        if weight <= 0:
+            return dense_ids
+        # Postings of removed chunks stay on disk until compaction
+        lexical_ids, _ = snapshot.lexical.search(query, depth, snapshot.deleted, allowed)
+        if weight >= 1:
+            return lexical_ids
+        return reciprocal_rank_fusion([(dense_ids, 1 - weight), (lexical_ids, weight)], top_k, RRF_RANK_CONSTANT)
+
+    @property
+    def count(self):
+        return self._count(self._snapshot)
+
+    @staticmethod
+    def _count(snapshot):
+        return sum(entry["chunks"] for entry in snapshot.documents.values())
+
+    def memory_bytes(self):
+        """Approximate resident size: the in-memory index plus vectors not yet persisted.
+
+        Segment vectors, metadata and postings are memory-mapped, so the OS
+        pages them out on its own and they are not counted.
+        """
+        snapshot = self._snapshot
+        # Pending vectors are the delta's
+        delta = sum(ids.nbytes + vectors.nbytes for ids, vectors in snapshot.delta)
+        if self.read_only and self.store.shared_index is not None:
+            # The shared index is memory-mapped; its id map is the part held in memory
+            return 8 * snapshot.index.ntotal + delta
+        return ann_index.memory_bytes(snapshot.index) + delta
+
+    def close(self):
+        """Persist pending changes and wait for compaction, so the collection can be reopened from disk"""
+        self.persist()
+        self.store.wait()
+
+    def persist(self):
+        with self._write_lock:
+            # Only the documents added since the last persist are written
+            if not (self._pending or self._pending_documents or self._pending_deleted):
+                return
+            vectors = np.vstack([v for v, _ in self._pending]) if self._pending else None
+            metadata = [m for _, batch in self._pending for m in batch]
+            # A compaction started by the append may merge the new segment before it is opened
+            with self.store.hold_files():
+                segment = self.store.append(vectors, metadata, documents=self._pending_documents,
+                                            deleted=self._pending_deleted)
+                # Written: a failure below must not append the same chunks again
+                self._pending = []
+                self._pending_documents = {}
+                self._pending_deleted = []
+                if segment is not None:
+                    snapshot = self._snapshot
+                    segment_metadata = self.store.open_metadata(segment)
+                    metadata = snapshot.metadata.copy()
+                    metadata.seal(segment_metadata)
+                    lexical = snapshot.lexical.copy()
+                    lexical.seal(self.store.open_postings(segment, segment_metadata))
+                    chunk_vectors = snapshot.vectors.copy()
+                    chunk_vectors.seal(segment_metadata.ids, self.store.read_vectors(segment))
+                    self._snapshot = snapshot._replace(metadata=metadata, lexical=lexical, vectors=chunk_vectors)
+            if self.publish:
+                self._maybe_publish()
+
+    def reset(self):
+        """Empty the collection: one swap to a new, empty generation; searches already running
+        finish on the previous one"""
+        self._check_writable()
+        with self._write_lock:
+            self.store.clear()
+            if os.path.exists(self.trained_file):
+                os.remove(self.trained_file)
+            self._snapshot = self._load(version=self._snapshot.version + 1)
@@ -0,0 +1,59 @@
+import os
+import threading
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class WriterLock:
+    """An exclusive lock on a file, held by the one process allowed to write the stores.
+
+    The operating system releases it when the holder exits, however it exits,
+    so a waiting process can take over as the writer.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self.held = False
+
+    def acquire(self, blocking: bool = False) -> bool:
+        """Take the lock; without blocking, whether another process already holds it"""
+        if self.held:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                # LK_LOCK retries for about 10 s, so keep trying while blocking
+                while True:
+                    try:
+                        f.seek(0)
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+        except OSError:
+            f.close()
+            return False
+        # Kept open: closing the file would release the lock
+        self._file = f
+        self.held = True
+        return True
+
+    def wait(self, on_acquired: Callable[[], None]) -> Optional[threading.Thread]:
+        """Call on_acquired from a background thread once the lock is taken (e.g. after the writer exits)"""
+        def take_over():
+            self.acquire(blocking=True)
+            on_acquired()
+
+        thread = threading.Thread(target=take_over, name="writer-lock", daemon=True)
+        thread.start()
+        return thread
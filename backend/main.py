@@ -1,12 +1,39 @@
 import sys
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.api.routes import router
+from backend.api.routes import (
+    router, ingestion_pipeline, job_workers, llm_manager, collection_manager, embed_batcher, search_batcher, rerank_batcher,
+    startup, writer_lock, become_writer
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    if collection_manager.read_only:
+        # Another worker process writes; ingest here once it exits
+        writer_lock.wait(become_writer)
+    else:
+        job_workers.start()
+    # Returns at once: models and indexes load in background threads (see /api/ready)
+    startup.start()
+    for backend in llm_manager.backends.values():
+        backend.start()
+    try:
+        yield
+    finally:
+        job_workers.stop()
+        ingestion_pipeline.shutdown()
+        collection_manager.close()
+        embed_batcher.close()
+        search_batcher.close()
+        rerank_batcher.close()
+        await llm_manager.aclose()
 
-app = FastAPI(title="PDF RAG Chatbot")
+app = FastAPI(title="PDF RAG Chatbot", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,4 +44,4 @@ app.include_router(router, prefix="/api")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,78 @@
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+from backend.core.vector_store import VectorStore
+from backend.core.batching import MicroBatcher
+
+WORDS = ("contract deadline payment invoice policy report results method model training data "
+         "security access account refund schedule budget review summary introduction conclusion").split()
+
+
+def make_queries(n, seed=0):
+    # Distinct queries so the query-embedding cache stays out of the measurement
+    rng = random.Random(seed)
+    return [f"what does the document say about {' '.join(rng.sample(WORDS, 3))} ({i})" for i in range(n)]
+
+
+async def run_clients(queries, concurrency, handle):
+    latencies = []
+    pending = iter(queries)
+
+    async def client():
+        for query in pending:
+            start = time.perf_counter()
+            await handle(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return len(queries) / (time.perf_counter() - start), np.array(latencies)
+
+
+async def benchmark(store, queries, concurrency, top_k, max_batch, max_wait):
+    store.query_embeddings.clear()
+
+    if max_batch == 1:
+        # One encode and one search per query, as before micro-batching
+        async def handle(query):
+            vector = await asyncio.to_thread(store.embed_queries, [query])
+            await asyncio.to_thread(store.search_vectors, vector, top_k)
+        return (*await run_clients(queries, concurrency, handle), 1.0)
+
+    embedder = MicroBatcher(lambda qs: list(store.embed_queries(qs)), max_batch, max_wait)
+    searcher = MicroBatcher(lambda vs: store.search_vectors(np.vstack(vs), top_k), max_batch, max_wait)
+
+    async def handle(query):
+        await searcher.submit(await embedder.submit(query))
+
+    qps, latencies = await run_clients(queries, concurrency, handle)
+    embedder.close()
+    searcher.close()
+    return qps, latencies, embedder.stats()["mean_batch_size"]
+
+
+async def main(args):
+    store = VectorStore()
+    print(f"{store.index.ntotal} indexed vectors ({store.index_factory}), {args.queries} queries, "
+          f"{args.concurrency} concurrent clients, wait {args.max_wait_ms} ms\n")
+    await benchmark(store, make_queries(32, seed=1), 4, args.k, 1, 0)  # warm-up
+
+    print(f"{'max batch':>10}{'QPS':>10}{'p50 ms':>10}{'p99 ms':>10}{'mean batch':>12}")
+    for max_batch in args.max_batch:
+        qps, latencies, mean_batch = await benchmark(
+            store, make_queries(args.queries), args.concurrency, args.k, max_batch, args.max_wait_ms / 1000
+        )
+        print(f"{max_batch:>10}{qps:>10.1f}{np.percentile(latencies, 50):>10.2f}"
+              f"{np.percentile(latencies, 99):>10.2f}{mean_batch:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query throughput with and without micro-batching")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
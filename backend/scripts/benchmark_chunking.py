@@ -0,0 +1,91 @@
+import time
+import random
+import argparse
+import numpy as np
+import faiss
+from sentence_transformers import SentenceTransformer
+from backend.utils.pdf_processor import extract_pages, chunk_pages, split_paragraphs
+from backend.config.settings import MODEL_NAME, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+
+SUBJECTS = "The contract|The invoice|The warranty|The safety audit|The lease|The grant|The policy|The vendor".split("|")
+FACTS = ["expires on {d} March {y}", "was signed by {n} officers", "covers {n} sites in region {r}",
+         "requires a deposit of {n} thousand euros", "is reviewed every {n} months by team {r}",
+         "lists part number AX-{n}{r} in clause {n}.{d}"]
+
+
+def synthetic_pages(n_pages, seed=0):
+    """Fixture corpus: pages of short paragraphs, each sentence a checkable fact"""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(n_pages):
+        paragraphs = []
+        for _ in range(rng.randint(3, 6)):
+            sentences = [
+                f"{rng.choice(SUBJECTS)} {rng.choice(FACTS).format(d=rng.randint(1, 28), y=rng.randint(2020, 2030), n=rng.randint(2, 999), r=rng.choice('ABCDEFGH'))}."
+                for _ in range(rng.randint(2, 6))
+            ]
+            # PDF-style hard line wrapping
+            text = " ".join(sentences)
+            paragraphs.append("\n".join(text[i:i + 80] for i in range(0, len(text), 80)))
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+
+def fixed_chunks(pages, size=1000):
+    # Previous behaviour: all pages joined and sliced every size characters
+    text = "".join(pages)
+    return [{"text": text[i:i + size]} for i in range(0, len(text), size)]
+
+
+def make_queries(pages, n, seed=1):
+    """(query, sentence) pairs: a sentence with a word dropped, answered by a chunk holding the whole sentence"""
+    rng = random.Random(seed)
+    sentences = [s for page in pages for paragraph in split_paragraphs(page) for s in paragraph if len(s.split()) > 4]
+    queries = []
+    for sentence in rng.sample(sentences, min(n, len(sentences))):
+        words = sentence.rstrip(".").split()
+        del words[rng.randrange(1, len(words))]
+        queries.append((" ".join(words), sentence))
+    return queries
+
+
+def hit_rate(model, chunks, queries, k):
+    vectors = model.encode([c["text"] for c in chunks], batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    query_vectors = model.encode([q for q, _ in queries], batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+    _, ids = index.search(query_vectors, k)
+    hits = [any(sentence in chunks[i]["text"] for i in row if i >= 0) for (_, sentence), row in zip(queries, ids)]
+    return float(np.mean(hits))
+
+
+def run(pages, n_queries, k, max_tokens, overlap):
+    model = SentenceTransformer(MODEL_NAME)
+    queries = make_queries(pages, n_queries)
+    print(f"{len(pages)} pages, {sum(len(p) for p in pages) / 1e6:.2f} M chars, {len(queries)} queries, hit@{k}\n")
+    print(f"{'strategy':<34}{'chunks':>8}{'pages/s':>10}{'hit rate':>10}")
+
+    strategies = [
+        ("fixed 1000 chars", lambda: fixed_chunks(pages)),
+        (f"sentences {max_tokens} tok, overlap {overlap}", lambda: list(chunk_pages(iter(pages), max_tokens, overlap))),
+        (f"sentences {max_tokens} tok, no overlap", lambda: list(chunk_pages(iter(pages), max_tokens, 0))),
+    ]
+    for name, chunker in strategies:
+        chunker()  # warm-up (tokenizer load)
+        start = time.perf_counter()
+        chunks = chunker()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<34}{len(chunks):>8}{len(pages) / elapsed:>10.0f}{hit_rate(model, chunks, queries, k):>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunking throughput and retrieval hit rate, fixed-size vs sentence chunker")
+    parser.add_argument("pdfs", nargs="*", help="PDFs to use instead of the synthetic fixture corpus")
+    parser.add_argument("--pages", type=int, default=300, help="Synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_TOKENS)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args()
+    pages = [p for path in args.pdfs for p in extract_pages(path)] if args.pdfs else synthetic_pages(args.pages)
+    run(pages, args.queries, args.k, args.max_tokens, args.overlap)
@@ -0,0 +1,74 @@
+import os
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+
+
+def populate(store, rng, args):
+    from backend.scripts.benchmark_lexical import synthetic_chunks
+    texts = synthetic_chunks(args.docs * args.chunks_per_doc, 4)
+    for d in range(args.docs):
+        docs = [{"text": next(texts), "source": f"doc{d:05d}.pdf",
+                 "page_start": 1 + c * args.pages_per_doc // args.chunks_per_doc,
+                 "page_end": 1 + c * args.pages_per_doc // args.chunks_per_doc}
+                for c in range(args.chunks_per_doc)]
+        vectors = rng.standard_normal((len(docs), store.dim)).astype("float32")
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        store.add_documents(docs, vectors=vectors, persist=False)
+        if d % 500 == 499:
+            store.persist()
+    store.persist()
+
+
+def measure(store, queries, vectors, make_filter, args):
+    latencies = []
+    for query, vector in zip(queries, vectors):
+        search_filter = make_filter()
+        start = time.perf_counter()
+        store.search_vectors(vector[None], args.k, queries=[query], allowed=store.allowed_ids(search_filter))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main(args):
+    # Settings are read at import, so the throwaway store's path is set before any backend import
+    directory = tempfile.mkdtemp(prefix="filter-bench-")
+    os.environ["VECTOR_STORE_PATH"] = directory
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(directory, "embedding_cache.db")
+    from backend.core.vector_store import VectorStore, SearchFilter
+
+    rng = np.random.default_rng(0)
+    store = VectorStore()
+    start = time.perf_counter()
+    populate(store, rng, args)
+    print(f"{store.count} chunks in {args.docs} documents ({store.index_factory}), loaded in "
+          f"{time.perf_counter() - start:.1f} s\n")
+
+    queries = [f"part number AX-{random.Random(i).randint(2, 999)}B in clause 3" for i in range(args.queries)]
+    vectors = store.embed_queries(queries)
+    pick = random.Random(1)
+    cases = [
+        ("unfiltered", lambda: None),
+        ("one document", lambda: SearchFilter(sources=(f"doc{pick.randrange(args.docs):05d}.pdf",))),
+        ("one document, pages 1-3", lambda: SearchFilter(sources=(f"doc{pick.randrange(args.docs):05d}.pdf",), page_from=1, page_to=3)),
+        ("pages 1-3, all documents", lambda: SearchFilter(page_from=1, page_to=3)),
+        ("uploaded in the last hour", lambda: SearchFilter(uploaded_after=int(time.time()) - 3600)),
+    ]
+    print(f"{'filter':<30}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, make_filter in cases:
+        measure(store, queries[:20], vectors[:20], make_filter, args)  # warm-up
+        p50, p99 = measure(store, queries, vectors, make_filter, args)
+        print(f"{name:<30}{p50:>10.2f}{p99:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hybrid search latency with and without metadata filters "
+                                                 "(on a throwaway store; set INDEX_FACTORY to compare index types)")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--chunks-per-doc", type=int, default=20)
+    parser.add_argument("--pages-per-doc", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,78 @@
+import time
+import argparse
+import numpy as np
+import faiss
+from backend.core import ann_index
+from backend.core.segment_store import SegmentStore
+from backend.config.settings import VECTOR_STORE_PATH
+
+
+def load_or_generate(n, dim, seed=0):
+    """Use stored vectors when there are enough, otherwise clustered synthetic ones"""
+    store = SegmentStore(VECTOR_STORE_PATH)
+    if len(store) >= n:
+        vectors = np.vstack([np.asarray(v) for v, _ in store.segments()])[:n]
+        return np.ascontiguousarray(vectors, dtype="float32"), "stored"
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 500, 16), dim))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.standard_normal((n, dim))
+    vectors = vectors.astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors, "synthetic"
+
+
+def timed_search(index, queries, k, params=None):
+    latencies = []
+    results = np.empty((len(queries), k), dtype="int64")
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        _, idx = index.search(q[None, :], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = idx[0]
+    return results, np.array(latencies)
+
+
+def recall(results, truth):
+    k = truth.shape[1]
+    return np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)])
+
+
+def run_benchmark(n, dim, n_queries, k, factories):
+    vectors, origin = load_or_generate(n + n_queries, dim)
+    base, queries = vectors[:n], vectors[n:]
+    print(f"{n} {origin} vectors, dim {dim}, {n_queries} queries, recall@{k} vs Flat\n")
+
+    flat = faiss.IndexFlatIP(dim)
+    flat.add(base)
+    truth, flat_lat = timed_search(flat, queries, k)
+    print(f"{'index':<22}{'knob':<14}{'recall':>8}{'p50 ms':>9}{'p99 ms':>9}{'build s':>9}")
+    print(f"{'Flat':<22}{'-':<14}{1.0:>8.3f}{np.percentile(flat_lat, 50):>9.3f}{np.percentile(flat_lat, 99):>9.3f}{'-':>9}")
+
+    for factory in factories:
+        start = time.perf_counter()
+        index = ann_index.train_index(dim, factory, [base], len(base))
+        index.add(base)
+        build = time.perf_counter() - start
+        downcast = faiss.downcast_index(index)
+        if isinstance(downcast, faiss.IndexIVF):
+            sweep = [("nprobe", p, faiss.SearchParametersIVF(nprobe=p)) for p in (1, 4, 16, 64) if p <= downcast.nlist]
+        elif isinstance(downcast, faiss.IndexHNSW):
+            sweep = [("efSearch", e, faiss.SearchParametersHNSW(efSearch=e)) for e in (16, 32, 64, 128)]
+        else:
+            sweep = [("-", "", None)]
+        for name, value, params in sweep:
+            results, lat = timed_search(index, queries, k, params)
+            knob = f"{name}={value}" if value != "" else "-"
+            print(f"{factory:<22}{knob:<14}{recall(results, truth):>8.3f}"
+                  f"{np.percentile(lat, 50):>9.3f}{np.percentile(lat, 99):>9.3f}{build:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs latency of ANN index types against the flat baseline")
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--factories", nargs="+", default=["IVF1024,Flat", "IVF1024,PQ48", "HNSW32"])
+    args = parser.parse_args()
+    run_benchmark(args.vectors, args.dim, args.queries, args.k, args.factories)
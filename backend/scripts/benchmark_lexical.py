@@ -0,0 +1,72 @@
+import os
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+from backend.core.lexical_index import LexicalIndex, Postings
+from backend.core.segment_store import _fsync_write
+from backend.scripts.benchmark_chunking import SUBJECTS, FACTS
+
+
+def synthetic_chunks(n, sentences, seed=0):
+    """Chunk texts made of fixture-corpus facts, so identifiers like AX-417B are rare and exact"""
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield " ".join(
+            f"{rng.choice(SUBJECTS)} {rng.choice(FACTS).format(d=rng.randint(1, 28), y=rng.randint(2020, 2030), n=rng.randint(2, 999), r=rng.choice('ABCDEFGH'))}."
+            for _ in range(sentences)
+        )
+
+
+def make_queries(n, seed=1):
+    rng = random.Random(seed)
+    identifier = [f"which document lists part number AX-{rng.randint(2, 999)}{rng.choice('ABCDEFGH')}" for _ in range(n)]
+    words = [f"when does {rng.choice(SUBJECTS).lower()} expire and who signed it" for _ in range(n)]
+    return {"identifier": identifier, "natural language": words}
+
+
+def build(args, directory):
+    index = LexicalIndex()
+    start = time.perf_counter()
+    texts = synthetic_chunks(args.chunks, args.sentences)
+    for first in range(0, args.chunks, args.segment_size):
+        count = min(args.segment_size, args.chunks - first)
+        ids = np.arange(first, first + count, dtype="int64")
+        part = Postings.build(ids, (next(texts) for _ in range(count)))
+        # Searched the way the server does: memory-mapped from segment files
+        base = os.path.join(directory, f"seg-{first // args.segment_size:06d}")
+        part.save(base, _fsync_write)
+        index.append(Postings.load(base, ids))
+    return index, time.perf_counter() - start
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as directory:
+        index, elapsed = build(args, directory)
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        print(f"{args.chunks} chunks in {len(index.parts)} segments, built in {elapsed:.1f} s, "
+              f"{size / 1e6:.0f} MB of postings\n")
+
+        print(f"{'queries':<20}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'mean hits':>11}")
+        for name, queries in make_queries(args.queries).items():
+            for query in queries[:20]:
+                index.search(query, args.k)  # warm-up (page cache)
+            latencies, hits = [], []
+            for query in queries:
+                start = time.perf_counter()
+                ids, _ = index.search(query, args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits.append(len(ids))
+            print(f"{name:<20}{np.percentile(latencies, 50):>10.3f}{np.percentile(latencies, 90):>10.3f}"
+                  f"{np.percentile(latencies, 99):>10.3f}{np.mean(hits):>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BM25 lookup latency over memory-mapped segment postings")
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--segment-size", type=int, default=250_000, help="Chunks per segment (compaction keeps a few large ones)")
+    parser.add_argument("--sentences", type=int, default=8, help="Fixture sentences per chunk")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+import time
+import asyncio
+import argparse
+import numpy as np
+from backend.core.local_llm import LocalSeq2SeqBackend
+from backend.core.query_engine import PackedPrompt, load_prompt_tokenizers
+from backend.scripts.benchmark_chunking import synthetic_pages, make_queries
+from backend.config.settings import LOCAL_LLM_MODEL, LOCAL_LLM_MAX_BATCH
+
+
+def fixture_prompts(n, model_name, pages=50):
+    """Fixture questions packed for model_name, each with the page holding its answer as context"""
+    corpus = synthetic_pages(pages)
+    load_prompt_tokenizers([model_name])
+    prompts = []
+    for query, sentence in make_queries(corpus, n):
+        page = next(p for p in corpus if sentence.replace(" ", "") in p.replace("\n", "").replace(" ", ""))
+        prompts.append(PackedPrompt(query + "?", [{"text": page}]).render(model_name))
+    return prompts
+
+
+async def run(backend, prompts, concurrency):
+    """(tokens/s, p50 time to first token ms, p50 request ms) with concurrency requests in flight"""
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    first_tokens, latencies = [], []
+
+    async def one(prompt):
+        async with slots:
+            start = time.perf_counter()
+            first = None
+            async for _ in backend.stream(prompt, loop.time() + 600):
+                first = first or time.perf_counter()
+            first_tokens.append(((first or time.perf_counter()) - start) * 1000)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    generated = backend.generated
+    start = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in prompts))
+    elapsed = time.perf_counter() - start
+    return (backend.generated - generated) / elapsed, np.percentile(first_tokens, 50), np.percentile(latencies, 50)
+
+
+async def main(args):
+    prompts = fixture_prompts(args.requests, args.model)
+    print(f"{args.model}, {len(prompts)} fixture prompts, up to {args.max_new_tokens} new tokens each\n")
+    print(f"{'weights':<16}{'concurrency':>12}{'tokens/s':>10}{'ttft ms':>10}{'request ms':>12}{'mean batch':>12}")
+    for quantize in (False, True):
+        backend = LocalSeq2SeqBackend(args.model, quantize=quantize, max_batch=args.max_batch,
+                                      max_new_tokens=args.max_new_tokens)
+        await run(backend, prompts[:2], 2)  # load + warm-up
+        for concurrency in args.concurrency:
+            steps = backend.steps
+            generated = backend.generated
+            rate, ttft, latency = await run(backend, prompts, concurrency)
+            mean_batch = (backend.generated - generated) / max(backend.steps - steps, 1)
+            print(f"{'int8 dynamic' if quantize else 'fp32':<16}{concurrency:>12}{rate:>10.1f}{ttft:>10.0f}"
+                  f"{latency:>12.0f}{mean_batch:>12.2f}")
+        await backend.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU generation throughput of the local model with continuous batching")
+    parser.add_argument("--model", default=LOCAL_LLM_MODEL or "google/flan-t5-base")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-batch", type=int, default=LOCAL_LLM_MAX_BATCH)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+import time
+import asyncio
+import argparse
+import numpy as np
+import faiss
+from sentence_transformers import SentenceTransformer
+from backend.core.query_engine import PackedPrompt, PROMPT_TEMPLATE, MODEL_INPUT_TOKENS, prompt_token_counter
+from backend.scripts.benchmark_chunking import synthetic_pages, make_queries
+from backend.utils.pdf_processor import chunk_pages
+from backend.config.settings import MODEL_NAME, LLM_PROMPT_TOKENS
+
+
+def retrieve(pages, n_queries, k):
+    """(query, answer sentence, top-k chunks) for fixture queries, retrieved by dense search"""
+    model = SentenceTransformer(MODEL_NAME)
+    chunks = list(chunk_pages(iter(pages)))
+    vectors = model.encode([c["text"] for c in chunks], batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    queries = make_queries(pages, n_queries)
+    query_vectors = model.encode([q for q, _ in queries], batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+    _, ids = index.search(query_vectors, k)
+    return [(query, sentence, [chunks[i] for i in row if i >= 0]) for (query, sentence), row in zip(queries, ids)]
+
+
+def full_prompt(query, docs):
+    return PROMPT_TEMPLATE.format(context="\n".join(d["text"] for d in docs), query=query)
+
+
+def truncated_prompt(query, docs):
+    # Previous behaviour: every chunk joined, then the prompt cut at 1000 characters
+    prompt = full_prompt(query, docs).strip()
+    return prompt[:1000] + "..." if len(prompt) > 1000 else prompt
+
+
+def packed_prompt(query, docs, model_name):
+    return PackedPrompt(query, docs).render(model_name)
+
+
+def measure(cases, build, model_name):
+    count = prompt_token_counter(model_name)
+    tokens, latencies, question_kept, answer_kept, answerable = [], [], 0, 0, 0
+    for query, sentence, docs in cases:
+        start = time.perf_counter()
+        prompt = build(query, docs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        tokens.append(count([prompt])[0])
+        question_kept += f"Question: {query}" in prompt
+        # Only queries whose answer was retrieved at all can keep it
+        if any(sentence in d["text"] for d in docs):
+            answerable += 1
+            answer_kept += sentence in prompt
+    return np.mean(tokens), np.percentile(latencies, 50), question_kept / len(cases), answer_kept / max(answerable, 1)
+
+
+async def generation_latency(cases, build, model_name, n):
+    from backend.core.llm_manager import LLMManager
+    llm = LLMManager()
+    llm.models = [model_name]
+    latencies = []
+    for query, _, docs in cases[:n]:
+        start = time.perf_counter()
+        await llm.generate_with_model(build(query, docs))
+        latencies.append((time.perf_counter() - start) * 1000)
+    await llm.aclose()
+    return np.percentile(latencies, 50)
+
+
+def main(args):
+    cases = retrieve(synthetic_pages(args.pages), args.queries, args.k)
+    print(f"{len(cases)} queries, top {args.k} chunks each, prompt cap {LLM_PROMPT_TOKENS} tokens\n")
+    print(f"{'model':<38}{'prompt':<11}{'tokens':>8}{'build ms':>10}{'question':>10}{'answer':>8}"
+          + (f"{'gen p50 ms':>12}" if args.generate else ""))
+    strategies = [
+        ("all chunks", lambda m: full_prompt),
+        ("truncated", lambda m: truncated_prompt),
+        ("packed", lambda m: lambda q, d: packed_prompt(q, d, m)),
+    ]
+    for model_name in args.models:
+        for name, make in strategies:
+            build = make(model_name)
+            build(cases[0][0], cases[0][2])  # warm-up (tokenizer load)
+            tokens, build_ms, question, answer = measure(cases, build, model_name)
+            line = f"{model_name:<38}{name:<11}{tokens:>8.0f}{build_ms:>10.2f}{question:>10.3f}{answer:>8.3f}"
+            if args.generate:
+                line += f"{asyncio.run(generation_latency(cases, build, model_name, args.generate)):>12.0f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt size and content: every chunk in full, the previous 1000-character "
+                                                 "truncation, and token-budgeted packing. "
+                                                 "'question' and 'answer' are the fractions of prompts still holding the "
+                                                 "question and (when retrieved) the sentence answering it")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_INPUT_TOKENS))
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--generate", type=int, default=0, metavar="N",
+                        help="Also time generation of N answers per row through the configured API (HF_API_BASE)")
+    main(parser.parse_args())
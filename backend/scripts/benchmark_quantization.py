@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import faiss
+# Runnable as a file from the repository root, like backend/main.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from backend.core import ann_index
+from backend.scripts.benchmark_index import load_or_generate, recall
+
+
+def batched_search(index, queries, k, rescore_factor, take, batch=32):
+    """(ids, queries per second) searching in batches as the API does, with optional rescoring"""
+    fetch = k * max(rescore_factor, 1)
+    # The configured nprobe / efSearch, as the API searches with
+    params = ann_index.search_params(index)
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        rows = queries[i:i + batch]
+        _, ids = index.search(rows, fetch, params=params)
+        if fetch > k or not ann_index.ranks_by_inner_product(index):
+            _, ids = ann_index.rescore(rows, ids, take, k)
+        results.append(ids)
+    return np.vstack(results), len(queries) / (time.perf_counter() - start)
+
+
+def run_benchmark(n, dim, n_queries, k, factories, rescore_factors, storage):
+    vectors, origin = load_or_generate(n + n_queries, dim)
+    base, queries = vectors[:n], vectors[n:]
+    # Rescoring reads the stored vectors, as VectorStore does from its segments
+    stored = base.astype(storage)
+    take = lambda ids: (ids, np.asarray(stored[ids], dtype="float32"))
+    print(f"{n} {origin} vectors, dim {dim}, {n_queries} queries, recall@{k} vs Flat float32, "
+          f"rescoring against {storage} vectors ({stored.itemsize * dim} bytes each)\n")
+
+    flat = faiss.IndexFlatIP(dim)
+    flat.add(base)
+    truth, flat_qps = batched_search(flat, queries, k, 0, take)
+    print(f"{'index':<16}{'rescore':>8}{'bytes/vec':>11}{'memory MB':>11}{'recall':>8}{'QPS':>9}{'build s':>9}")
+    print(f"{'Flat':<16}{'-':>8}{ann_index.memory_bytes(flat) / n:>11.0f}{ann_index.memory_bytes(flat) / (1 << 20):>11.1f}"
+          f"{1.0:>8.3f}{flat_qps:>9.0f}{'-':>9}")
+
+    for factory in factories:
+        start = time.perf_counter()
+        index = ann_index.train_index(dim, factory, [base], len(base))
+        index.add(base)
+        build = time.perf_counter() - start
+        memory = ann_index.memory_bytes(index)
+        # Binary codes are always rescored (factor 1 only re-ranks the top k)
+        factors = rescore_factors if ann_index.ranks_by_inner_product(index) else [max(f, 1) for f in rescore_factors]
+        for factor in dict.fromkeys(factors):
+            results, qps = batched_search(index, queries, k, factor, take)
+            print(f"{factory:<16}{factor or '-':>8}{memory / n:>11.0f}{memory / (1 << 20):>11.1f}"
+                  f"{recall(results, truth):>8.3f}{qps:>9.0f}{build:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory per vector, QPS and recall of compressed indexes, with and "
+                                                 "without exact rescoring, against the flat float32 baseline")
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--factories", nargs="+", default=["SQfp16", "SQ8", "LSH", "HNSW32,SQ8"])
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[0, 4, 16, 64],
+                        help="candidates fetched per result before exact rescoring (0 = no rescoring)")
+    parser.add_argument("--storage", choices=["float32", "float16"], default="float32",
+                        help="type of the stored vectors used for rescoring (SEGMENT_VECTOR_DTYPE)")
+    args = parser.parse_args()
+    run_benchmark(args.vectors, args.dim, args.queries, args.k, args.factories, args.rescore_factors, args.storage)
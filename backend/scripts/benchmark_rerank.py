@@ -0,0 +1,52 @@
+import time
+import argparse
+import numpy as np
+from backend.core.reranker import Reranker
+from backend.scripts.benchmark_chunking import synthetic_pages, make_queries
+from backend.utils.pdf_processor import chunk_pages
+from backend.config.settings import RERANK_MODEL, RERANK_CANDIDATES
+
+
+def configurations(args):
+    yield "torch fp32", Reranker(args.model, "torch")
+    yield "torch int8 dynamic", Reranker(args.model, "torch", quantize=True)
+    for model_file in args.onnx_files:
+        yield f"onnx {model_file}", Reranker(args.model, "onnx", model_file=model_file)
+
+
+def main(args):
+    chunks = [c["text"] for c in chunk_pages(iter(synthetic_pages(args.pages)))]
+    rng = np.random.default_rng(0)
+    requests = [(query, [{"text": chunks[i]} for i in rng.choice(len(chunks), args.candidates, replace=False)])
+                for query, _ in make_queries(synthetic_pages(args.pages), args.queries)]
+    print(f"{len(requests)} queries x {args.candidates} candidates, top {args.k} compared with torch fp32\n")
+    print(f"{'configuration':<46}{'p50 ms':>9}{'p99 ms':>9}{'top-k agreement':>17}")
+
+    reference = None
+    for name, reranker in configurations(args):
+        try:
+            reranker.score_batch(requests[:2])  # load + warm-up
+        except Exception as e:
+            print(f"{name:<46}unavailable: {e}")
+            continue
+        latencies, tops = [], []
+        for request in requests:
+            start = time.perf_counter()
+            scores = reranker.score_batch([request])[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            tops.append(set(np.argsort(-scores)[:args.k]))
+        reference = reference or tops
+        agreement = np.mean([len(a & b) / args.k for a, b in zip(tops, reference)])
+        print(f"{name:<46}{np.percentile(latencies, 50):>9.1f}{np.percentile(latencies, 99):>9.1f}{agreement:>17.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-query cross-encoder latency on CPU across inference backends")
+    parser.add_argument("--model", default=RERANK_MODEL)
+    parser.add_argument("--onnx-files", nargs="*", default=["onnx/model.onnx", "onnx/model_qint8_avx512.onnx"],
+                        help="ONNX exports in the model repository to compare")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES)
+    parser.add_argument("--k", type=int, default=5)
+    main(parser.parse_args())
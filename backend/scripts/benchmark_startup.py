@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import socket
+import argparse
+import subprocess
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds(env):
+    """Time to import the app, i.e. what uvicorn (and every worker or reload) pays before serving"""
+    code = "import time; start = time.perf_counter(); import backend.main; print(time.perf_counter() - start)"
+    out = subprocess.run([sys.executable, "-c", code], env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def wait_for(url, start, timeout):
+    """Seconds from start until url answers 200"""
+    while time.perf_counter() - start < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} not ready after {timeout} s")
+
+
+def query_ms(api, query):
+    start = time.perf_counter()
+    requests.post(f"{api}/query", params={"query": query}, timeout=120).raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def run(warmup, query, timeout):
+    """(import s, live s, status s, ready s, first query ms, second query ms) for one cold start"""
+    env = dict(os.environ, STARTUP_WARMUP="1" if warmup else "0")
+    imported = import_seconds(env)
+    port = free_port()
+    api = f"http://127.0.0.1:{port}/api"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL
+    )
+    try:
+        live = wait_for(f"{api}/live", start, timeout)
+        status = wait_for(f"{api}/status", start, timeout)
+        ready = wait_for(f"{api}/ready", start, timeout)
+        # Different questions, so the second is not answered from the query caches
+        return imported, live, status, ready, query_ms(api, query), query_ms(api, query + " Explain briefly.")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start of the API server: seconds until it is importable, live, "
+                                                 "answering /status and ready (models and startup collections loaded), "
+                                                 "then the first two query latencies, with and without warm-up. "
+                                                 "Uses the configured index (VECTOR_STORE_PATH) and LLM settings")
+    parser.add_argument("--query", default="What is this document about?")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+    print(f"{'warm-up':<9}{'import s':>10}{'live s':>9}{'status s':>10}{'ready s':>9}{'1st query ms':>14}{'2nd query ms':>14}")
+    for warmup in (False, True):
+        for _ in range(args.runs):
+            imported, live, status, ready, first, second = run(warmup, args.query, args.timeout)
+            print(f"{'on' if warmup else 'off':<9}{imported:>10.2f}{live:>9.2f}{status:>10.2f}{ready:>9.2f}"
+                  f"{first:>14.1f}{second:>14.1f}")
@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def memory_mb():
+    """(resident, proportional, anonymous) MB of this process; proportional splits shared pages
+    between the processes mapping them (Linux only)"""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return fields["Rss"], fields["Pss"], fields["Anonymous"]
+
+
+def child(mode, path, queries):
+    """One worker process: open the store, search, report memory once every worker is up, exit on EOF"""
+    from backend.core.vector_store import VectorStore
+    _, _, anonymous = memory_mb()
+    start = time.perf_counter()
+    store = VectorStore(path, read_only=mode == "shared")
+    opened = time.perf_counter() - start
+    rng = np.random.default_rng(os.getpid())
+    vectors = rng.standard_normal((queries, store.dim)).astype("float32")
+    latencies = []
+    for vector in vectors:
+        start = time.perf_counter()
+        store.search_vectors(vector[None], 5)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(f"ready {opened:.3f} {np.percentile(latencies, 50):.3f}", flush=True)
+    sys.stdin.readline()
+    rss, pss, anon = memory_mb()
+    print(f"memory {rss:.1f} {pss:.1f} {anon - anonymous:.1f}", flush=True)
+    sys.stdin.read()
+
+
+def run_workers(mode, path, workers, queries):
+    """Per-worker (open s, search p50 ms, RSS MB, PSS MB, anonymous MB added by the store)"""
+    procs = [
+        subprocess.Popen([sys.executable, "-m", "backend.scripts.benchmark_workers", "--child", mode, path,
+                          "--queries", str(queries)],
+                         cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    try:
+        ready = [p.stdout.readline().split()[1:] for p in procs]
+        # Measured with every worker alive, so shared pages are split between them
+        for p in procs:
+            p.stdin.write("\n")
+            p.stdin.flush()
+        memory = [p.stdout.readline().split()[1:] for p in procs]
+    finally:
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+    return [tuple(float(x) for x in r + m) for r, m in zip(ready, memory)]
+
+
+def populate(store, chunks, rng, batch=10000):
+    """Add chunks in new 100-chunk documents, persisting every batch"""
+    first = store.count
+    for start in range(first, first + chunks, batch):
+        n = min(batch, first + chunks - start)
+        vectors = rng.standard_normal((n, store.dim)).astype("float32")
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        docs = [{"text": f"chunk {start + i}", "source": f"doc{(start + i) // 100:05d}.pdf", "page": 1} for i in range(n)]
+        store.add_documents(docs, vectors=vectors, persist=False)
+        store.persist()
+
+
+def reload_latency(store, directory, rng, chunks, interval):
+    """Seconds until a read-only worker serves chunks the writer just persisted"""
+    from backend.core.collection_manager import CollectionManager
+    from backend.config.settings import DEFAULT_COLLECTION
+    readers = CollectionManager(default_path=directory, read_only=True, shared=True)
+    before = readers.get(DEFAULT_COLLECTION).store.count
+    populate(store, chunks, rng)
+    start = time.perf_counter()
+    while readers.get(DEFAULT_COLLECTION).store.count == before:
+        time.sleep(interval)
+    return time.perf_counter() - start
+
+
+def main(args):
+    # Settings are read at import, so the throwaway store's path is set before any backend import
+    directory = tempfile.mkdtemp(prefix="workers-bench-")
+    os.environ["VECTOR_STORE_PATH"] = directory
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(directory, "embedding_cache.db")
+    from backend.core.vector_store import VectorStore
+    from backend.config.settings import INDEX_RELOAD_INTERVAL
+
+    rng = np.random.default_rng(0)
+    store = VectorStore(directory, publish=True)
+    start = time.perf_counter()
+    populate(store, args.chunks, rng)
+    print(f"{store.count} chunks ({store.index_factory}, {store.dim} dimensions) written in "
+          f"{time.perf_counter() - start:.1f} s\n")
+
+    print(f"{'index':<9}{'workers':>8}{'open s':>8}{'search ms':>11}{'RSS MB':>9}{'PSS MB':>9}{'anon MB':>9}"
+          f"{'total PSS MB':>14}")
+    for mode in ("private", "shared"):
+        for workers in args.workers:
+            results = np.array(run_workers(mode, directory, workers, args.queries))
+            opened, search, rss, pss, anon = results.mean(axis=0)
+            print(f"{mode:<9}{workers:>8}{opened:>8.2f}{search:>11.2f}{rss:>9.0f}{pss:>9.0f}{anon:>9.0f}"
+                  f"{results[:, 3].sum():>14.0f}")
+
+    seconds = reload_latency(store, directory, rng, args.update, INDEX_RELOAD_INTERVAL / 10)
+    print(f"\n{args.update} new chunks served by a read-only worker {seconds:.2f} s after the writer persisted them "
+          f"(INDEX_RELOAD_INTERVAL {INDEX_RELOAD_INTERVAL} s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory of K worker processes serving one collection: each building "
+                                                 "its own in-memory index (private) or mapping the index the writer "
+                                                 "published (shared), and how soon readers see new chunks. "
+                                                 "PSS splits shared pages between processes (Linux only)")
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--update", type=int, default=1000, help="Chunks added to measure reload latency")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child, args.queries)
+    else:
+        main(args)
@@ -0,0 +1,52 @@
+import json
+import time
+import argparse
+import numpy as np
+import requests
+
+
+def stream_query(api, query):
+    """(time to first token, total) in ms for one /query-stream request, measured client side"""
+    start = time.perf_counter()
+    first = None
+    event = None
+    with requests.post(f"{api}/query-stream", params={"query": query}, stream=True, timeout=120) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:") and event == "token" and first is None:
+                if json.loads(line[len("data:"):])["text"]:
+                    first = time.perf_counter()
+    end = time.perf_counter()
+    return ((first or end) - start) * 1000, (end - start) * 1000
+
+
+def blocking_query(api, query):
+    start = time.perf_counter()
+    requests.post(f"{api}/query", params={"query": query}, timeout=120).raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def summarize(name, values):
+    values = np.array(values)
+    print(f"{name:<28}{np.percentile(values, 50):>10.1f}{np.percentile(values, 90):>10.1f}{values.max():>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to first token of /query-stream vs the full /query response")
+    parser.add_argument("--api", default="http://127.0.0.1:8000/api")
+    parser.add_argument("--query", default="What is this document about?")
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    # A numbered suffix keeps the exact answer cache out of the measurement;
+    # run the server with SEMANTIC_CACHE_THRESHOLD=2 to disable the semantic cache too
+    streamed = [stream_query(args.api, f"{args.query} ({i})") for i in range(args.requests)]
+    blocking = [blocking_query(args.api, f"{args.query} [{i}]") for i in range(args.requests)]
+
+    print(f"{args.requests} requests each, ms{'p50':>20}{'p90':>10}{'max':>10}")
+    summarize("stream: first token", [t for t, _ in streamed])
+    summarize("stream: complete", [t for _, t in streamed])
+    summarize("query: complete", blocking)
+    print("\nServer side:", json.dumps(requests.get(f"{args.api}/status", timeout=10).json().get("streaming"), indent=2))
@@ -1,14 +1,15 @@
 import os
 import shutil
-from backend.config.settings import VECTOR_STORE_PATH
+from backend.config.settings import VECTOR_STORE_PATH, COLLECTIONS_PATH
 
 def reset_faiss_index():
-    """Reset the FAISS index by removing all stored data."""
-    if os.path.exists(VECTOR_STORE_PATH):
-        shutil.rmtree(VECTOR_STORE_PATH)
-        print(f"FAISS index at {VECTOR_STORE_PATH} has been reset.")
-    else:
-        print(f"No FAISS index found at {VECTOR_STORE_PATH}")
+    """Reset the FAISS index of every collection by removing all stored data."""
+    for path in (COLLECTIONS_PATH, VECTOR_STORE_PATH):
+        if os.path.exists(path):
+            shutil.rmtree(path)
+            print(f"FAISS index at {path} has been reset.")
+        else:
+            print(f"No FAISS index found at {path}")
 
 if __name__ == "__main__":
-    reset_faiss_index()
\ No newline at end of file
+    reset_faiss_index()
@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import traceback
+import numpy as np
+
+
+class Checker:
+    """Collects consistency violations and errors seen by the threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.failures = []
+        self.counts = {"queries": 0, "checked": 0, "writes": 0, "resets": 0}
+
+    def fail(self, message):
+        with self.lock:
+            self.failures.append(message)
+
+    def add(self, key, n=1):
+        with self.lock:
+            self.counts[key] += n
+
+
+def random_vectors(rng, n, dim):
+    vectors = rng.standard_normal((n, dim)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def writer(store, checker, stop, args):
+    """Uploads (new and replaced documents), deletions, persists and the occasional reset"""
+    rng = np.random.default_rng(1)
+    pick = random.Random(1)
+    upload = 0
+    try:
+        while not stop.is_set():
+            action = pick.random()
+            sources = list(store.snapshot.documents)
+            if action < args.reset_rate:
+                store.reset()
+                checker.add("resets")
+            elif action < 0.2 and sources:
+                store.delete_document(pick.choice(sources), persist=pick.random() < 0.5)
+            else:
+                # A third of the uploads replace an existing document
+                source = pick.choice(sources) if sources and pick.random() < 0.33 else f"doc{upload:05d}.pdf"
+                upload += 1
+                n = pick.randint(1, args.chunks_per_doc)
+                docs = [{"text": f"{source} part {i} token{pick.randrange(50)}", "source": source,
+                         "page_start": 1 + i // 4, "page_end": 1 + i // 4} for i in range(n)]
+                store.add_documents(docs, vectors=random_vectors(rng, n, store.dim), persist=pick.random() < 0.3)
+            checker.add("writes")
+    except Exception:
+        checker.fail("writer: " + traceback.format_exc())
+        stop.set()
+
+
+def check_snapshot(store, snapshot, rng, pick, checker):
+    """Search one snapshot for a live chunk's own vector and check what comes back"""
+    from backend.core.vector_store import SearchFilter
+    documents = snapshot.documents
+    if not documents:
+        return
+    source = pick.choice(list(documents))
+    start, end = pick.choice(documents[source]["ranges"])
+    chunk_id = pick.randrange(start, end)
+    ids, vectors = snapshot.vectors.take(np.array([chunk_id], dtype="int64"))
+    if list(ids) != [chunk_id]:
+        checker.fail(f"v{snapshot.version}: live chunk {chunk_id} of {source} has no vector")
+        return
+    # Dense only: a chunk's own vector is its nearest neighbour
+    found = store.search_vectors(vectors, 3, snapshot=snapshot)[0]
+    if not found or found[0].get("id") != chunk_id or found[0].get("source") != source:
+        checker.fail(f"v{snapshot.version}: searching chunk {chunk_id} of {source} returned "
+                     f"{[(r.get('id'), r.get('source')) for r in found]}")
+    # Hybrid and filtered: every result belongs to a live document and lies within its chunks
+    search_filter = SearchFilter(sources=(source,)) if pick.random() < 0.5 else SearchFilter(page_from=1, page_to=2)
+    found = store.search_vectors(random_vectors(rng, 1, store.dim), 10, queries=[f"{source} part 1"],
+                                 allowed=store.allowed_ids(search_filter, snapshot), snapshot=snapshot)[0]
+    found += store.search_vectors(random_vectors(rng, 1, store.dim), 10, queries=["part token7"], snapshot=snapshot)[0]
+    for row in found:
+        entry = documents.get(row["source"])
+        if entry is None or not any(s <= row["id"] < e for s, e in entry["ranges"]):
+            checker.fail(f"v{snapshot.version}: result {row['id']} of {row['source']} is not a live chunk")
+    checker.add("checked")
+
+
+def reader(store, checker, stop, seed):
+    rng = np.random.default_rng(seed)
+    pick = random.Random(seed)
+    version = -1
+    try:
+        while not stop.is_set():
+            snapshot = store.snapshot
+            if snapshot.version < version:
+                checker.fail(f"version went back from {version} to {snapshot.version}")
+            version = snapshot.version
+            if pick.random() < 0.5:
+                check_snapshot(store, snapshot, rng, pick, checker)
+            else:
+                # The plain API: whatever version it reads, it must not fail
+                store.similarity_search("part token3", top_k=5, vector=random_vectors(rng, 1, store.dim))
+            checker.add("queries")
+    except Exception:
+        checker.fail(f"reader {seed}: " + traceback.format_exc())
+        stop.set()
+
+
+def main(args):
+    # Settings are read at import, so the throwaway store's path is set before any backend import
+    directory = tempfile.mkdtemp(prefix="stress-")
+    os.environ["VECTOR_STORE_PATH"] = directory
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(directory, "embedding_cache.db")
+    os.environ["INDEX_FACTORY"] = args.factory
+    os.environ["INDEX_DELTA_MAX"] = str(args.delta_max)
+    os.environ["COMPACT_MAX_SEGMENTS"] = "4"
+    from backend.core.vector_store import VectorStore
+
+    store = VectorStore()
+    checker = Checker()
+    stop = threading.Event()
+    threads = [threading.Thread(target=writer, args=(store, checker, stop, args))]
+    threads += [threading.Thread(target=reader, args=(store, checker, stop, seed)) for seed in range(args.readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    store.close()
+
+    counts = checker.counts
+    print(f"{args.factory}, {args.readers} readers, {elapsed:.1f} s: {counts['queries'] / elapsed:.0f} queries/s "
+          f"({counts['checked']} checked), {counts['writes'] / elapsed:.0f} writes/s, {counts['resets']} resets, "
+          f"{store.count} chunks at the end")
+    for failure in checker.failures[:20]:
+        print(failure)
+    print(f"{len(checker.failures)} failures")
+    return 1 if checker.failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel searches during uploads, deletions and resets on a throwaway "
+                                                 "store, checking each search against the snapshot it read: a chunk's "
+                                                 "own vector finds it, and every result is a live chunk of its document")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--chunks-per-doc", type=int, default=40)
+    parser.add_argument("--factory", default="Flat", help="Index type; the nearest-neighbour check assumes exact search")
+    parser.add_argument("--delta-max", type=int, default=2000, help="INDEX_DELTA_MAX, low so rebuilds happen often")
+    parser.add_argument("--reset-rate", type=float, default=0.005, help="Fraction of writes that reset the store")
+    sys.exit(main(parser.parse_args()))
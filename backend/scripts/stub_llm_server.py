@@ -0,0 +1,65 @@
+import json
+import asyncio
+import argparse
+from typing import Any, AsyncGenerator, Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Local stand-in for the Hugging Face inference API. Point the backend at it with
+# HF_API_BASE=http://127.0.0.1:8081/models (any HF_API_KEY is accepted).
+
+app = FastAPI(title="Stub LLM server")
+config: Dict[str, Any] = {"first_token_delay": 0.3, "token_delay": 0.03, "tokens": 40, "unavailable": [], "slow": [], "slow_delay": 10.0}
+
+
+def _answer(prompt: str) -> List[str]:
+    words = prompt.split()[-8:]
+    tokens = ["Stub", " answer", " about"] + [f" {w}" for w in words]
+    while len(tokens) < config["tokens"]:
+        tokens.append(f" token{len(tokens)}")
+    return tokens[:config["tokens"]]
+
+
+@app.post("/models/{model:path}")
+async def generate(model: str, request: Request) -> Any:
+    if model in config["unavailable"]:
+        return JSONResponse({"error": f"Model {model} is currently loading"}, status_code=503)
+    body = await request.json()
+    tokens = _answer(body.get("inputs", ""))
+    first_token_delay = config["slow_delay"] if model in config["slow"] else config["first_token_delay"]
+
+    if not body.get("stream"):
+        await asyncio.sleep(first_token_delay + config["token_delay"] * len(tokens))
+        return [{"generated_text": "".join(tokens)}]
+
+    # Same event format as text-generation-inference
+    async def events() -> AsyncGenerator[str, None]:
+        await asyncio.sleep(first_token_delay)
+        for i, text in enumerate(tokens):
+            final = i == len(tokens) - 1
+            event = {
+                "token": {"id": i, "text": text, "logprob": 0.0, "special": False},
+                "generated_text": "".join(tokens) if final else None,
+                "details": None,
+            }
+            yield f"data:{json.dumps(event)}\n\n"
+            if not final:
+                await asyncio.sleep(config["token_delay"])
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Stub text-generation server with configurable latency")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--first-token-delay", type=float, default=config["first_token_delay"])
+    parser.add_argument("--token-delay", type=float, default=config["token_delay"])
+    parser.add_argument("--tokens", type=int, default=config["tokens"])
+    parser.add_argument("--unavailable", nargs="*", default=[], help="Models that answer 503")
+    parser.add_argument("--slow", nargs="*", default=[], help="Models that wait --slow-delay before answering")
+    parser.add_argument("--slow-delay", type=float, default=config["slow_delay"])
+    args = parser.parse_args()
+    config.update(first_token_delay=args.first_token_delay, token_delay=args.token_delay, tokens=args.tokens,
+                  unavailable=args.unavailable, slow=args.slow, slow_delay=args.slow_delay)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
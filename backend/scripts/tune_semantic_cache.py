@@ -0,0 +1,62 @@
+import csv
+import argparse
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from backend.config.settings import MODEL_NAME, SEMANTIC_CACHE_THRESHOLD
+
+# (query, cached query, same answer?) used when no pairs file is given
+SAMPLE_PAIRS = [
+    ("what's the deadline", "when is it due", 1),
+    ("what is the submission deadline", "by when do I have to submit", 1),
+    ("who wrote this report", "who is the author of the report", 1),
+    ("how much does the license cost", "what is the price of a license", 1),
+    ("summarize the introduction", "give me a summary of the intro", 1),
+    ("what are the system requirements", "which hardware do I need", 1),
+    ("how do I reset my password", "steps to change a forgotten password", 1),
+    ("what's the deadline", "what's the budget", 0),
+    ("who wrote this report", "who reviewed this report", 0),
+    ("how much does the license cost", "how long does the license last", 0),
+    ("summarize the introduction", "summarize the conclusion", 0),
+    ("what are the system requirements", "what are the legal requirements", 0),
+    ("how do I reset my password", "how do I reset the device", 0),
+    ("when was the company founded", "when was the company acquired", 0),
+]
+
+
+def load_pairs(path):
+    """Tab-separated lines: query, cached query, 1 if the same answer applies else 0"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(a, b, int(label)) for a, b, label in csv.reader(f, delimiter="\t")]
+
+
+def report(pairs, thresholds):
+    model = SentenceTransformer(MODEL_NAME)
+    a = model.encode([p[0] for p in pairs], convert_to_numpy=True, normalize_embeddings=True)
+    b = model.encode([p[1] for p in pairs], convert_to_numpy=True, normalize_embeddings=True)
+    similarity = np.sum(a * b, axis=1)
+    labels = np.array([p[2] for p in pairs], dtype=bool)
+    print(f"{len(pairs)} pairs ({labels.sum()} paraphrases), model {MODEL_NAME}, "
+          f"current threshold {SEMANTIC_CACHE_THRESHOLD}\n")
+
+    # A hit on a non-paraphrase serves a wrong answer, so precision matters most
+    print(f"{'threshold':>10}{'hits':>6}{'precision':>11}{'recall':>8}{'wrong hits':>12}")
+    for t in thresholds:
+        hit = similarity >= t
+        correct = np.sum(hit & labels)
+        precision = correct / hit.sum() if hit.sum() else 1.0
+        recall = correct / labels.sum() if labels.sum() else 0.0
+        print(f"{t:>10.2f}{int(hit.sum()):>6}{precision:>11.3f}{recall:>8.3f}{int(np.sum(hit & ~labels)):>12}")
+
+    print("\nClosest non-paraphrases (a threshold below these serves wrong answers):")
+    for i in np.argsort(-np.where(labels, -np.inf, similarity))[:5]:
+        if not labels[i]:
+            print(f"  {similarity[i]:.3f}  {pairs[i][0]!r} ~ {pairs[i][1]!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precision/recall of semantic cache hits per similarity threshold")
+    parser.add_argument("--pairs", help="TSV file of query, cached query, label (1 = same answer)")
+    parser.add_argument("--thresholds", type=float, nargs="+",
+                        default=[0.70, 0.75, 0.80, 0.85, 0.88, 0.90, 0.92, 0.94, 0.96, 0.98])
+    args = parser.parse_args()
+    report(load_pairs(args.pairs) if args.pairs else SAMPLE_PAIRS, args.thresholds)
@@ -1,10 +1,137 @@
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional
 from PyPDF2 import PdfReader
+from backend.config.settings import MODEL_NAME, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
 
-def extract_text_from_pdf(pdf_path, chunk_size=300):
-    reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    # chunk text
-    chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-    return chunks
\ No newline at end of file
+# Sentence ends followed by what looks like the start of the next one
+SENTENCE_END = re.compile(r"(?<=[.!?:;])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+
+@lru_cache(maxsize=None)
+def token_counter(model_name: str = MODEL_NAME) -> TokenCounter:
+    """Batch token counts in the embedding model's own tokenizer (loaded once per process)"""
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def count(texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+    return count
+
+
+def iter_pages(pdf_path, start=0, end=None) -> Iterator[str]:
+    """Texts of pages [start, end), extracted one page at a time"""
+    # Given a path PdfReader loads the whole file into memory; an open file is read lazily
+    with open(pdf_path, "rb") as f:
+        reader = PdfReader(f)
+        for i in range(start, len(reader.pages) if end is None else min(end, len(reader.pages))):
+            yield reader.pages[i].extract_text() or ""
+
+
+def page_count(pdf_path) -> int:
+    with open(pdf_path, "rb") as f:
+        return len(PdfReader(f).pages)
+
+
+def extract_pages(pdf_path):
+    return list(iter_pages(pdf_path))
+
+
+def split_paragraphs(page_text: str) -> List[List[str]]:
+    """Sentences of each paragraph on a page, with PDF line wrapping undone"""
+    paragraphs = []
+    for block in PARAGRAPH_BREAK.split(page_text):
+        # Re-join words hyphenated across lines, then the lines themselves
+        text = re.sub(r"(\w)-\n(\w)", r"\1\2", block)
+        text = re.sub(r"\s+", " ", text).strip()
+        if text:
+            paragraphs.append([s for s in SENTENCE_END.split(text) if s])
+    return paragraphs
+
+
+def _split_long(sentence: str, max_tokens: int, count: TokenCounter) -> List[str]:
+    """Break a sentence longer than max_tokens into word runs that fit"""
+    words = sentence.split(" ")
+    pieces, current, used = [], [], 0
+    for word, tokens in zip(words, count(words)):
+        if current and used + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, used = [], 0
+        current.append(word)
+        used += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_pages(pages: Iterable[str], max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+                count: Optional[TokenCounter] = None, first_page: int = 1) -> Iterator[Dict[str, Any]]:
+    """Chunks of at most max_tokens embedding-model tokens, built from whole sentences.
+
+    Pages are consumed lazily. A chunk closes early at a paragraph boundary once
+    it is three-quarters full, and the next chunk starts with the previous one's
+    last sentences, up to overlap_tokens. Yields {"text", "page_start", "page_end"}
+    with 1-based page numbers, counted from first_page.
+    """
+    count = count or token_counter()
+    # (sentence, tokens, page, starts a paragraph) in the chunk being built
+    current: List[tuple] = []
+    used = 0
+
+    def emit():
+        text = ""
+        for sentence, _, _, paragraph_start in current:
+            text += ("\n\n" if paragraph_start else " ") + sentence if text else sentence
+        return {"text": text, "page_start": current[0][2], "page_end": current[-1][2]}
+
+    def carry_over():
+        kept, total = [], 0
+        for unit in reversed(current):
+            if total + unit[1] > overlap_tokens:
+                break
+            kept.insert(0, (unit[0], unit[1], unit[2], False))
+            total += unit[1]
+        # A chunk made only of overlap would repeat the previous one
+        return (kept, total) if len(kept) < len(current) else ([], 0)
+
+    for page_number, page_text in enumerate(pages, start=first_page):
+        paragraphs = split_paragraphs(page_text)
+        sentences = [s for paragraph in paragraphs for s in paragraph]
+        counts = iter(count(sentences))
+        for paragraph in paragraphs:
+            for i, sentence in enumerate(paragraph):
+                tokens = next(counts)
+                if tokens <= max_tokens:
+                    units = [(sentence, tokens)]
+                else:
+                    pieces = _split_long(sentence, max_tokens, count)
+                    units = list(zip(pieces, count(pieces)))
+                for j, (text, n) in enumerate(units):
+                    paragraph_start = i == 0 and j == 0
+                    if current and (used + n > max_tokens or (paragraph_start and used >= 0.75 * max_tokens)):
+                        yield emit()
+                        current, used = carry_over()
+                        if used + n > max_tokens:
+                            current, used = [], 0
+                    current.append((text, n, page_number, paragraph_start))
+                    used += n
+    if current:
+        yield emit()
+
+
+def extract_text_from_pdf(pdf_path, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    return [chunk["text"] for chunk in chunk_pages(iter_pages(pdf_path), max_tokens, overlap_tokens)]
+
+
+def chunk_pdf(pdf_path, start=0, end=None, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Chunks of pages [start, end) of a PDF; run in the ingestion worker processes.
+
+    Page ranges are chunked independently, so a range boundary acts as a
+    paragraph break and no overlap is carried across it.
+    """
+    return list(chunk_pages(iter_pages(pdf_path, start, end), max_tokens, overlap_tokens, first_page=start + 1))
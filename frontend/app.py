@@ -1,7 +1,7 @@
 import streamlit as st
 import requests
 import json
-from typing import Optional
+from typing import List, Optional
 import time
 import base64
 from datetime import datetime
@@ -268,18 +268,25 @@ def load_modern_css():
 
 # API Configuration (unchanged)
 API_BASE_URL = "http://127.0.0.1:8000/api"
+UPLOAD_TIMEOUT = 120  # seconds to send files; processing continues in the background
+JOB_POLL_INTERVAL = 1.0
+JOB_TIMEOUT = 60 * 60
 
-def upload_pdf_to_api(uploaded_file) -> Optional[dict]:
-    """Upload PDF file to the backend API"""
+def upload_pdf_to_api(uploaded_files, collection: str = "default") -> Optional[dict]:
+    """Submit PDF files to the backend API as a background ingestion job"""
     try:
-        files = {"files": (uploaded_file.name, uploaded_file.getvalue(), "application/pdf")}
-        response = requests.post(f"{API_BASE_URL}/upload", files=files)
+        files = [("files", (f.name, f.getvalue(), "application/pdf")) for f in uploaded_files]
+        response = requests.post(f"{API_BASE_URL}/upload", files=files, params={"collection": collection},
+                                 timeout=UPLOAD_TIMEOUT)
         
         if response.status_code == 200:
             return response.json()
         else:
             st.error(f"Upload failed: {response.status_code} - {response.text}")
             return None
+    except requests.exceptions.Timeout:
+        st.error("⏱️ Upload timed out. Try fewer or smaller files.")
+        return None
     except requests.exceptions.ConnectionError:
         st.error("❌ Cannot connect to backend API. Make sure the server is running.")
         return None
@@ -287,10 +294,29 @@ def upload_pdf_to_api(uploaded_file) -> Optional[dict]:
         st.error(f"Upload error: {str(e)}")
         return None
 
-def ask_question_to_api(question: str, top_k: int = 5) -> Optional[dict]:
+def get_job_status(job_id: str) -> Optional[dict]:
+    """Poll the status of an ingestion job"""
+    try:
+        response = requests.get(f"{API_BASE_URL}/jobs/{job_id}", timeout=5)
+        if response.status_code == 200:
+            return response.json()
+        return None
+    except requests.exceptions.RequestException:
+        # Transient errors are retried on the next poll
+        return None
+
+def query_params(question: str, top_k: int, sources: Optional[List[str]], collection: str = "default") -> dict:
+    params = {"query": question, "top_k": top_k, "collection": collection}
+    if sources:
+        # Repeated ?source= parameters restrict the search to these documents
+        params["source"] = sources
+    return params
+
+def ask_question_to_api(question: str, top_k: int = 5, sources: Optional[List[str]] = None,
+                        collection: str = "default") -> Optional[dict]:
     """Send question to the backend API"""
     try:
-        params = {"query": question}
+        params = query_params(question, top_k, sources, collection)
         response = requests.post(f"{API_BASE_URL}/query", params=params)
         
         if response.status_code == 200:
@@ -305,14 +331,30 @@ def ask_question_to_api(question: str, top_k: int = 5) -> Optional[dict]:
         st.error(f"Query error: {str(e)}")
         return None
 
-def stream_ask_question(question: str, top_k: int = 5):
-    """Stream question to the backend API"""
+def stream_ask_question(question: str, top_k: int = 5, sources: Optional[List[str]] = None,
+                        collection: str = "default"):
+    """Stream question to the backend API, yielding answer text as it arrives.
+
+    Sources from the leading server-sent event are stored in
+    st.session_state.last_sources.
+    """
     try:
-        params = {"query": question}
+        params = query_params(question, top_k, sources, collection)
+        st.session_state.last_sources = []
         with requests.post(f"{API_BASE_URL}/query-stream", params=params, stream=True) as r:
             if r.status_code == 200:
-                for chunk in r.iter_content(None, decode_unicode=True):
-                    yield chunk
+                event = None
+                for line in r.iter_lines(decode_unicode=True):
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        data = json.loads(line[len("data:"):])
+                        if event == "token":
+                            yield data["text"]
+                        elif event == "sources":
+                            st.session_state.last_sources = data["sources"]
+                        elif event == "error":
+                            st.error(f"The answer was interrupted: {data['error']}")
             else:
                 st.error(f"Query failed: {r.status_code} - {r.text}")
                 yield "Sorry, I couldn't process your question. Please try again."
@@ -326,15 +368,15 @@ def stream_ask_question(question: str, top_k: int = 5):
 def check_api_health() -> bool:
     """Check if the backend API is running"""
     try:
-        response = requests.get(f"{API_BASE_URL.replace('/api', '')}/docs", timeout=5)
+        response = requests.get(f"{API_BASE_URL}/live", timeout=5)
         return response.status_code == 200
     except:
         return False
 
-def get_system_status():
+def get_system_status(collection: str = "default"):
     """Get detailed system status from backend"""
     try:
-        response = requests.get(f"{API_BASE_URL}/status", timeout=5)
+        response = requests.get(f"{API_BASE_URL}/status", params={"collection": collection}, timeout=5)
         if response.status_code == 200:
             return response.json()
         return None
@@ -379,8 +421,9 @@ def main():
     load_modern_css()
     
     # Initialize session state
-    if 'processed_files' not in st.session_state:
-        st.session_state.processed_files = {}
+    # Processed files per collection; processed_files is the selected collection's
+    if 'collection_files' not in st.session_state:
+        st.session_state.collection_files = {}
     
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = []
@@ -398,9 +441,17 @@ def main():
         # Simplified sidebar header without the white banner
         st.subheader("⚙️ Control Panel")
         
+        collection = st.text_input(
+            "Collection",
+            value=st.session_state.get('collection', "default"),
+            help="Documents are uploaded to and searched in this collection"
+        ).strip() or "default"
+        st.session_state['collection'] = collection
+        st.session_state.processed_files = st.session_state.collection_files.setdefault(collection, {})
+        
         # System status
         api_connected = check_api_health()
-        system_status = get_system_status() if api_connected else None
+        system_status = get_system_status(collection) if api_connected else None
         
         # System status card
         st.markdown("""
@@ -450,6 +501,12 @@ def main():
             )
             st.session_state['top_k'] = top_k
             
+            st.session_state['search_sources'] = st.multiselect(
+                "Search only in",
+                list(st.session_state.processed_files),
+                help="Leave empty to search all documents"
+            )
+            
             # Model settings (placeholder for future features)
             st.selectbox(
                 "Response Style",
@@ -501,25 +558,61 @@ def main():
     if uploaded_files:
         if st.button("🚀 Process Documents", type="primary", use_container_width=True):
             with st.status("Processing documents...", expanded=True) as status:
+                st.write(f"📤 Uploading {len(uploaded_files)} files...")
+                result = upload_pdf_to_api(uploaded_files, st.session_state['collection'])
+                job = None
+                if result:
+                    for failed in result.get("failed", []):
+                        st.warning(f"⚠️ {failed['filename']}: {failed['reason']}")
+                    for filename in result.get("unchanged", []):
+                        st.info(f"♻️ {filename} is already indexed")
+                
+                if result and result.get("job_id"):
+                    # Poll the ingestion job until it finishes
+                    progress_bar = st.progress(0.0)
+                    stage_text = st.empty()
+                    deadline = time.time() + JOB_TIMEOUT
+                    while time.time() < deadline:
+                        job = get_job_status(result["job_id"]) or job
+                        if job:
+                            fraction = job["embedded"] / job["chunks"] if job["chunks"] else 0.0
+                            # Chunks keep arriving while pages are parsed, so weigh in page progress
+                            if job.get("total_pages"):
+                                fraction = min(fraction, job["pages"] / job["total_pages"])
+                            progress_bar.progress(min(fraction, 1.0))
+                            rate = f" · {job['chunks_per_second']} chunks/s" if job.get("chunks_per_second") else ""
+                            stage_text.write(f"⚙️ Stage: {job['stage'] or job['status']} · {job['embedded']}/{job['chunks']} chunks{rate}")
+                            if job["status"] in ("completed", "failed"):
+                                break
+                        time.sleep(JOB_POLL_INTERVAL)
+                    else:
+                        st.warning("⏱️ Still processing in the background. Check back later.")
+                
                 total_chunks = 0
                 processed_files = []
-                for i, uploaded_file in enumerate(uploaded_files):
-                    st.write(f"📄 Processing {uploaded_file.name}...")
-                    result = upload_pdf_to_api(uploaded_file)
-                    if result:
-                        chunks = result.get('chunks', 0)
+                for file_result in (job or {}).get("files", []):
+                    if file_result.get("status") == "processed":
+                        chunks = file_result.get('chunks', 0)
                         total_chunks += chunks
-                        st.session_state.processed_files[uploaded_file.name] = {
+                        st.session_state.processed_files[file_result["filename"]] = {
                             "chunks": chunks,
                             "status": "✅ Processed",
                             "timestamp": datetime.now().strftime("%H:%M:%S")
                         }
-                        processed_files.append(uploaded_file.name)
-                        st.success(f"✅ Added {chunks} chunks")
-                    time.sleep(0.5)
+                        processed_files.append(file_result["filename"])
+                        st.success(f"✅ {file_result['filename']}: added {chunks} chunks")
+                    elif file_result.get("status") in ("unchanged", "duplicate"):
+                        st.info(f"♻️ {file_result['filename']}: {file_result.get('reason', 'already indexed')}")
+                    elif file_result.get("status") == "failed":
+                        st.error(f"❌ {file_result['filename']}: {file_result.get('reason', 'failed')}")
                 
-                status.update(label=f"Processing complete! Added {total_chunks} total chunks from {len(processed_files)} files.", state="complete")
-                st.balloons()
+                if processed_files:
+                    status.update(label=f"Processing complete! Added {total_chunks} total chunks from {len(processed_files)} files.", state="complete")
+                    st.balloons()
+                elif result and result.get("status") == "unchanged":
+                    status.update(label="Documents are already up to date.", state="complete")
+                else:
+                    status.update(label="No documents were processed.", state="error")
     
     # Chat Section
     st.markdown("---")
@@ -580,16 +673,19 @@ def main():
             response_placeholder = st.empty()
             full_response = ""
             
-            for chunk in stream_ask_question(user_input, st.session_state.get('top_k', 5)):
+            for chunk in stream_ask_question(user_input, st.session_state.get('top_k', 5),
+                                        st.session_state.get('search_sources'),
+                                        st.session_state.get('collection', "default")):
                 full_response += chunk
                 response_placeholder.markdown(f'<div class="assistant-message"><strong>🤖 Assistant:</strong> {full_response}</div>', unsafe_allow_html=True)
             
             st.session_state.messages.append({
                 "role": "assistant", 
-                "content": full_response
+                "content": full_response,
+                "sources": st.session_state.get("last_sources", [])
             })
         
         st.rerun()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
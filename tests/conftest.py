@@ -0,0 +1,82 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+import numpy as np
+import pytest
+
+# Point runtime data at a scratch directory before any backend module reads its settings,
+# and keep answers to the models registered by the tests
+_data = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.update({
+    "EMBEDDING_CACHE_PATH": os.path.join(_data, "embedding_cache.db"),
+    "VECTOR_STORE_PATH": os.path.join(_data, "faiss_index"),
+    "COLLECTIONS_PATH": os.path.join(_data, "collections"),
+    "JOBS_DB_PATH": os.path.join(_data, "jobs.db"),
+    "UPLOAD_DIR": os.path.join(_data, "uploads"),
+    "WRITER_LOCK_PATH": os.path.join(_data, "writer.lock"),
+    "HF_API_KEY": "",
+    "LOCAL_LLM_MODEL": "",
+    "RERANK_ENABLED": "0",
+})
+
+from backend.core.embedder import Embedder  # noqa: E402
+from backend.core.llm_manager import ModelBackend, ModelUnavailable  # noqa: E402
+
+
+class HashEmbedder(Embedder):
+    """Deterministic unit vectors seeded by each text's hash, so no model is loaded"""
+
+    dim = 16
+
+    def _encode(self, texts):
+        rows = [np.random.default_rng(int(hashlib.md5(t.encode()).hexdigest()[:8], 16)).standard_normal(self.dim)
+                for t in texts]
+        vectors = np.array(rows, dtype="float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubBackend(ModelBackend):
+    """Answers with fixed tokens after delay seconds; with fail set it raises instead, after streaming them"""
+
+    def __init__(self, name="stub", tokens=("The ", "answer."), delay=0.0):
+        self.name = self.model_name = name
+        self.tokens = list(tokens)
+        self.delay = delay
+        self.fail = False
+        self.calls = 0
+
+    async def generate(self, prompt, deadline):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ModelUnavailable(f"{self.name} failed")
+        return "".join(self.tokens)
+
+    async def stream(self, prompt, deadline):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        for token in self.tokens:
+            yield token
+        if self.fail:
+            raise ModelUnavailable(f"{self.name} failed mid-answer")
+
+
+@pytest.fixture
+def embedder():
+    return HashEmbedder(model_name="hash")
+
+
+def unit_vectors(n, dim=HashEmbedder.dim, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from backend.core import ann_index, vector_store
+from backend.core.vector_store import VectorStore
+from conftest import unit_vectors
+
+
+def test_rescore_orders_candidates_by_exact_score():
+    vectors = unit_vectors(50)
+    queries = unit_vectors(2, seed=1)
+    stored_ids = np.arange(0, 100, 2)
+
+    def take(ids):
+        found = np.intersect1d(ids, stored_ids)
+        return found, vectors[found // 2]
+
+    # Candidates in arbitrary order, padded with -1 and with ids that are not stored
+    candidates = np.array([np.r_[np.random.default_rng(row).permutation(stored_ids), [-1, 3, 7]]
+                           for row in range(len(queries))])
+    scores, ids = ann_index.rescore(queries, candidates, take, 5)
+    exact = queries @ vectors.T
+    for row in range(len(queries)):
+        top = np.argsort(-exact[row])[:5]
+        assert ids[row].tolist() == (stored_ids[top]).tolist()
+        np.testing.assert_allclose(scores[row], exact[row, top], rtol=1e-5)
+
+
+@pytest.mark.parametrize("factory, index_type", [("SQ8", "IndexScalarQuantizer"), ("LSH", "IndexLSH")])
+def test_rescored_search_returns_exact_top_k(tmp_path, embedder, monkeypatch, factory, index_type):
+    monkeypatch.setattr(vector_store, "INDEX_FACTORY", factory)
+    n = ann_index.MIN_QUANTIZER_TRAINING + 200
+    vectors = unit_vectors(n)
+    store = VectorStore(str(tmp_path / "store"), embedder)
+    store.add_documents([{"text": str(i), "source": "a.pdf"} for i in range(n)], vectors=vectors)
+    assert not store.awaiting_training
+    assert ann_index.describe(store.index) == index_type
+
+    # Enough candidates that every chunk is rescored against its stored vector
+    store.rescore_factor = n
+    queries = unit_vectors(4, seed=1)
+    results = store.search_vectors(queries, top_k=5)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :5]
+    for hits, top in zip(results, exact):
+        assert [int(hit["text"]) for hit in hits] == top.tolist()
+    store.close()
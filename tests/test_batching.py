@@ -0,0 +1,72 @@
+import asyncio
+from backend.core.batching import MicroBatcher
+
+
+class Doubler:
+    """Batch function recording the batches it is given"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if "bad" in items:
+            raise ValueError("bad item")
+        return [item * 2 for item in items]
+
+
+def test_concurrent_calls_share_batches_of_at_most_max_batch():
+    fn = Doubler()
+    batcher = MicroBatcher(fn, max_batch=4, max_wait=0.05)
+
+    async def main():
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        finally:
+            batcher.close()
+
+    assert asyncio.run(main()) == [i * 2 for i in range(10)]
+    assert sorted(i for batch in fn.batches for i in batch) == list(range(10))
+    assert max(len(batch) for batch in fn.batches) == 4
+    assert len(fn.batches) <= 4
+    stats = batcher.stats()
+    assert stats["items"] == 10 and stats["largest_batch"] == 4
+
+
+def test_a_lone_call_is_dispatched_after_max_wait():
+    fn = Doubler()
+    batcher = MicroBatcher(fn, max_batch=8, max_wait=0.01)
+
+    async def main():
+        try:
+            return await asyncio.wait_for(batcher.submit(3), 1.0)
+        finally:
+            batcher.close()
+
+    assert asyncio.run(main()) == 6
+    assert fn.batches == [[3]]
+
+
+def test_a_failing_batch_fails_only_its_own_callers():
+    fn = Doubler()
+    batcher = MicroBatcher(fn, max_batch=2, max_wait=0.05)
+
+    async def main():
+        try:
+            failed = await asyncio.gather(batcher.submit("bad"), batcher.submit("x"), return_exceptions=True)
+            return failed, await batcher.submit("y")
+        finally:
+            batcher.close()
+
+    failed, later = asyncio.run(main())
+    assert all(isinstance(e, ValueError) for e in failed)
+    assert later == "yy"
+
+
+def test_the_batcher_follows_a_new_event_loop():
+    fn = Doubler()
+    batcher = MicroBatcher(fn, max_batch=2, max_wait=0.01)
+    # e.g. a test client or a reloaded server starting a fresh loop
+    assert asyncio.run(batcher.submit(1)) == 2
+    assert asyncio.run(batcher.submit(2)) == 4
+    assert fn.batches == [[1], [2]]
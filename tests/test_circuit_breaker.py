@@ -0,0 +1,81 @@
+import pytest
+from backend.core import circuit_breaker, llm_manager
+from backend.core.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from backend.core.llm_manager import LLMManager
+from conftest import Clock, StubBackend
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def test_consecutive_failures_open_the_circuit_until_a_probe_succeeds(clock):
+    breaker = CircuitBreaker("model", failure_threshold=3, cooldown=30, window=20)
+    for _ in range(2):
+        breaker.record_failure(0.1)
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow() and not breaker.available
+
+    clock.now += 30
+    assert breaker.available
+    # Half-open lets exactly one probe through
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow() and not breaker.available
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED and breaker.allow()
+    assert breaker.consecutive_failures == 0
+
+
+def test_failed_probes_double_the_cooldown_up_to_the_limit(clock):
+    breaker = CircuitBreaker("model", failure_threshold=1, cooldown=10, window=20, max_cooldown=30)
+    breaker.record_failure(0.1)
+    for cooldown in (20, 30, 30):
+        clock.now += breaker.cooldown
+        assert breaker.allow()
+        breaker.record_failure(0.1)
+        assert breaker.state == OPEN and breaker.cooldown == cooldown
+        assert breaker.stats(1.0)["retry_in_seconds"] == cooldown
+
+    clock.now += breaker.cooldown
+    assert breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.cooldown == 10
+
+
+def test_an_abandoned_probe_frees_the_probe_slot(clock):
+    breaker = CircuitBreaker("model", failure_threshold=1, cooldown=10, window=20)
+    breaker.record_failure(0.1)
+    clock.now += 10
+    assert breaker.allow() and not breaker.allow()
+    breaker.release(0.5)
+    assert breaker.state == HALF_OPEN and breaker.allow()
+
+
+def test_a_high_error_rate_opens_the_circuit():
+    breaker = CircuitBreaker("model", failure_threshold=3, cooldown=10, window=20)
+    for _ in range(3):
+        breaker.record_success(0.1)
+        breaker.record_failure(0.1)
+        breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+    assert breaker.error_rate == pytest.approx(2 / 3)
+
+
+def test_routing_skips_open_circuits_and_prefers_faster_models(clock, monkeypatch):
+    monkeypatch.setattr(llm_manager, "LLM_HEDGE_DELAY", 1.0)
+    manager = LLMManager()
+    for name in ("first", "second", "third"):
+        manager.add_backend(StubBackend(name))
+    assert manager._route() == ["first", "second", "third"]
+
+    manager.breakers["third"].record_success(0.1)
+    manager.breakers["first"].record_success(3.0)
+    for _ in range(manager.breakers["second"].failure_threshold):
+        manager.breakers["second"].record_failure(0.1)
+    assert manager._route() == ["third", "first"]
+    assert manager.status()["models"]["second"]["rank"] is None
@@ -0,0 +1,103 @@
+import os
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import routes
+from backend.core import collection_manager as collections
+from backend.core.collection_manager import CollectionManager
+from backend.core.startup import StartupTasks
+from conftest import Clock
+
+
+def _manager(tmp_path, embedder, **kwargs):
+    return CollectionManager(embedder, root=str(tmp_path / "collections"), default_path=str(tmp_path / "default"),
+                             **kwargs)
+
+
+def _add(collection, text):
+    collection.store.add_documents([{"text": text, "source": f"{collection.name}.pdf"}])
+
+
+def test_collections_are_created_on_demand_and_kept_apart(tmp_path, embedder):
+    manager = _manager(tmp_path, embedder)
+    with pytest.raises(KeyError):
+        manager.get("legal")
+    for name in ("../etc", "", "a" * 65, "has space"):
+        with pytest.raises(ValueError):
+            manager.path(name)
+
+    _add(manager.get("legal", create=True), "Contract terms.")
+    _add(manager.get("hr", create=True), "Holiday policy.")
+    assert manager.names() == ["default", "hr", "legal"]
+    assert manager.get("legal").store.count == 1
+    assert list(manager.get("hr").store.documents) == ["hr.pdf"]
+    # The default collection always exists, at its own path
+    assert manager.get("default").store.count == 0
+    assert manager.path("default") == str(tmp_path / "default")
+    manager.close()
+
+
+def test_least_recently_used_collections_are_closed_over_the_memory_budget(tmp_path, embedder):
+    manager = _manager(tmp_path, embedder, memory_budget=1, idle_seconds=0)
+    _add(manager.get("first", create=True), "First text.")
+    pinned = manager.get("second", create=True, pin=True)
+    _add(pinned, "Second text.")
+    assert not manager.resident("first") and manager.resident("second")
+
+    # A pinned collection (being written to) stays open until unpinned
+    _add(manager.get("third", create=True), "Third text.")
+    assert manager.resident("second") and manager.resident("third")
+    manager.unpin(pinned)
+    assert not manager.resident("second")
+
+    # Closed collections reopen from disk
+    assert manager.get("first").store.count == 1
+    assert manager.stats()["loads"] == 4 and manager.stats()["evictions"] == 3
+    manager.close()
+
+
+def test_idle_collections_are_closed(tmp_path, embedder, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(collections.time, "monotonic", clock)
+    manager = _manager(tmp_path, embedder, idle_seconds=60)
+    _add(manager.get("first", create=True), "First text.")
+    manager.get("second", create=True)
+    clock.now += 30
+    manager.get("second")
+    clock.now += 45
+    manager.evict()
+    assert not manager.resident("first") and manager.resident("second")
+    assert manager.get("first").store.count == 1
+    manager.close()
+
+
+@pytest.fixture
+def client(tmp_path, embedder, monkeypatch):
+    manager = _manager(tmp_path, embedder)
+    ready = StartupTasks()
+    ready.start()
+    monkeypatch.setattr(routes, "collection_manager", manager)
+    monkeypatch.setattr(routes, "startup", ready)
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    with TestClient(app) as client:
+        yield client, manager
+    manager.close()
+
+
+def test_missing_collections_are_reported_empty_without_being_created(client, tmp_path):
+    client, manager = client
+    status = client.get("/api/status", params={"collection": "legal"}).json()
+    assert status["collection"] == "legal"
+    assert status["vector_store"]["exists"] is False and status["vector_store"]["document_count"] == 0
+    assert not os.path.exists(tmp_path / "collections" / "legal")
+
+    assert client.post("/api/query", params={"query": "q", "collection": "legal"}).status_code == 404
+    assert client.post("/api/query", params={"query": "q", "collection": "../legal"}).status_code == 400
+    assert client.get("/api/status", params={"collection": "bad name"}).status_code == 400
+
+    _add(manager.get("legal", create=True), "Contract terms.")
+    assert client.get("/api/status", params={"collection": "legal"}).json()["vector_store"]["document_count"] == 1
+    listed = {c["name"]: c for c in client.get("/api/collections").json()["collections"]}
+    assert listed["legal"] == {"name": "legal", "resident": True, "chunks": 1}
+    assert listed["default"]["resident"] is False
@@ -0,0 +1,55 @@
+import numpy as np
+from backend.core.embedding_cache import EmbeddingCache
+
+
+class CountingEncoder:
+    """Encoder returning a distinct vector per text, recording what it was asked to encode"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), sum(map(ord, t)) % 97, 1.0] for t in texts], dtype="float32")
+
+
+def test_cached_and_duplicate_texts_are_encoded_once(tmp_path):
+    cache = EmbeddingCache("model-a", str(tmp_path / "cache.db"))
+    encoder = CountingEncoder()
+    first = cache.encode(["alpha", "beta", "alpha"], encoder)
+    assert encoder.calls == [["alpha", "beta"]]
+    assert np.array_equal(first[0], first[2])
+
+    # Whitespace and Unicode normalization map to the same entry
+    again = cache.encode(["alpha  ", "beta", "gamma"], encoder)
+    assert encoder.calls[1:] == [["gamma"]]
+    assert np.array_equal(again[:2], first[:2])
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 3
+
+    # Entries belong to one model
+    EmbeddingCache("model-b", str(tmp_path / "cache.db")).encode(["alpha"], encoder)
+    assert encoder.calls[-1] == ["alpha"]
+
+
+def test_cache_persists_and_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache("model", path, max_entries=20)
+    encoder = CountingEncoder()
+    cache.encode([f"text {i}" for i in range(20)], encoder)
+    assert cache.stats()["entries"] == 20
+
+    reopened = EmbeddingCache("model", path, max_entries=20)
+    assert reopened.stats()["entries"] == 20
+    reopened.encode(["text 0"], encoder)
+    assert len(encoder.calls) == 1
+
+    # Going over the bound trims the least recently used entries; text 0 was just used
+    reopened.encode([f"new {i}" for i in range(5)], encoder)
+    entries = reopened.stats()["entries"]
+    assert entries <= 20
+    assert entries == reopened._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    calls = len(encoder.calls)
+    reopened.encode(["text 0", "new 4"], encoder)
+    assert len(encoder.calls) == calls
+    reopened.encode([f"text {i}" for i in range(1, 20)], encoder)
+    assert len(encoder.calls[-1]) == 25 - entries
@@ -0,0 +1,108 @@
+import pytest
+from backend.core import ingestion
+from backend.core.vector_store import VectorStore
+
+
+def _ingest(store, path, monkeypatch, version, fail_page=None):
+    """Ingest a two-page upload of path whose pages parse to three chunks each, or fail at fail_page"""
+    pipeline = ingestion.IngestionPipeline(processes=1, batch_size=2, pages_per_range=1, flush_chunks=2)
+    monkeypatch.setattr(ingestion, "page_count", lambda _: 2)
+
+    def parse_ranges(ranges, skip):
+        for page_range in ranges:
+            page = page_range[2]
+            if page == fail_page:
+                yield page_range, [], ValueError("unreadable page")
+            else:
+                chunks = [{"text": f"{version} page {page} chunk {i}", "page_start": page + 1, "page_end": page + 1}
+                          for i in range(3)]
+                yield page_range, chunks, None
+
+    monkeypatch.setattr(pipeline, "_parse_ranges", parse_ranges)
+    with open(path, "wb") as f:
+        f.write(version.encode())
+    return pipeline.run(store, [("a.pdf", path)])["a.pdf"]
+
+
+def test_failed_reupload_keeps_previous_version(tmp_path, embedder, monkeypatch):
+    upload = str(tmp_path / "a.pdf")
+    store = VectorStore(str(tmp_path / "store"), embedder)
+    assert _ingest(store, upload, monkeypatch, "v1")["status"] == "processed"
+    previous = dict(store.documents["a.pdf"])
+
+    # The first page of v2 is flushed to the index before the second one fails
+    assert _ingest(store, upload, monkeypatch, "v2", fail_page=1)["status"] == "failed"
+    assert store.documents["a.pdf"] == previous
+    assert store.count == 6
+    hits = store.search_vectors(embedder.embed(["v2 page 0 chunk 0"]), top_k=10)[0]
+    assert {hit["text"].split()[0] for hit in hits} == {"v1"}
+
+    assert _ingest(store, upload, monkeypatch, "v3")["status"] == "processed"
+    hits = store.search_vectors(embedder.embed(["v3 page 0 chunk 0"]), top_k=10)[0]
+    assert {hit["text"].split()[0] for hit in hits} == {"v3"}
+    store.close()
+
+    reopened = VectorStore(str(tmp_path / "store"), embedder)
+    assert reopened.count == reopened.documents["a.pdf"]["chunks"] == 6
+
+
+def _write_pages(path, pages):
+    """A stand-in PDF: one line of text per page"""
+    with open(path, "w") as f:
+        f.write("\n".join(pages))
+    return str(path)
+
+
+def _count_lines(path):
+    with open(path) as f:
+        return len(f.read().splitlines())
+
+
+def _chunk_lines(path, start, end):
+    """Stands in for chunk_pdf in the worker processes: one chunk per page of a _write_pages file"""
+    with open(path) as f:
+        pages = f.read().splitlines()[start:end]
+    if "unreadable" in pages:
+        raise ValueError(f"page {start + pages.index('unreadable') + 1} is unreadable")
+    return [{"text": text, "page_start": start + i + 1, "page_end": start + i + 1} for i, text in enumerate(pages)]
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(ingestion, "page_count", _count_lines)
+    monkeypatch.setattr(ingestion, "chunk_pdf", _chunk_lines)
+    pipeline = ingestion.IngestionPipeline(processes=2, batch_size=3, pages_per_range=2, flush_chunks=4)
+    yield pipeline
+    pipeline.shutdown()
+
+
+def test_page_ranges_are_parsed_in_the_pool_and_indexed_in_order(tmp_path, embedder, pipeline):
+    path = _write_pages(tmp_path / "big.pdf", [f"Page {page} of the big report." for page in range(1, 8)])
+    store = VectorStore(str(tmp_path / "store"), embedder)
+    stages = []
+    result = pipeline.run(store, [("big.pdf", path)], lambda stage, progress: stages.append(stage))["big.pdf"]
+
+    assert result["status"] == "processed"
+    assert result["pages"] == result["total_pages"] == 7
+    assert result["chunks"] == result["embedded"] == 7
+    assert stages[0] == "parse" and stages[-1] == "persist" and "index" in stages
+    assert store.documents["big.pdf"]["chunks"] == 7
+    # Chunks are numbered across ranges in page order
+    hit = store.search_vectors(embedder.embed(["Page 5 of the big report."]), top_k=1)[0][0]
+    assert (hit["text"], hit["page_start"], hit["chunk"]) == ("Page 5 of the big report.", 5, 4)
+
+
+def test_an_unreadable_range_fails_only_its_own_file(tmp_path, embedder, pipeline):
+    pages = [f"Page {page} of the broken file." for page in range(1, 8)]
+    pages[4] = "unreadable"
+    broken = _write_pages(tmp_path / "broken.pdf", pages)
+    good = _write_pages(tmp_path / "good.pdf", ["The only page of the good file."])
+    store = VectorStore(str(tmp_path / "store"), embedder)
+    results = pipeline.run(store, [("broken.pdf", broken), ("good.pdf", good)])
+
+    assert results["broken.pdf"]["status"] == "failed"
+    assert results["broken.pdf"]["reason"] == "page 5 is unreadable"
+    assert results["good.pdf"]["status"] == "processed"
+    # Ranges flushed before the failure are taken out again
+    assert "broken.pdf" not in store.documents
+    assert store.count == 1
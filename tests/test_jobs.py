@@ -0,0 +1,116 @@
+import os
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import routes
+from backend.core.collection_manager import CollectionManager
+from backend.core.jobs import JobQueue, JobWorkerPool, QUEUED, RUNNING, COMPLETED, FAILED, RESET
+
+
+def _queue_job(queue, collection="default", **kwargs):
+    """Enqueue a job with one saved file and return its id"""
+    job_id = queue.new_job_id()
+    os.makedirs(queue.job_dir(job_id))
+    path = os.path.join(queue.job_dir(job_id), "0.pdf")
+    with open(path, "wb") as f:
+        f.write(b"%PDF")
+    queue.enqueue(job_id, [("a.pdf", path)], collection, **kwargs)
+    return job_id
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_workers_run_queued_jobs_and_record_the_outcome(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "uploads"))
+    handled = []
+
+    def handler(job):
+        handled.append(job["id"])
+        queue.update(job["id"], stage="embedding", progress={"a.pdf": {"filename": "a.pdf", "chunks": 4, "embedded": 4}})
+        if job["collection"] == "broken":
+            raise ValueError("unreadable PDF")
+
+    good, bad = _queue_job(queue), _queue_job(queue, "broken")
+    assert queue.describe(good)["status"] == QUEUED
+    pool = JobWorkerPool(queue, handler, workers=1, poll_interval=0.05)
+    pool.start()
+    try:
+        pool.notify()
+        _wait_for(lambda: queue.get(bad)["status"] == FAILED)
+    finally:
+        pool.stop()
+
+    assert handled == [good, bad]
+    job = queue.describe(good)
+    assert job["status"] == COMPLETED and job["error"] is None
+    assert job["chunks"] == 4 and job["elapsed_seconds"] is not None
+    assert queue.describe(bad)["error"] == "unreadable PDF"
+    # Uploaded files are removed once their job is done, whatever the outcome
+    assert not os.path.exists(queue.job_dir(good)) and not os.path.exists(queue.job_dir(bad))
+    assert queue.describe("missing") is None
+
+
+def test_jobs_left_running_are_requeued_on_start(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "uploads"))
+    job_id = _queue_job(queue)
+    assert queue.claim()["id"] == job_id
+    assert queue.get(job_id)["status"] == RUNNING
+    assert queue.claim() is None
+
+    # A new process finds the job still marked running and runs it again
+    restarted = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "uploads"))
+    handled = []
+    pool = JobWorkerPool(restarted, lambda job: handled.append(job["id"]), workers=1, poll_interval=0.05)
+    pool.start()
+    try:
+        _wait_for(lambda: restarted.get(job_id)["status"] == COMPLETED)
+    finally:
+        pool.stop()
+    assert handled == [job_id]
+
+
+def test_a_reset_waits_for_running_jobs_and_holds_back_later_ones(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "uploads"))
+    before = _queue_job(queue)
+    assert queue.claim()["id"] == before
+    reset = queue.new_job_id()
+    queue.enqueue(reset, [], "default", kind=RESET)
+    after = _queue_job(queue)
+    elsewhere = _queue_job(queue, "other")
+
+    # Other collections are not held up
+    assert queue.claim()["id"] == elsewhere
+    assert queue.claim() is None
+    queue.finish(before)
+    assert queue.claim()["id"] == reset
+    assert queue.claim() is None
+    queue.finish(reset)
+    assert queue.claim()["id"] == after
+
+
+def test_the_reset_route_empties_the_collection_through_the_queue(tmp_path, embedder, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "uploads"))
+    workers = JobWorkerPool(queue, routes._run_job, workers=1, poll_interval=0.05)
+    manager = CollectionManager(embedder, root=str(tmp_path / "collections"), default_path=str(tmp_path / "default"))
+    collection = manager.get("default")
+    collection.store.add_documents([{"text": "Some text.", "source": "a.pdf"}])
+    collection.answer_cache.store(collection.store.version, "cached answer", "q")
+    monkeypatch.setattr(routes, "collection_manager", manager)
+    monkeypatch.setattr(routes, "job_queue", queue)
+    monkeypatch.setattr(routes, "job_workers", workers)
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    workers.start()
+    try:
+        with TestClient(app) as client:
+            assert client.post("/api/reset").status_code == 200
+    finally:
+        workers.stop()
+        manager.close()
+    assert collection.store.count == 0 and not collection.store.documents
+    assert collection.answer_cache.stats()["entries"] == 0
@@ -0,0 +1,73 @@
+import numpy as np
+from backend.core.lexical_index import LexicalIndex, Postings, has_identifiers, reciprocal_rank_fusion, tokenize
+from backend.core.vector_store import VectorStore
+
+TEXTS = [
+    "The pump housing is cast iron.",
+    "Replace part AX-4471 when the pump leaks.",
+    "The pump, the pump and the pump again.",
+    "Clause 4.2.1 covers warranty claims.",
+]
+
+
+def _index(texts, max_postings=1024):
+    index = LexicalIndex(max_postings)
+    index.append(Postings.build(np.arange(len(texts)), texts))
+    return index
+
+
+def test_identifiers_are_kept_whole_and_split_into_parts():
+    assert tokenize("Part AX-4471, clause 4.2.1") == [
+        b"part", b"ax-4471", b"ax", b"4471", b"clause", b"4.2.1", b"4", b"2", b"1",
+    ]
+    assert has_identifiers("what does AX-4471 do") and has_identifiers("is NASA involved")
+    assert not has_identifiers("how do pumps leak")
+
+
+def test_bm25_prefers_rare_terms_and_frequent_matches():
+    index = _index(TEXTS)
+    ids, scores = index.search("pump", k=10)
+    assert list(ids[:1]) == [2] and set(ids) == {0, 1, 2}
+    assert np.all(np.diff(scores) <= 0)
+    assert list(index.search("ax-4471 pump", k=1)[0]) == [1]
+    assert list(index.search("4.2.1", k=10)[0]) == [3]
+    assert not len(index.search("turbine", k=10)[0])
+    # Restricted to allowed ids
+    assert set(index.search("pump", k=10, allowed=np.array([0, 1]))[0]) == {0, 1}
+
+
+def test_postings_beyond_the_budget_are_cut_to_the_highest_impact():
+    texts = ["pump " * (1 + i % 5) + "filler " * 20 for i in range(200)]
+    ids, scores = _index(texts, max_postings=50).search("pump", k=5)
+    assert np.allclose(scores, _index(texts).search("pump", k=5)[1])
+    assert all(i % 5 == 4 for i in ids)
+
+
+def test_reciprocal_rank_fusion_weighs_rankings():
+    dense = np.array([1, 2, 3, -1])
+    lexical = np.array([3, 4])
+    assert reciprocal_rank_fusion([(dense, 0.5), (lexical, 0.5)], k=10)[0] == 3
+    # Found by both rankings beats first place in one
+    assert reciprocal_rank_fusion([(dense, 0.9), (lexical, 0.1)], k=10) == [3, 1, 2, 4]
+    assert reciprocal_rank_fusion([(dense, 0.9), (lexical, 0.1)], k=2) == [3, 1]
+    assert reciprocal_rank_fusion([(dense, 1.0), (lexical, 0.0)], k=10) == [1, 2, 3]
+
+
+def test_hybrid_search_finds_identifiers_dense_search_ranks_anywhere(tmp_path, embedder):
+    store = VectorStore(str(tmp_path / "store"), embedder)
+    docs = [{"text": f"Maintenance note {i} about pumps and valves.", "source": "notes.pdf"} for i in range(60)]
+    docs[37]["text"] = "Order spare part AX-4471 for the valve."
+    store.add_documents(docs)
+
+    hits = store.similarity_search("AX-4471", top_k=3)
+    assert hits[0]["text"] == docs[37]["text"]
+    assert store.similarity_search("AX-4471", top_k=1, lexical_weight=1)[0]["id"] == hits[0]["id"]
+    dense = store.search_vectors(embedder.embed(["AX-4471"]), top_k=3)[0]
+    assert store.similarity_search("AX-4471", top_k=3, lexical_weight=0) == dense
+
+    # Postings persist with their segment and forget deleted chunks
+    store.close()
+    reopened = VectorStore(str(tmp_path / "store"), embedder)
+    assert reopened.similarity_search("AX-4471", top_k=1)[0]["text"] == docs[37]["text"]
+    reopened.delete_document("notes.pdf")
+    assert reopened.similarity_search("AX-4471", top_k=3, lexical_weight=1) == []
@@ -0,0 +1,78 @@
+import time
+import asyncio
+import pytest
+from backend.core import llm_manager
+from backend.core.llm_manager import LLMManager
+from conftest import StubBackend
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(llm_manager, "LLM_HEDGE_DELAY", 0.05)
+    return LLMManager()
+
+
+def _with(manager, *backends):
+    for backend in backends:
+        manager.add_backend(backend)
+    return manager
+
+
+def _timed(coroutine):
+    start = time.monotonic()
+    result = asyncio.run(coroutine)
+    return result, time.monotonic() - start
+
+
+async def _collect(stream):
+    return [pair async for pair in stream]
+
+
+def test_a_slow_model_is_hedged_by_the_next_one(manager):
+    slow = StubBackend("slow", ["slow answer"], delay=2.0)
+    fast = StubBackend("fast", ["fast answer"])
+    (answer, model), elapsed = _timed(_with(manager, slow, fast).generate_with_model("question"))
+    assert (answer, model) == ("fast answer", "fast")
+    assert elapsed < 1.0
+    assert manager.current_model == "fast"
+    # The cancelled loser is neither a failure nor a success
+    assert manager.breakers["slow"].outcomes[-1][0] is None
+    assert manager.breakers["slow"].consecutive_failures == 0
+
+
+def test_a_failing_model_falls_back_without_waiting_for_the_hedge(manager, monkeypatch):
+    monkeypatch.setattr(llm_manager, "LLM_HEDGE_DELAY", 5.0)
+    broken = StubBackend("broken")
+    broken.fail = True
+    good = StubBackend("good", ["good answer"])
+    (answer, model), elapsed = _timed(_with(manager, broken, good).generate_with_model("question"))
+    assert (answer, model) == ("good answer", "good")
+    assert elapsed < 1.0
+    assert manager.breakers["broken"].consecutive_failures == 1
+
+
+def test_when_every_model_fails_a_canned_answer_is_returned(manager):
+    backends = [StubBackend(f"broken-{i}") for i in range(2)]
+    for backend in backends:
+        backend.fail = True
+    answer, model = asyncio.run(_with(manager, *backends).generate_with_model("What is this?"))
+    assert model is None and answer
+    assert [backend.calls for backend in backends] == [1, 1]
+
+
+def test_streams_are_hedged_until_the_first_token(manager):
+    slow = StubBackend("slow", ["slow ", "answer"], delay=2.0)
+    fast = StubBackend("fast", ["fast ", "answer"], delay=0.01)
+    pairs, elapsed = _timed(_collect(_with(manager, slow, fast).stream_with_model("question")))
+    assert pairs == [("fast ", "fast"), ("answer", "fast")]
+    assert elapsed < 1.0
+    assert manager.breakers["slow"].outcomes[-1][0] is None
+    assert manager.breakers["fast"].outcomes[-1][0] is True
+
+
+def test_a_stream_failing_before_its_first_token_falls_back(manager):
+    empty = StubBackend("empty", [])
+    good = StubBackend("good", ["good"])
+    pairs = asyncio.run(_collect(_with(manager, empty, good).stream_with_model("question")))
+    assert pairs == [("good", "good")]
+    assert manager.breakers["empty"].outcomes[-1][0] is False
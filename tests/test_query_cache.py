@@ -0,0 +1,95 @@
+import numpy as np
+from backend.core import query_cache
+from backend.core.query_cache import AnswerCache, SemanticCache
+from backend.core.vector_store import VectorStore
+from conftest import Clock, unit_vectors
+
+
+def test_answers_are_keyed_by_normalized_query_and_settings():
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.store(1, "answer", "What is  RAG?", 5, None)
+    assert cache.lookup(1, "what is rag?", 5, None) == "answer"
+    assert cache.lookup(1, "what is rag?", 10, None) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_a_newer_index_version_invalidates_answers():
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.store(1, "old answer", "q")
+    assert cache.lookup(2, "q") is None
+    # An answer computed against the old index arrives late and is dropped
+    cache.store(1, "old answer", "q")
+    assert cache.lookup(2, "q") is None
+    cache.store(2, "new answer", "q")
+    assert cache.lookup(2, "q") == "new answer"
+    assert cache.lookup(1, "q") is None
+
+
+def test_adding_or_deleting_documents_invalidates_answers(tmp_path, embedder):
+    store = VectorStore(str(tmp_path / "store"), embedder)
+    cache = AnswerCache(max_entries=10, ttl=60)
+    cache.store(store.version, "no documents yet", "q")
+    store.add_documents([{"text": "Some text", "source": "a.pdf"}])
+    assert cache.lookup(store.version, "q") is None
+    cache.store(store.version, "from a.pdf", "q")
+    store.delete_document("a.pdf")
+    assert cache.lookup(store.version, "q") is None
+
+
+def test_answers_expire_and_the_least_recently_used_go_first(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache.time, "monotonic", clock)
+    cache = AnswerCache(max_entries=2, ttl=60)
+    cache.store(1, "a", "first")
+    cache.store(1, "b", "second")
+    assert cache.lookup(1, "first") == "a"
+    cache.store(1, "c", "third")
+    assert cache.lookup(1, "second") is None
+    assert cache.lookup(1, "first") == "a"
+    clock.now += 61
+    assert cache.lookup(1, "first") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_repeated_queries_are_embedded_once(embedder, monkeypatch):
+    encoded = []
+    encode = embedder._encode
+    monkeypatch.setattr(embedder, "_encode", lambda texts: encoded.extend(texts) or encode(texts))
+    first = embedder.embed_queries(["What is RAG?", "other"])
+    second = embedder.embed_queries(["what is  rag?"])
+    assert encoded == ["What is RAG?", "other"]
+    assert (second[0] == first[0]).all()
+
+
+def _near(vector, similarity, seed=1):
+    """A unit vector with the given cosine similarity to vector"""
+    other = unit_vectors(1, len(vector), seed)[0]
+    other -= other.dot(vector) * vector
+    other /= np.linalg.norm(other)
+    return similarity * vector + np.sqrt(1 - similarity ** 2) * other
+
+
+def test_semantic_cache_answers_paraphrases_above_the_threshold():
+    cache = SemanticCache(threshold=0.9, max_entries=10, ttl=60)
+    question = unit_vectors(1)[0]
+    assert cache.lookup(1, question, 5) is None
+    cache.store(1, question, "answer", "what is rag", 5)
+
+    value, matched, similarity = cache.lookup(1, _near(question, 0.95), 5)
+    assert (value, matched) == ("answer", "what is rag") and abs(similarity - 0.95) < 1e-4
+    assert cache.lookup(1, _near(question, 0.8), 5) is None
+    # Other search settings, or a newer index, never match
+    assert cache.lookup(1, question, 10) is None
+    assert cache.lookup(2, question, 5) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_semantic_cache_keeps_the_most_recently_used_entries():
+    cache = SemanticCache(threshold=0.99, max_entries=2, ttl=60)
+    vectors = unit_vectors(3, seed=2)
+    cache.store(1, vectors[0], "a", "first")
+    cache.store(1, vectors[1], "b", "second")
+    assert cache.lookup(1, vectors[0])[0] == "a"
+    cache.store(1, vectors[2], "c", "third")
+    assert cache.lookup(1, vectors[1]) is None
+    assert cache.lookup(1, vectors[0])[0] == "a" and cache.lookup(1, vectors[2])[0] == "c"
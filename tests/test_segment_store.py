@@ -0,0 +1,24 @@
+from backend.core.vector_store import VectorStore
+from conftest import unit_vectors
+
+
+def test_persist_during_compaction_keeps_every_chunk(tmp_path, embedder, monkeypatch):
+    path = str(tmp_path / "store")
+    store = VectorStore(path, embedder)
+    segments = store.store
+    # Compact inside each persist rather than in a background thread, so it always
+    # overlaps the persist that triggered it
+    monkeypatch.setattr(segments, "max_segments", 2)
+    monkeypatch.setattr(segments, "maybe_compact",
+                        lambda: segments.compact() if len(segments.manifest["segments"]) >= 2 else None)
+    for i in range(4):
+        store.add_documents([{"text": f"chunk {i}", "source": f"doc{i}.pdf"}], vectors=unit_vectors(1, seed=i))
+    assert store.count == 4
+    store.close()
+
+    reopened = VectorStore(path, embedder)
+    assert reopened.count == 4
+    assert reopened.index.ntotal == reopened.count
+    assert len(reopened.store.manifest["segments"]) < 4
+    hits = reopened.search_vectors(unit_vectors(1, seed=2), top_k=1)[0]
+    assert [hit["text"] for hit in hits] == ["chunk 2"]
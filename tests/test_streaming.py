@@ -0,0 +1,75 @@
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import routes
+from backend.core.collection_manager import CollectionManager
+from backend.core.llm_manager import LLMManager
+from conftest import StubBackend
+
+
+@pytest.fixture
+def api(tmp_path, embedder, monkeypatch):
+    """Client of the API routes over one indexed collection, answered by a StubBackend"""
+    manager = CollectionManager(embedder, root=str(tmp_path / "collections"), default_path=str(tmp_path / "default"))
+    manager.get("default", create=True).store.add_documents(
+        [{"text": f"Paragraph {i} about the quarterly report.", "source": "report.pdf"} for i in range(3)]
+    )
+    llm = LLMManager()
+    backend = StubBackend(tokens=["The ", "report ", "says ", "yes."])
+    llm.add_backend(backend)
+    monkeypatch.setattr(routes, "collection_manager", manager)
+    monkeypatch.setattr(routes, "llm_manager", llm)
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api")
+    with TestClient(app) as client:
+        yield client, backend, manager.get("default")
+    manager.close()
+
+
+def _events(response):
+    """(event, data) pairs of a server-sent event stream"""
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def _stream(client, query):
+    response = client.post("/api/query-stream", params={"query": query})
+    assert response.status_code == 200
+    return _events(response)
+
+
+def test_stream_sends_sources_tokens_then_done_and_caches(api):
+    client, backend, collection = api
+    events = _stream(client, "What does the report say?")
+    assert [event for event, _ in events] == ["sources", "token", "token", "token", "token", "done"]
+    assert events[0][1]["sources"] == ["report.pdf"]
+    assert "".join(data["text"] for event, data in events if event == "token") == "The report says yes."
+    assert events[-1][1]["cached"] is False
+
+    repeat = _stream(client, "What does the report say?")
+    assert [event for event, _ in repeat] == ["sources", "token", "done"]
+    assert repeat[1][1]["text"] == "The report says yes."
+    assert repeat[-1][1]["cached"] is True
+
+
+def test_interrupted_stream_ends_with_error_and_is_not_cached(api):
+    client, backend, collection = api
+    backend.fail = True
+    events = _stream(client, "What does the report say?")
+    assert [event for event, _ in events] == ["sources", "token", "token", "token", "token", "error"]
+    assert "stub failed mid-answer" in events[-1][1]["error"]
+    assert collection.answer_cache.stats()["entries"] == 0
+    assert collection.semantic_cache.stats()["entries"] == 0
+
+    # The partial answer is served neither to a repeat nor to the non-streaming route
+    backend.fail = False
+    repeat = _stream(client, "What does the report say?")
+    assert repeat[-1][0] == "done"
+    assert repeat[-1][1]["cached"] is False
+    assert "".join(data["text"] for event, data in repeat if event == "token") == "The report says yes."
+    answer = client.post("/api/query", params={"query": "What does the report say?"}).json()
+    assert answer["answer"] == "The report says yes."
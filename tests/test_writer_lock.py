@@ -0,0 +1,52 @@
+import os
+import sys
+import threading
+import subprocess
+from backend.core.collection_manager import CollectionManager
+from backend.core.writer_lock import WriterLock
+
+# Holds the lock until its stdin closes or it is killed
+HOLD = """
+import sys
+from backend.core.writer_lock import WriterLock
+lock = WriterLock(sys.argv[1])
+print("held" if lock.acquire() else "busy", flush=True)
+sys.stdin.read()
+"""
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_one_writer_at_a_time_and_a_waiter_takes_over_when_it_exits(tmp_path):
+    path = str(tmp_path / "locks" / "writer.lock")
+    with subprocess.Popen([sys.executable, "-c", HOLD, path], cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                          text=True) as holder:
+        assert holder.stdout.readline().strip() == "held"
+        lock = WriterLock(path)
+        assert not lock.acquire() and not lock.held
+
+        took_over = threading.Event()
+        lock.wait(took_over.set)
+        assert not took_over.wait(0.2)
+        # However the writer exits, the operating system releases its lock
+        holder.kill()
+        assert took_over.wait(10) and lock.held
+    assert lock.acquire()
+    assert not WriterLock(path).acquire()
+
+
+def test_readers_serve_the_writers_published_index(tmp_path, embedder):
+    paths = dict(root=str(tmp_path / "collections"), default_path=str(tmp_path / "default"))
+    writer = CollectionManager(embedder, shared=True, **paths)
+    writer.get("docs", create=True).store.add_documents([{"text": "First text.", "source": "a.pdf"}])
+
+    reader = CollectionManager(embedder, shared=True, read_only=True, **paths)
+    collection = reader.get("docs")
+    assert collection.store.count == 1
+    version = collection.store.version
+
+    writer.get("docs").store.add_documents([{"text": "Second text.", "source": "b.pdf"}])
+    assert collection.store.store.changed_on_disk()
+    reader.reload(collection)
+    assert collection.store.count == 2 and collection.store.version > version
+    assert set(collection.store.documents) == {"a.pdf", "b.pdf"}
+    writer.close()